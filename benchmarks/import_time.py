@@ -0,0 +1,46 @@
+import subprocess
+import sys
+import time
+import argparse
+
+# Offline mitigation, as done by batch workers, which must not load these
+SCRIPT = """
+import sys
+import numpy as np
+import mthree
+
+mit = mthree.M3Mitigation()
+mit.cals_from_matrices([np.array([[0.95, 0.03], [0.05, 0.97]], dtype=np.float32)] * 10)
+# More bit-strings than are solved without planning
+counts = {format(kk, "010b"): kk % 7 + 1 for kk in range(0, 900, 3)}
+_, details = mit.apply_correction(counts, range(10), details=True)
+assert details["plan"]["estimates"] is not None
+print(",".join(mod for mod in ["qiskit_ibm_runtime", "psutil"] if mod in sys.modules))
+"""
+
+
+def main(repeats=5, max_time=None):
+    """Time a fresh 'import mthree', and fail if offline mitigation loads the
+    runtime client or psutil, or if the import is slower than max_time"""
+    times = []
+    for _ in range(repeats):
+        st = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import mthree"], check=True)
+        times.append(time.perf_counter() - st)
+    print(min(times))
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True
+    )
+    loaded = out.stdout.strip()
+    if loaded:
+        sys.exit("Offline mitigation imported: {}".format(loaded))
+    if max_time is not None and min(times) > max_time:
+        sys.exit("Import took {} s, more than {} s".format(min(times), max_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', default=5, type=int)
+    parser.add_argument('--max-time', default=None, type=float)
+    args = parser.parse_args()
+    main(args.repeats, args.max_time)
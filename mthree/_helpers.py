@@ -13,8 +13,7 @@
 """
 Helper functions
 """
-from qiskit.providers import BackendV2
-from qiskit_ibm_runtime import IBMBackend
+
 from mthree.exceptions import M3Error
 
 
@@ -27,6 +26,10 @@ def system_info(backend):
     Returns:
         dict: Backend information
     """
+    # Imported here so that mitigating from saved cals does not load the runtime
+    from qiskit.providers import BackendV2
+    from qiskit_ibm_runtime import IBMBackend
+
     info_dict = {}
     info_dict["inoperable_qubits"] = []
     config = backend.configuration()
@@ -0,0 +1,134 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""
+Solver cache
+------------
+
+.. autosummary::
+   :toctree: ../stubs/
+
+   SolverCache
+"""
+
+import threading
+from collections import OrderedDict
+
+from mthree.exceptions import M3Error
+
+
+class SolverCache:
+    """Memory-bounded LRU cache of reduced A-matrix solvers."""
+
+    def __init__(self, max_bytes=2**28):
+        """Memory-bounded LRU cache of reduced A-matrix solvers.
+
+        The reduced A-matrix depends only on the qubits, distance, calibrations,
+        and the set of bit-strings, not on the counts themselves.  Entries store
+        what is needed to solve again with new counts over the same bit-strings,
+        e.g. the LU factors for the direct method or the matrix-free operator and
+        last solution for the iterative method.
+
+        Parameters:
+            max_bytes (int): Maximum total size of cached entries, default=256MB.
+
+        Attributes:
+            max_bytes (int): Maximum total size of cached entries.
+            nbytes (int): Current total size of cached entries.
+            hits (int): Number of lookups that found an entry.
+            misses (int): Number of lookups that did not find an entry.
+
+        Raises:
+            M3Error: Invalid cache size.
+        """
+        if max_bytes <= 0:
+            raise M3Error(f"Invalid cache size {max_bytes}.")
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def key(method, qubits, distance, counts, cals_version):
+        """Cache key for a correction.
+
+        Parameters:
+            method (str): Solution method.
+            qubits (array_like): Qubits over which to calibrate.
+            distance (int): Distance to correct for.
+            counts (dict or tuple): Input counts dict, or tuple of unique
+                                    bit-string bytes and counts.
+            cals_version (int): Version of the calibrations of the mitigator
+                                that owns the cache.
+
+        Returns:
+            tuple: Hashable key.
+        """
+        return (
+            method,
+            tuple(int(qu) for qu in qubits),
+            distance,
+            counts[0].tobytes() if isinstance(counts, tuple) else frozenset(counts),
+            cals_version,
+        )
+
+    def get(self, key):
+        """Look up an entry, marking it as most recently used.
+
+        Parameters:
+            key (tuple): Cache key.
+
+        Returns:
+            dict: Cached entry, or None if not found.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, entry, nbytes):
+        """Add an entry, evicting least recently used entries to make room.
+
+        Entries larger than the cache are not stored.
+
+        Parameters:
+            key (tuple): Cache key.
+            entry (dict): Entry to store.
+            nbytes (int): Size of the entry in bytes.
+        """
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            while self._entries and self.nbytes + nbytes > self.max_bytes:
+                _, (_, old_bytes) = self._entries.popitem(last=False)
+                self.nbytes -= old_bytes
+            self._entries[key] = (entry, nbytes)
+            self.nbytes += nbytes
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
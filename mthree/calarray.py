@@ -0,0 +1,297 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""
+Calibration arrays
+------------------
+
+.. autosummary::
+   :toctree: ../stubs/
+
+   CalibrationArray
+   write_cal_array
+   load_cal_array
+   read_cal_header
+   is_cal_array_file
+"""
+
+import os
+import struct
+import weakref
+
+import numpy as np
+import orjson
+
+from mthree.exceptions import M3Error
+
+# Magic string and format version at the start of a binary cals file
+MAGIC = b"\x93M3CALS"
+VERSION = 1
+# Data starts on a multiple of this many bytes
+ALIGNMENT = 64
+
+
+class _ChangeNotifier:
+    """Calls back the holders of a set of cals when it is changed in place."""
+
+    def _watch(self, callback):
+        """Call a bound method after every in place change.
+
+        Only a weak reference is kept, so watching does not keep the
+        owner of the method alive.
+
+        Parameters:
+            callback (method): Bound method taking no arguments.
+        """
+        watchers = self.__dict__.setdefault("_watchers", [])
+        watchers[:] = [ref for ref in watchers if ref() is not None]
+        watchers.append(weakref.WeakMethod(callback))
+
+    def _changed(self):
+        for ref in self.__dict__.get("_watchers", []):
+            callback = ref()
+            if callback is not None:
+                callback()
+
+
+class _CalibrationList(_ChangeNotifier, list):
+    """List of calibration matrices that reports changes to its watchers."""
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _notify_after(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        out = method(self, *args, **kwargs)
+        self._changed()
+        return out
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in [
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "reverse",
+    "sort",
+]:
+    setattr(_CalibrationList, _name, _notify_after(_name))
+
+
+class CalibrationArray(_ChangeNotifier):
+    """Single-qubit calibrations stored as one contiguous array."""
+
+    def __init__(self, data, valid, filename=None):
+        """Single-qubit calibrations stored as one contiguous array.
+
+        Behaves like the list of 2x2 calibration matrices used by
+        ``M3Mitigation.single_qubit_cals``, with ``None`` for qubits that are
+        not calibrated, but without an array object per qubit.
+
+        Parameters:
+            data (ndarray): Float32 array of shape (num_qubits, 2, 2).
+            valid (ndarray): Boolean array marking calibrated qubits.
+            filename (str): File the arrays are mapped from, if any.
+
+        Raises:
+            M3Error: Shapes of data and valid do not match.
+        """
+        if data.shape != (valid.shape[0], 2, 2):
+            raise M3Error("Calibration data and mask shapes do not match.")
+        self.data = data
+        self.valid = valid
+        self.filename = filename
+
+    @classmethod
+    def from_list(cls, cals):
+        """Build from a list of 2x2 calibration matrices.
+
+        Parameters:
+            cals (list): Calibration matrices, or None for uncalibrated qubits.
+
+        Returns:
+            CalibrationArray: Stacked calibrations.
+        """
+        data = np.zeros((len(cals), 2, 2), dtype=np.float32)
+        valid = np.zeros(len(cals), dtype=bool)
+        for idx, cal in enumerate(cals):
+            if cal is not None:
+                data[idx] = cal
+                valid[idx] = True
+        return cls(data, valid)
+
+    def __len__(self):
+        return self.valid.shape[0]
+
+    def __getitem__(self, idx):
+        if not self.valid[idx]:
+            return None
+        return self.data[idx]
+
+    def __setitem__(self, idx, cal):
+        # Changed cals no longer match the file they were mapped from
+        self.filename = None
+        if cal is None:
+            self.valid[idx] = False
+        else:
+            self.data[idx] = cal
+            self.valid[idx] = True
+        self._changed()
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __reduce__(self):
+        # Processes can map the same file instead of receiving a copy
+        if self.filename is not None:
+            return (_map_cal_array, (self.filename,))
+        return (CalibrationArray, (np.asarray(self.data), np.asarray(self.valid)))
+
+    def copy(self):
+        """List of the calibration matrices.
+
+        Returns:
+            list: Calibration matrices, or None for uncalibrated qubits.
+        """
+        return list(self)
+
+    def faulty_qubits(self):
+        """Qubits whose calibration has P(0|1) >= P(0|0).
+
+        Returns:
+            list: Faulty qubits.
+        """
+        bad = self.valid & (self.data[:, 0, 1] >= self.data[:, 0, 0])
+        return np.flatnonzero(bad).tolist()
+
+
+def write_cal_array(cals_file, cals, metadata=None):
+    """Write calibrations to a binary file that can be memory-mapped.
+
+    The file holds a short header with the metadata as JSON, then the
+    calibrations as a little-endian float32 array of shape (num_qubits, 2, 2),
+    then one byte per qubit marking which qubits are calibrated.
+
+    Parameters:
+        cals_file (str): File in which to store calibrations.
+        cals (list or CalibrationArray): Calibration matrices.
+        metadata (dict): JSON serializable information stored with the cals.
+    """
+    if not isinstance(cals, CalibrationArray):
+        cals = CalibrationArray.from_list(cals)
+    header = dict(metadata or {})
+    header["num_qubits"] = len(cals)
+    header = orjson.dumps(header)
+    start = len(MAGIC) + 5 + len(header)
+    header += b" " * ((-start) % ALIGNMENT)
+    with open(cals_file, "wb") as fd:
+        fd.write(MAGIC)
+        fd.write(struct.pack("<BI", VERSION, len(header)))
+        fd.write(header)
+        fd.write(np.ascontiguousarray(cals.data, dtype="<f4").tobytes())
+        fd.write(np.ascontiguousarray(cals.valid, dtype=np.uint8).tobytes())
+
+
+def is_cal_array_file(cals_file):
+    """Check if a file is a binary calibrations file.
+
+    Parameters:
+        cals_file (str): Path to file.
+
+    Returns:
+        bool: True if the file starts with the binary cals header.
+    """
+    with open(cals_file, "rb") as fd:
+        return fd.read(len(MAGIC)) == MAGIC
+
+
+def read_cal_header(cals_file):
+    """Read the metadata of a binary calibrations file.
+
+    Parameters:
+        cals_file (str): Path to file.
+
+    Returns:
+        dict: Metadata, including the number of qubits.
+        int: Offset in bytes of the calibration data.
+
+    Raises:
+        M3Error: Not a binary cals file, or unsupported version.
+    """
+    with open(cals_file, "rb") as fd:
+        if fd.read(len(MAGIC)) != MAGIC:
+            raise M3Error("{} is not a binary cals file.".format(cals_file))
+        version, header_len = struct.unpack("<BI", fd.read(5))
+        if version != VERSION:
+            raise M3Error("Unsupported cals file version {}.".format(version))
+        header = orjson.loads(fd.read(header_len))
+    return header, len(MAGIC) + 5 + header_len
+
+
+def load_cal_array(cals_file, mmap=True):
+    """Load calibrations from a binary file.
+
+    Memory-mapped files are opened copy-on-write, so all processes that load
+    the same file share its pages until a calibration is modified, and
+    modifications are never written back to the file.
+
+    Parameters:
+        cals_file (str): Path to file.
+        mmap (bool): Memory-map the file instead of reading it, default=True.
+
+    Returns:
+        CalibrationArray: Calibrations.
+        dict: Metadata stored with the calibrations.
+    """
+    header, offset = read_cal_header(cals_file)
+    num_qubits = header["num_qubits"]
+    if mmap and num_qubits:
+        data = np.memmap(
+            cals_file, dtype="<f4", mode="c", offset=offset, shape=(num_qubits, 2, 2)
+        )
+        valid = np.memmap(
+            cals_file,
+            dtype=np.bool_,
+            mode="c",
+            offset=offset + data.nbytes,
+            shape=(num_qubits,),
+        )
+        return (
+            CalibrationArray(data, valid, filename=os.path.abspath(cals_file)),
+            header,
+        )
+    with open(cals_file, "rb") as fd:
+        fd.seek(offset)
+        data = np.frombuffer(fd.read(16 * num_qubits), dtype="<f4")
+        valid = np.frombuffer(fd.read(num_qubits), dtype=np.bool_)
+    cals = CalibrationArray(
+        data.astype(np.float32).reshape(num_qubits, 2, 2), valid.copy()
+    )
+    return cals, header
+
+
+def _map_cal_array(cals_file):
+    """Memory-map the calibrations of a binary file, without the metadata."""
+    return load_cal_array(cals_file)[0]
@@ -0,0 +1,234 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""
+Calibration store
+-----------------
+
+.. autosummary::
+   :toctree: ../stubs/
+
+   CalibrationStore
+"""
+
+import datetime
+import sqlite3
+import threading
+
+import numpy as np
+
+from mthree.calarray import CalibrationArray
+from mthree.exceptions import M3Error
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cals (
+    id INTEGER PRIMARY KEY,
+    backend TEXT NOT NULL,
+    time REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    shots INTEGER,
+    num_qubits INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    valid BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cals_backend_time ON cals (backend, time);
+"""
+
+
+class CalibrationStore:
+    """Append-only store of calibration snapshots indexed by backend and time."""
+
+    def __init__(self, path=":memory:"):
+        """Append-only store of calibration snapshots indexed by backend and time.
+
+        Snapshots are kept in a SQLite database, one row per calibration run,
+        with the calibrations of all qubits stored as a single binary array.
+
+        Parameters:
+            path (str): Path to the database file, default is in memory.
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cals").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def add(self, cals, backend, timestamp, shots=None):
+        """Add a calibration snapshot.
+
+        Parameters:
+            cals (list or CalibrationArray): Calibration matrices, or None for
+                                             uncalibrated qubits.
+            backend (str): Name of the backend.
+            timestamp (str or datetime): Time of the calibration, naive times are UTC.
+            shots (int): Number of calibration shots.
+
+        Returns:
+            int: Id of the snapshot.
+
+        Raises:
+            M3Error: Missing backend or timestamp.
+        """
+        if not backend:
+            raise M3Error("Calibration snapshots need a backend name.")
+        if timestamp is None:
+            raise M3Error("Calibration snapshots need a timestamp.")
+        if not isinstance(cals, CalibrationArray):
+            cals = CalibrationArray.from_list(cals)
+        dt = _to_utc(timestamp)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO cals (backend, time, timestamp, shots, num_qubits, data, valid)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    backend,
+                    dt.timestamp(),
+                    dt.isoformat(),
+                    shots,
+                    len(cals),
+                    np.ascontiguousarray(cals.data, dtype="<f4").tobytes(),
+                    np.ascontiguousarray(cals.valid, dtype=np.uint8).tobytes(),
+                ),
+            )
+        return cursor.lastrowid
+
+    def backends(self):
+        """Names of the backends with snapshots.
+
+        Returns:
+            list: Backend names.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT backend FROM cals ORDER BY backend"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def timestamps(self, backend):
+        """Times of the snapshots of a backend.
+
+        Parameters:
+            backend (str): Name of the backend.
+
+        Returns:
+            list: UTC timestamps in ISO format, oldest first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp FROM cals WHERE backend = ? ORDER BY time",
+                (backend,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def nearest(self, backend, before=None):
+        """Most recent snapshot of a backend taken at or before a given time.
+
+        Parameters:
+            backend (str): Name of the backend.
+            before (str or datetime): Latest time, default is the newest snapshot.
+
+        Returns:
+            CalibrationArray: Calibrations.
+            dict: Backend, timestamp, and shots of the snapshot.
+
+        Raises:
+            M3Error: No snapshot found.
+        """
+        query = (
+            "SELECT backend, timestamp, shots, num_qubits, data, valid FROM cals"
+            " WHERE backend = ?"
+        )
+        params = [backend]
+        if before is not None:
+            query += " AND time <= ?"
+            params.append(_to_utc(before).timestamp())
+        query += " ORDER BY time DESC, id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        if row is None:
+            raise M3Error(
+                "No calibrations for {} at or before {}.".format(backend, before)
+            )
+        num_qubits = row[3]
+        data = np.frombuffer(row[4], dtype="<f4").reshape(num_qubits, 2, 2)
+        valid = np.frombuffer(row[5], dtype=np.bool_)
+        cals = CalibrationArray(data.astype(np.float32), valid.copy())
+        return cals, {"backend": row[0], "timestamp": row[1], "shots": row[2]}
+
+    def load_range(self, backend, start=None, stop=None):
+        """All snapshots of a backend in a time range, stacked into arrays.
+
+        Parameters:
+            backend (str): Name of the backend.
+            start (str or datetime): Earliest time, default is no limit.
+            stop (str or datetime): Latest time, default is no limit.
+
+        Returns:
+            list: UTC timestamps in ISO format, oldest first.
+            ndarray: Calibrations of shape (num_snapshots, num_qubits, 2, 2).
+            ndarray: Boolean array of shape (num_snapshots, num_qubits) marking
+                     calibrated qubits.
+
+        Raises:
+            M3Error: Snapshots have different numbers of qubits.
+        """
+        query = "SELECT timestamp, num_qubits, data, valid FROM cals WHERE backend = ?"
+        params = [backend]
+        if start is not None:
+            query += " AND time >= ?"
+            params.append(_to_utc(start).timestamp())
+        if stop is not None:
+            query += " AND time <= ?"
+            params.append(_to_utc(stop).timestamp())
+        query += " ORDER BY time, id"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        num_qubits = {row[1] for row in rows}
+        if len(num_qubits) > 1:
+            raise M3Error("Snapshots have different numbers of qubits.")
+        num_qubits = num_qubits.pop() if num_qubits else 0
+        data = np.frombuffer(b"".join(row[2] for row in rows), dtype="<f4")
+        valid = np.frombuffer(b"".join(row[3] for row in rows), dtype=np.bool_)
+        return (
+            [row[0] for row in rows],
+            data.astype(np.float32).reshape(len(rows), num_qubits, 2, 2),
+            valid.reshape(len(rows), num_qubits).copy(),
+        )
+
+
+def _to_utc(timestamp):
+    """Convert an ISO string or datetime to an aware UTC datetime.
+
+    Parameters:
+        timestamp (str or datetime): Time, naive times are taken to be UTC.
+
+    Returns:
+        datetime: UTC time.
+    """
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp.astimezone(datetime.timezone.utc)
@@ -19,6 +19,9 @@ Distributions
 
    QuasiDistribution
    ProbDistribution
+   ArrayQuasiDistribution
+   ArrayProbDistribution
+   PartitionedQuasiDistribution
 
 Distribution collections
 ------------------------
@@ -31,11 +34,13 @@ Distribution collections
 """
 
 import math
+from itertools import compress
 import numpy as np
 from qiskit.result import Counts
 
-from mthree.probability import quasi_to_probs
-from mthree.expval import exp_val
+from mthree.probability import nearest_probs
+from mthree.expval import exp_val, exp_vals, packed_exp_vals
+from mthree.converters import bytes_to_bitstrings, bytes_to_packed, counts_to_arrays
 from mthree.exceptions import M3Error
 
 
@@ -104,6 +109,9 @@ class ProbDistribution(dict):
         elif isinstance(exp_ops, dict):
             return exp_val(self, dict_ops=exp_ops)
         elif isinstance(exp_ops, list):
+            if all(isinstance(item, str) for item in exp_ops):
+                # String operators are evaluated together in one pass
+                return exp_vals(self, exp_ops).astype(np.float32)
             return np.array([self.expval(item) for item in exp_ops], dtype=np.float32)
         else:
             raise M3Error("Invalid type passed to exp_ops")
@@ -180,6 +188,9 @@ class QuasiDistribution(dict):
         elif isinstance(exp_ops, dict):
             return exp_val(self, dict_ops=exp_ops)
         elif isinstance(exp_ops, list):
+            if all(isinstance(item, str) for item in exp_ops):
+                # String operators are evaluated together in one pass
+                return exp_vals(self, exp_ops).astype(np.float32)
             return np.array([self.expval(item) for item in exp_ops], dtype=np.float32)
         else:
             raise M3Error("Invalid type passed to exp_ops")
@@ -231,10 +242,270 @@ class QuasiDistribution(dict):
         Notes:
             Method from Smolin et al., Phys. Rev. Lett. 108, 070502 (2012).
         """
-        probs, dist = quasi_to_probs(self)
+        keep, probs, dist = nearest_probs(self._values_array())
+        out = self._from_nearest(keep, probs)
         if return_distance:
-            return ProbDistribution(probs, self.shots, self.mitigation_overhead), dist
-        return ProbDistribution(probs, self.shots, self.mitigation_overhead)
+            return out, dist[0]
+        return out
+
+    def _values_array(self):
+        return np.fromiter(self.values(), dtype=float, count=len(self))
+
+    def _from_nearest(self, keep, probs):
+        """ProbDistribution from the output of nearest_probs."""
+        return ProbDistribution(
+            dict(zip(compress(self, keep), probs[keep].tolist())),
+            self.shots,
+            self.mitigation_overhead,
+        )
+
+
+class _ArrayDistribution:
+    """Base class for distributions stored as arrays of bit-strings and values.
+
+    Bit-strings are rows of big-endian bytes, the same layout as a Qiskit
+    ``BitArray``, in bit-string order.  A dict keyed by bit-string is only
+    built when the distribution is used as a mapping.
+    """
+
+    __slots__ = (
+        "bitstrings",
+        "vec",
+        "num_bits",
+        "shots",
+        "mitigation_overhead",
+        "_dict",
+    )
+
+    # Dict class built by to_dict, overridden by subclasses
+    _dict_cls = QuasiDistribution
+
+    def __init__(self, bitstrings, vec, num_bits, shots=None, mitigation_overhead=None):
+        """Distribution stored as arrays of bit-strings and values.
+
+        Parameters:
+            bitstrings (ndarray): 2D uint8 array of bit-string bytes.
+            vec (ndarray): Values, one per bit-string.
+            num_bits (int): Number of bits in a bit-string.
+            shots (int): Number shots taken to form distribution.
+            mitigation_overhead (float): Overhead from performing mitigation.
+
+        Raises:
+            M3Error: Length of values does not match number of bit-strings.
+        """
+        self.bitstrings = np.ascontiguousarray(bitstrings, dtype=np.uint8)
+        self.vec = np.ascontiguousarray(vec, dtype=np.float32)
+        if self.vec.shape[0] != self.bitstrings.shape[0]:
+            raise M3Error("Length of values does not match number of bit-strings.")
+        self.num_bits = num_bits
+        self.shots = shots
+        self.mitigation_overhead = mitigation_overhead
+        self._dict = None
+
+    def __repr__(self):
+        return "{}({} bit-strings, num_bits={})".format(
+            type(self).__name__, len(self), self.num_bits
+        )
+
+    def __len__(self):
+        return self.vec.shape[0]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __contains__(self, key):
+        return key in self.to_dict()
+
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+    def get(self, key, default=None):
+        """Value of a bit-string, or default if it is not present."""
+        return self.to_dict().get(key, default)
+
+    def keys(self):
+        """Bit-strings of the distribution."""
+        return self.to_dict().keys()
+
+    def values(self):
+        """Values of the distribution."""
+        return self.to_dict().values()
+
+    def items(self):
+        """Bit-string and value pairs of the distribution."""
+        return self.to_dict().items()
+
+    @property
+    def nbytes(self):
+        """Size of the bit-string and value arrays in bytes."""
+        return self.bitstrings.nbytes + self.vec.nbytes
+
+    def to_dict(self):
+        """Dict version of the distribution, built once on first use.
+
+        Returns:
+            QuasiDistribution or ProbDistribution: Distribution keyed by bit-string.
+        """
+        if self._dict is None:
+            self._dict = self._dict_cls(
+                dict(
+                    zip(bytes_to_bitstrings(self.bitstrings, self.num_bits), self.vec)
+                ),
+                shots=self.shots,
+                mitigation_overhead=self.mitigation_overhead,
+            )
+        return self._dict
+
+    def expval(self, exp_ops=""):
+        """Compute expectation value from distribution.
+
+        Parameters:
+            exp_ops (str or dict or list): String or dict representation
+                                           of diagonal qubit operators
+                                           used in computing the expectation
+                                           value.
+
+        Returns:
+            float: Expectation value.
+
+        Raises:
+            M3Error: Invalid type passed to exp_ops.
+            M3Error: exp_ops length does not equal number of bits.
+        """
+        if isinstance(exp_ops, str):
+            return float(self._exp_vals([exp_ops])[0])
+        elif isinstance(exp_ops, dict):
+            return exp_val(self.to_dict(), dict_ops=exp_ops)
+        elif isinstance(exp_ops, list):
+            if all(isinstance(item, str) for item in exp_ops):
+                return self._exp_vals(exp_ops).astype(np.float32)
+            return np.array([self.expval(item) for item in exp_ops], dtype=np.float32)
+        else:
+            raise M3Error("Invalid type passed to exp_ops")
+
+    def _exp_vals(self, exp_ops):
+        """Expectation values of string operators in one pass over the arrays."""
+        return packed_exp_vals(
+            bytes_to_packed(self.bitstrings, self.num_bits),
+            self.vec.astype(float),
+            self.num_bits,
+            exp_ops,
+        )
+
+    def stddev(self):
+        """Compute standard deviation estimate from distribution.
+
+        Returns:
+            float: Estimate of standard deviation upper-bound.
+
+        Raises:
+            M3Error: Missing shots or mitigation_overhead information.
+        """
+        if self.shots is None:
+            raise M3Error("Distribution is missing shots information.")
+        if self.mitigation_overhead is None:
+            raise M3Error("Distribution is missing mitigation overhead.")
+        return math.sqrt(self.mitigation_overhead / self.shots)
+
+    def expval_and_stddev(self, exp_ops=""):
+        """Compute expectation value and standard deviation estimate from distribution.
+
+        Parameters:
+            exp_ops (str or dict): String or dict representation of diagonal qubit operators
+                                   used in computing the expectation value.
+
+        Returns:
+            float: Expectation value.
+            float: Estimate of standard deviation upper-bound.
+        """
+        return self.expval(exp_ops), self.stddev()
+
+    def marginal(self, indices):
+        """Marginal distribution over a subset of the bits.
+
+        Parameters:
+            indices (array_like or str): Indices (bits) to keep, counted from the right
+                                         of the bit-string, or an operator string whose
+                                         non-identity positions are kept.
+
+        Returns:
+            ArrayQuasiDistribution or ArrayProbDistribution: Marginal distribution.
+
+        Raises:
+            M3Error: Operator length does not equal bit-string length.
+            M3Error: One or more indices is out of bounds.
+        """
+        if isinstance(indices, str):
+            indices = indices.upper()
+            if len(indices) != self.num_bits:
+                raise M3Error(
+                    "Operator length does not equal distribution bit-string length."
+                )
+            indices = [
+                self.num_bits - kk - 1
+                for kk in range(self.num_bits - 1, -1, -1)
+                if indices[kk] != "I"
+            ]
+        indices = [int(kk) for kk in indices]
+        if any(kk < 0 or kk >= self.num_bits for kk in indices):
+            raise M3Error("One or more indices is out of bounds.")
+        num_bytes = self.bitstrings.shape[1]
+        num_out = len(indices)
+        out_bytes = (num_out + 7) // 8
+        rows = np.zeros((len(self), out_bytes), dtype=np.uint8)
+        for pos, kk in enumerate(indices):
+            bit = (self.bitstrings[:, num_bytes - 1 - kk // 8] >> (kk % 8)) & 1
+            rows[:, out_bytes - 1 - pos // 8] |= bit << (pos % 8)
+        rows, vec, _ = counts_to_arrays((rows, self.vec), num_out)
+        return type(self)(rows, vec, num_out, self.shots, self.mitigation_overhead)
+
+
+class ArrayQuasiDistribution(_ArrayDistribution):
+    """An array-backed class for representing quasi-probabilities."""
+
+    __slots__ = ()
+
+    def nearest_probability_distribution(self, return_distance=False):
+        """Takes a quasiprobability distribution and maps
+        it to the closest probability distribution as defined by
+        the L2-norm.
+
+        Parameters:
+            return_distance (bool): Return the L2 distance between distributions.
+
+        Returns:
+            ArrayProbDistribution: Nearest probability distribution.
+            float: Euclidean (L2) distance of distributions.
+
+        Notes:
+            Method from Smolin et al., Phys. Rev. Lett. 108, 070502 (2012).
+        """
+        keep, probs, dist = nearest_probs(self.vec)
+        out = self._from_nearest(keep, probs)
+        if return_distance:
+            return out, dist[0]
+        return out
+
+    def _values_array(self):
+        return self.vec
+
+    def _from_nearest(self, keep, probs):
+        """ArrayProbDistribution from the output of nearest_probs."""
+        return ArrayProbDistribution(
+            self.bitstrings[keep],
+            probs[keep],
+            self.num_bits,
+            self.shots,
+            self.mitigation_overhead,
+        )
+
+
+class ArrayProbDistribution(_ArrayDistribution):
+    """An array-backed class for representing probabilities."""
+
+    __slots__ = ()
+
+    _dict_cls = ProbDistribution
 
 
 class QuasiCollection(list):
@@ -244,13 +515,14 @@ class QuasiCollection(list):
         """QuasiCollection constructor.
 
         Parameters:
-            data (list or QuasiCollection): List of QuasiDistribution instances.
+            data (list or QuasiCollection): List of QuasiDistribution or
+                                            ArrayQuasiDistribution instances.
 
         Raises:
             TypeError: Must be list of QuasiDistribution only.
         """
         for dd in data:
-            if not isinstance(dd, QuasiDistribution):
+            if not isinstance(dd, (QuasiDistribution, ArrayQuasiDistribution)):
                 raise TypeError("QuasiCollection requires QuasiDistribution instances.")
         super().__init__(data)
 
@@ -338,9 +610,19 @@ class QuasiCollection(list):
         Returns:
             ProbCollection: Collection of ProbDistributions.
         """
-        return ProbCollection(
-            [item.nearest_probability_distribution() for item in self]
-        )
+        if not self:
+            return ProbCollection([])
+        # All distributions are mapped together in one set of vectorized passes
+        vals = [item._values_array() for item in self]
+        lengths = [val.shape[0] for val in vals]
+        offsets = np.cumsum([0] + lengths[:-1])
+        keep, probs, _ = nearest_probs(np.concatenate(vals), offsets)
+        out = []
+        for idx, item in enumerate(self):
+            start = offsets[idx]
+            stop = start + lengths[idx]
+            out.append(item._from_nearest(keep[start:stop], probs[start:stop]))
+        return ProbCollection(out)
 
 
 class ProbCollection(list):
@@ -350,13 +632,14 @@ class ProbCollection(list):
         """ProbCollection constructor.
 
         Parameters:
-            data (list or ProbCollection): List of ProbDistribution instances.
+            data (list or ProbCollection): List of ProbDistribution or
+                                           ArrayProbDistribution instances.
 
         Raises:
             TypeError: Must be list of ProbDistribution only.
         """
         for dd in data:
-            if not isinstance(dd, ProbDistribution):
+            if not isinstance(dd, (ProbDistribution, ArrayProbDistribution)):
                 raise TypeError("ProbCollection requires ProbDistribution instances.")
         super().__init__(data)
 
@@ -437,3 +720,159 @@ class ProbCollection(list):
             ndarray: Array of standard deviations.
         """
         return np.array([item.stddev() for item in self], dtype=np.float32)
+
+
+class PartitionedQuasiDistribution:
+    """Quasi-probabilities of independent groups of bits."""
+
+    def __init__(self, dists, groups, num_bits):
+        """Quasi-probabilities of independent groups of bits.
+
+        The joint distribution is taken to be the product of the group
+        distributions, so expectation values of products of group-local
+        operators are products of group expectation values, and the joint
+        distribution is never built.
+
+        Parameters:
+            dists (QuasiCollection): Quasi-distribution of each group.
+            groups (list): Bit indices of each group, counted from the right of
+                           the full bit-string, in the order of the group bits.
+            num_bits (int): Number of bits in the full bit-string.
+
+        Raises:
+            M3Error: Number of distributions does not match number of groups.
+        """
+        if len(dists) != len(groups):
+            raise M3Error("Number of distributions does not match number of groups.")
+        self.dists = QuasiCollection(dists)
+        self.groups = [[int(kk) for kk in group] for group in groups]
+        self.num_bits = num_bits
+
+    def __repr__(self):
+        return "{}(groups={})".format(type(self).__name__, self.groups)
+
+    def __len__(self):
+        return len(self.dists)
+
+    def __getitem__(self, idx):
+        return self.dists[idx]
+
+    def __iter__(self):
+        return iter(self.dists)
+
+    @property
+    def shots(self):
+        """Number of shots taken to form the distribution.
+
+        Returns:
+            int: Shots.
+        """
+        return self.dists[0].shots
+
+    @property
+    def mitigation_overhead(self):
+        """Mitigation overhead of the product of the group distributions.
+
+        The inverse of a tensor product of matrices is the tensor product
+        of the inverses, whose one-norms multiply.
+
+        Returns:
+            float: Overhead, or None if missing for any group.
+        """
+        overheads = [dist.mitigation_overhead for dist in self.dists]
+        if any(item is None for item in overheads):
+            return None
+        return float(np.prod(overheads))
+
+    def group_operators(self, exp_op=""):
+        """Split an operator over the full bit-string into group operators.
+
+        Parameters:
+            exp_op (str): Diagonal operator over all bits, default is Z on
+                          all bits of the groups.
+
+        Returns:
+            list: Operator of each group, None where it is the identity.
+
+        Raises:
+            M3Error: Operator length does not equal bit-string length.
+            M3Error: Operator is not the identity on bits outside the groups.
+        """
+        if not exp_op:
+            return [""] * len(self.groups)
+        exp_op = exp_op.upper()
+        if len(exp_op) != self.num_bits:
+            raise M3Error(
+                "Operator length does not equal distribution bit-string length."
+            )
+        # Bit kk is character num_bits-kk-1 of the string
+        used = {kk for group in self.groups for kk in group}
+        if any(
+            exp_op[self.num_bits - kk - 1] != "I"
+            for kk in range(self.num_bits)
+            if kk not in used
+        ):
+            raise M3Error("Operator acts on bits outside of the groups.")
+        out = []
+        for group in self.groups:
+            group_op = "".join(exp_op[self.num_bits - kk - 1] for kk in reversed(group))
+            out.append(None if set(group_op) == {"I"} else group_op)
+        return out
+
+    def expval(self, exp_ops=""):
+        """Expectation value of products of group-local diagonal operators.
+
+        Parameters:
+            exp_ops (str or list): Operator strings over the full bit-string.  The
+                                   default is Z on all bits of the groups.
+
+        Returns:
+            float or ndarray: Expectation value, or one per operator.
+
+        Raises:
+            M3Error: Invalid type passed to exp_ops.
+        """
+        if isinstance(exp_ops, str):
+            return self.expval([exp_ops])[0]
+        if not isinstance(exp_ops, list) or not all(
+            isinstance(item, str) for item in exp_ops
+        ):
+            raise M3Error("Invalid type passed to exp_ops")
+        split_ops = [self.group_operators(op) for op in exp_ops]
+        out = np.ones(len(exp_ops), dtype=float)
+        for idx, dist in enumerate(self.dists):
+            # Operators of each group are evaluated together in one pass
+            positions = [
+                pos for pos, ops in enumerate(split_ops) if ops[idx] is not None
+            ]
+            if positions:
+                vals = dist.expval([split_ops[pos][idx] for pos in positions])
+                out[positions] *= vals
+        return out.astype(np.float32)
+
+    def stddev(self):
+        """Compute standard deviation estimate from distribution.
+
+        Returns:
+            float: Estimate of standard deviation upper-bound.
+
+        Raises:
+            M3Error: Missing shots or mitigation_overhead information.
+        """
+        if self.shots is None:
+            raise M3Error("Quasi-dist is missing shots information.")
+        if self.mitigation_overhead is None:
+            raise M3Error("Quasi-dist is missing mitigation overhead.")
+        return math.sqrt(self.mitigation_overhead / self.shots)
+
+    def expval_and_stddev(self, exp_ops=""):
+        """Compute expectation value and standard deviation estimate from distribution.
+
+        Parameters:
+            exp_ops (str or list): Operator strings over the full bit-string.
+
+        Returns:
+            float: Expectation value.
+            float: Estimate of standard deviation upper-bound.
+        """
+        return self.expval(exp_ops), self.stddev()
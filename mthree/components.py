@@ -0,0 +1,167 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module, invalid-name
+"""Connected-component solver routines"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+from mthree.matvec import M3MatVec, neighbor_index
+from mthree.converters import bytes_to_packed
+from mthree.utils import vector_to_quasiprobs, bytes_to_bitstrings
+
+logger = logging.getLogger(__name__)
+
+# Size of the largest component solved with the direct method when the
+# mitigator has no iter_threshold, larger ones use the iterative method
+DIRECT_BLOCK_ELEMS = 1024
+
+
+def bitstring_components(rows, num_bits, distance):
+    """Connected components of the graph of bit-strings within distance of one another.
+
+    Elements of the reduced A-matrix between bit-strings in different components
+    are zero, so each component is an independent block of the matrix.
+
+    Parameters:
+        rows (ndarray): 2D uint8 array of bit-string bytes.
+        num_bits (int): Number of bits in a bit-string.
+        distance (int): Distance to correct for.
+
+    Returns:
+        int: Number of components.
+        ndarray: Component label of each bit-string.
+    """
+    num_elems = rows.shape[0]
+    if distance >= num_bits:
+        return 1, np.zeros(num_elems, dtype=np.int32)
+    bitstrings = bytes_to_packed(rows, num_bits)
+    row_ptrs, col_inds, _ = neighbor_index(bitstrings, num_bits, num_elems, distance)
+    num_nbrs = row_ptrs[num_elems]
+    graph = sp.csr_matrix(
+        (
+            np.ones(num_nbrs, dtype=np.int8),
+            col_inds[:num_nbrs].astype(np.int64),
+            row_ptrs.astype(np.int64),
+        ),
+        shape=(num_elems, num_elems),
+    )
+    return connected_components(graph, directed=False)
+
+
+def component_solver(
+    mitigator,
+    counts,
+    qubits,
+    distance,
+    return_mitigation_overhead=False,
+    array_output=False,
+    max_workers=1,
+    **options,
+):
+    """Apply the mitigation by solving each connected component separately.
+
+    Components with a single bit-string need no solve.  Components of up to
+    the mitigator's iter_threshold bit-strings, or DIRECT_BLOCK_ELEMS if it
+    is not set, use the direct solver and larger ones the iterative solver.
+
+    Parameters:
+        counts (tuple): Tuple of unique bit-string bytes and counts from
+                        counts_to_arrays.
+        qubits (int): Qubits over which to calibrate.
+        distance (int): Distance to correct for.
+        return_mitigation_overhead (bool): Returns the mitigation overhead, default=False.
+        array_output (bool): Return an ArrayQuasiDistribution, default=False.
+        max_workers (int): Number of threads solving components, default=1.
+        **options: Options of the iterative solver passed to the correction
+                   of each component.
+
+    Returns:
+        QuasiDistribution: dict of Quasiprobabilites
+        ndarray: Column norms.
+        float: Mitigation overhead, or None if not requested.
+        dict: Number of components and size of the largest one.
+    """
+    rows, cnts = counts
+    num_bits = len(qubits)
+    num_elems = rows.shape[0]
+    probs = np.asarray(cnts / cnts.sum(), dtype=np.float32)
+
+    st = time.perf_counter()
+    num_comps, labels = bitstring_components(rows, num_bits, distance)
+    # Indices of the bit-strings of each component, in bit-string order
+    order = np.argsort(labels, kind="stable")
+    sizes = np.bincount(labels, minlength=num_comps)
+    members = np.split(order, np.cumsum(sizes)[:-1])
+    logger.info(
+        f"Found {num_comps} components, largest has {sizes.max()} elements, "
+        f"in {time.perf_counter()-st}"
+    )
+
+    # A lone bit-string only has its diagonal element, which is also its
+    # column norm, so its quasi-probability is its probability
+    out = probs.copy()
+    col_norms = np.empty(num_elems, dtype=np.float32)
+    lone = order[np.repeat(sizes == 1, sizes)]
+    if lone.shape[0]:
+        M = M3MatVec(
+            (bytes_to_packed(rows[lone], num_bits), probs[lone], num_bits),
+            mitigator._form_cals(qubits),
+            0,
+        )
+        col_norms[lone] = M.get_col_norms()
+    gamma = 1.0 if return_mitigation_overhead else None
+    max_direct = mitigator.iter_threshold
+    if max_direct is None:
+        max_direct = DIRECT_BLOCK_ELEMS
+
+    def _solve(idx):
+        sub_cnts = cnts[idx]
+        quasi, info = mitigator._apply_correction(
+            (rows[idx], sub_cnts),
+            qubits,
+            distance=distance,
+            method="direct" if idx.shape[0] <= max_direct else "iterative",
+            return_mitigation_overhead=return_mitigation_overhead,
+            details=True,
+            array_output=True,
+            **options,
+        )
+        # Components are solved with their own probabilities, so scale
+        # by the fraction of the shots they hold
+        return quasi, info, sub_cnts.sum() / cnts.sum()
+
+    blocks = [idx for idx in members if idx.shape[0] > 1]
+    if max_workers > 1 and len(blocks) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_solve, blocks))
+    else:
+        results = [_solve(idx) for idx in blocks]
+
+    for idx, (quasi, info, weight) in zip(blocks, results):
+        out[idx] = quasi.vec * weight
+        col_norms[idx] = info["col_norms"]
+        if return_mitigation_overhead:
+            # The inverse of a block diagonal matrix has the largest
+            # one-norm of the inverses of its blocks
+            gamma = max(gamma, np.sqrt(quasi.mitigation_overhead))
+
+    if array_output:
+        quasi = vector_to_quasiprobs(out, rows, num_bits)
+    else:
+        quasi = vector_to_quasiprobs(out, bytes_to_bitstrings(rows, num_bits))
+    info = {"components": num_comps, "largest_component": int(sizes.max())}
+    return quasi, col_norms, gamma, info
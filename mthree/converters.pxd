@@ -12,6 +12,7 @@
 # cython: c_string_type=unicode, c_string_encoding=UTF-8
 from libcpp.map cimport map
 from libcpp.string cimport string
+from libc.stdint cimport uint64_t
 
 
 cdef void counts_to_internal(map[string, float] * counts,
@@ -30,3 +31,10 @@ cdef void _core_counts_to_bp(map[string, float] * counts_map,
                              float shots,
                              unsigned char * bitstrings,
                              float * probs)
+
+
+cdef void _core_counts_to_packed(map[string, float] * counts_map,
+                                 unsigned int num_bits,
+                                 float shots,
+                                 uint64_t * bitstrings,
+                                 float * probs) noexcept nogil
@@ -13,10 +13,14 @@
 cimport cython
 import numpy as np
 cimport numpy as np
+from qiskit.primitives import BitArray
 from libcpp.map cimport map
 from libcpp.string cimport string
+from libc.stdint cimport uint64_t
 from cython.operator cimport dereference, postincrement
 
+from mthree.exceptions import M3Error
+
 @cython.boundscheck(False)
 @cython.cdivision(True)
 cdef void counts_to_internal(map[string, float] * counts_map,
@@ -94,6 +98,156 @@ def counts_to_bitstrings_and_probs(object counts):
     return np.asarray(bitstrings), np.asarray(probs)
 
 
+def counts_to_packed_and_probs(object counts):
+    """Convert counts to NumPy arrays of packed bitstrings and probabilities
+
+    Bit ``k`` of a bitstring (counting from the left of the string) is stored
+    in word ``k // 64`` at bit position ``k % 64``.
+
+    Parameters:
+        counts (object): Dict or Counts object of counts data
+
+    Returns:
+        ndarray: 2D array of uint64 packed bitstrings, one row per bitstring
+        ndarray: Array of float probabilities
+    """
+    cdef float shots = sum(counts.values())
+    cdef map[string, float] counts_map = counts
+    cdef unsigned int num_elems = counts_map.size()
+    cdef unsigned int num_bits = len(next(iter(counts)))
+    cdef unsigned int num_words = (num_bits + 63) // 64
+
+    cdef uint64_t[::1] bitstrings = np.empty(num_words*num_elems, dtype=np.uint64)
+    cdef float[::1] probs = np.empty(num_elems, dtype=np.float32)
+
+    _core_counts_to_packed(&counts_map, num_bits, shots,
+                           &bitstrings[0], &probs[0])
+
+    return np.asarray(bitstrings).reshape(num_elems, num_words), np.asarray(probs)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def bytes_to_packed(const unsigned char[:, ::1] rows, unsigned int num_bits):
+    """Convert big-endian bit-string bytes, as used by Qiskit ``BitArray``,
+    to packed bitstrings
+
+    Bit ``k`` of a bitstring (counting from the left of the string) is stored
+    in word ``k // 64`` at bit position ``k % 64``.
+
+    Parameters:
+        rows (ndarray): 2D uint8 array, one row of bytes per bitstring
+        num_bits (int): Number of bits in a bitstring
+
+    Returns:
+        ndarray: 1D array of uint64 packed bitstrings
+    """
+    cdef size_t num_elems = rows.shape[0]
+    cdef unsigned int num_bytes = rows.shape[1]
+    cdef unsigned int num_words = (num_bits + 63) // 64
+    cdef uint64_t[::1] bitstrings = np.zeros(num_words*num_elems, dtype=np.uint64)
+    cdef size_t idx
+    cdef unsigned int letter, pos
+    if num_bytes != (num_bits + 7) // 8:
+        raise ValueError('Number of bytes does not match number of bits.')
+    with nogil:
+        for idx in range(num_elems):
+            for letter in range(num_bits):
+                # Position of the letter counting from the least significant bit
+                pos = num_bits - 1 - letter
+                if (rows[idx, num_bytes - 1 - (pos >> 3)] >> (pos & 7)) & 1:
+                    bitstrings[num_words*idx + (letter >> 6)] |= (<uint64_t>1) << (letter & 63)
+    return np.asarray(bitstrings)
+
+
+def counts_to_arrays(counts, num_bits=None):
+    """Return the unique bit-strings and their counts as arrays.
+
+    Bit-strings are stored as rows of big-endian bytes, the same layout
+    as a Qiskit ``BitArray``, so that the rightmost bit of a bit-string is
+    the lowest bit of the last byte in its row.
+
+    Parameters:
+        counts (BitArray or tuple): A ``BitArray``, or a tuple of a 2D uint8 array
+                                    of bit-string bytes and a 1D array of counts.
+        num_bits (int): Number of bits, required if counts is a tuple.
+
+    Returns:
+        ndarray: 2D uint8 array of unique bit-strings, sorted in bit-string order.
+        ndarray: 1D float array of counts.
+        int: Number of bits.
+
+    Raises:
+        M3Error: Number of bytes does not match number of bits.
+        M3Error: Length of counts does not match number of bit-strings.
+    """
+    if isinstance(counts, BitArray):
+        num_bits = counts.num_bits
+        rows = counts.array.reshape(-1, counts.array.shape[-1])
+        weights = None
+    else:
+        rows, weights = counts
+        rows = np.asarray(rows, dtype=np.uint8)
+        if rows.ndim == 1:
+            rows = rows.reshape(-1, 1)
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape[0] != rows.shape[0]:
+            raise M3Error("Length of counts does not match number of bit-strings.")
+    num_bytes = rows.shape[1]
+    if num_bytes != (num_bits + 7) // 8:
+        raise M3Error(
+            f"Number of bytes ({num_bytes}) does not match number of bits ({num_bits})."
+        )
+    if num_bytes <= 8:
+        # Big-endian bytes as integers sort in bit-string order
+        padded = np.zeros((rows.shape[0], 8), dtype=np.uint8)
+        padded[:, 8 - num_bytes :] = rows
+        _, index, inverse = np.unique(
+            padded.view(">u8").ravel(), return_index=True, return_inverse=True
+        )
+        unique_rows = rows[index]
+    else:
+        unique_rows, inverse = np.unique(rows, axis=0, return_inverse=True)
+    out_counts = np.bincount(
+        inverse.ravel(), weights=weights, minlength=unique_rows.shape[0]
+    ).astype(float)
+    return np.ascontiguousarray(unique_rows), out_counts, num_bits
+
+
+def bytes_to_bitstrings(rows, num_bits):
+    """Return the bit-strings stored as rows of big-endian bytes.
+
+    Parameters:
+        rows (ndarray): 2D uint8 array of bit-string bytes.
+        num_bits (int): Number of bits.
+
+    Returns:
+        list: Bit-strings.
+    """
+    rows = np.asarray(rows, dtype=np.uint8)
+    bits = np.unpackbits(rows, axis=1)[:, rows.shape[1] * 8 - num_bits :]
+    chars = np.ascontiguousarray(bits + ord("0"))
+    return chars.view(f"S{num_bits}").ravel().astype(f"U{num_bits}").tolist()
+
+
+def bitstrings_to_bytes(object bitstrings, unsigned int num_bits):
+    """Return bit-strings as rows of big-endian bytes.
+
+    Parameters:
+        bitstrings (iterable): Bit-strings.
+        num_bits (int): Number of bits.
+
+    Returns:
+        ndarray: 2D uint8 array of bit-string bytes.
+    """
+    chars = np.array(list(bitstrings), dtype=f"S{num_bits}")
+    bits = chars.view(np.uint8).reshape(-1, num_bits) - ord("0")
+    pad = (-num_bits) % 8
+    if pad:
+        bits = np.pad(bits, ((0, 0), (pad, 0)))
+    return np.packbits(bits, axis=1)
+
+
 @cython.cdivision(True)
 cdef void _core_counts_to_bp(map[string, float] * counts_map,
                              unsigned int num_bits,
@@ -114,3 +268,39 @@ cdef void _core_counts_to_bp(map[string, float] * counts_map,
             bitstrings[start+letter] = <unsigned char>temp[letter]-48
         idx += 1
         postincrement(it)
+
+
+@cython.boundscheck(False)
+@cython.cdivision(True)
+cdef void _core_counts_to_packed(map[string, float] * counts_map,
+                                 unsigned int num_bits,
+                                 float shots,
+                                 uint64_t * bitstrings,
+                                 float * probs) noexcept nogil:
+    """Converts counts into an array of packed bitstrings and probabilities.
+
+    Parameters:
+        counts_map (map *): Pointer to sorted map of counts.
+        num_bits (unsigned int): Number of bits in the bitstrings.
+        shots (float): Total number of shots.
+        bitstrings (uint64_t *): Pointer to array of packed bitstrings to populate.
+        probs (float *): Pointer to array of probabilities to populate.
+    """
+    cdef unsigned int idx, letter, word
+    cdef unsigned int num_words = (num_bits + 63) // 64
+    cdef size_t start
+    cdef map[string, float].iterator end = counts_map.end()
+    cdef map[string, float].iterator it = counts_map.begin()
+    cdef string temp
+    idx = 0
+    while it != end:
+        start = <size_t>num_words*idx
+        for word in range(num_words):
+            bitstrings[start+word] = 0
+        probs[idx] = dereference(it).second / shots
+        temp = dereference(it).first
+        for letter in range(num_bits):
+            if temp[letter] == 49:
+                bitstrings[start+(letter >> 6)] |= (<uint64_t>1) << (letter & 63)
+        idx += 1
+        postincrement(it)
@@ -11,10 +11,13 @@
 # that they have been altered from the originals.
 # pylint: disable=no-name-in-module, invalid-name
 """Direct solver routines"""
+
+import numpy as np
 import scipy.linalg as la
 
-from mthree.matrix import _reduced_cal_matrix
-from mthree.utils import counts_to_vector, vector_to_quasiprobs
+from mthree.matrix import _reduced_cal_matrix, _packed_cal_matrix
+from mthree.converters import bytes_to_packed
+from mthree.utils import counts_to_vector, vector_to_quasiprobs, bytes_to_bitstrings
 from mthree.norms import ainv_onenorm_est_lu
 from mthree.exceptions import M3Error
 
@@ -55,27 +58,83 @@ def reduced_cal_matrix(mitigator, counts, qubits, distance=None):
 
 
 def direct_solver(
-    mitigator, counts, qubits, distance=None, return_mitigation_overhead=False
+    mitigator,
+    counts,
+    qubits,
+    distance=None,
+    return_mitigation_overhead=False,
+    array_output=False,
 ):
     """Apply the mitigation using direct LU factorization.
 
     Parameters:
-        counts (dict): Input counts dict.
+        counts (dict or tuple): Input counts dict, or tuple of unique bit-string
+                                bytes and counts from counts_to_arrays.
         qubits (int): Qubits over which to calibrate.
         distance (int): Distance to correct for. Default=num_bits
         return_mitigation_overhead (bool): Returns the mitigation overhead, default=False.
+        array_output (bool): Return an ArrayQuasiDistribution for tuple counts,
+                             default=False.
 
     Returns:
         QuasiDistribution: dict of Quasiprobabilites
     """
     cals = mitigator._form_cals(qubits)
     num_bits = len(qubits)
-    A, sorted_counts, col_norms = _reduced_cal_matrix(counts, cals, num_bits, distance)
-    vec = counts_to_vector(sorted_counts)
-    LU = la.lu_factor(A, check_finite=False)
+    packed = isinstance(counts, tuple)
+    cache = getattr(mitigator, "solver_cache", None)
+    entry = None
+    if cache is not None:
+        key = cache.key("direct", qubits, distance, counts, mitigator.cals_version)
+        entry = cache.get(key)
+        # The overhead estimate needs the matrix itself, which is not cached
+        if entry is not None and return_mitigation_overhead and entry["gamma"] is None:
+            entry = None
+
+    sorted_counts = None
+    if entry is None:
+        if packed:
+            A, col_norms = _packed_cal_matrix(
+                bytes_to_packed(counts[0], num_bits), cals, num_bits, distance
+            )
+        else:
+            A, sorted_counts, col_norms = _reduced_cal_matrix(
+                counts, cals, num_bits, distance
+            )
+        LU = la.lu_factor(A, check_finite=False)
+        gamma = None
+        if return_mitigation_overhead:
+            gamma = ainv_onenorm_est_lu(A, LU)
+        if cache is not None:
+            cache.put(
+                key,
+                {
+                    "LU": LU,
+                    "col_norms": col_norms,
+                    "gamma": gamma,
+                    "bitstrings": None if packed else list(sorted_counts),
+                },
+                LU[0].nbytes + LU[1].nbytes + col_norms.nbytes,
+            )
+    else:
+        # Same bit-strings as a previous solve, so only back-substitution is needed
+        LU = entry["LU"]
+        col_norms = entry["col_norms"]
+        gamma = entry["gamma"]
+        if not packed:
+            sorted_counts = {
+                bitstring: counts[bitstring] for bitstring in entry["bitstrings"]
+            }
+    if packed:
+        # Unique bit-strings from counts_to_arrays are already sorted
+        vec = np.asarray(counts[1] / counts[1].sum(), dtype=np.float32)
+    else:
+        vec = counts_to_vector(sorted_counts)
     x = la.lu_solve(LU, vec, check_finite=False)
-    gamma = None
-    if return_mitigation_overhead:
-        gamma = ainv_onenorm_est_lu(A, LU)
-    out = vector_to_quasiprobs(x, sorted_counts)
+    if packed and array_output:
+        out = vector_to_quasiprobs(x, counts[0], num_bits)
+    elif packed:
+        out = vector_to_quasiprobs(x, bytes_to_bitstrings(counts[0], num_bits))
+    else:
+        out = vector_to_quasiprobs(x, sorted_counts)
     return out, col_norms, gamma
@@ -21,6 +21,7 @@ cimport cython
 from libcpp cimport bool
 from libc.math cimport sqrt
 from libcpp.string cimport string
+from libc.stdint cimport uint64_t
 
 OP_CONVERT = {'Z' : 0, 'I': 1, '0': 2, '1': 3}
 cdef int[8] OPER_MAP = [1, -1, 1, 1, 1, 0, 0, 1]
@@ -73,3 +74,117 @@ def exp_val(object dist, str exp_ops='', dict dict_ops={}):
         exp_val += val * oper_prod
     
     return exp_val
+
+
+cdef extern from "src/expval.h" nogil:
+    void batched_expval(double * out,
+                        const uint64_t * bitstrings,
+                        const double * vals,
+                        size_t num_elems,
+                        unsigned int num_bits,
+                        const uint64_t * z_masks,
+                        const uint64_t * proj_masks,
+                        const uint64_t * proj_vals,
+                        unsigned int num_ops)
+
+
+def operator_masks(list exp_ops, unsigned int num_bits):
+    """Encode diagonal operators as packed bit masks.
+
+    Bit-string character k is bit k % 64 of word k // 64, as in the
+    packed bit-strings used by the matrix-free operator.
+
+    Parameters:
+        exp_ops (list): String representations of qubit operators,
+                        an empty string is all Z.
+        num_bits (int): Number of bits.
+
+    Returns:
+        ndarray: Z masks, one row per operator.
+        ndarray: Projector masks, one row per operator.
+        ndarray: Projector values, one row per operator.
+
+    Raises:
+        M3Error: exp_ops length does not equal number of bits.
+        M3Error: Invalid operator.
+    """
+    cdef size_t num_words = (num_bits + 63) // 64
+    cdef size_t idx, kk
+    cdef uint64_t bit
+    cdef uint64_t[:, ::1] z_masks = np.zeros((len(exp_ops), num_words), dtype=np.uint64)
+    cdef uint64_t[:, ::1] proj_masks = np.zeros((len(exp_ops), num_words), dtype=np.uint64)
+    cdef uint64_t[:, ::1] proj_vals = np.zeros((len(exp_ops), num_words), dtype=np.uint64)
+    for idx, op in enumerate(exp_ops):
+        op = op.upper() if op else 'Z'*num_bits
+        if len(op) != num_bits:
+            raise M3Error('exp_ops length does not equal number of bits.')
+        for kk in range(num_bits):
+            bit = (<uint64_t>1) << (kk & 63)
+            if op[kk] == 'Z':
+                z_masks[idx, kk >> 6] |= bit
+            elif op[kk] == '0' or op[kk] == '1':
+                proj_masks[idx, kk >> 6] |= bit
+                if op[kk] == '1':
+                    proj_vals[idx, kk >> 6] |= bit
+            elif op[kk] != 'I':
+                raise M3Error('Invalid operator {}.'.format(op[kk]))
+    return np.asarray(z_masks), np.asarray(proj_masks), np.asarray(proj_vals)
+
+
+@cython.boundscheck(False)
+def packed_exp_vals(const uint64_t[::1] bitstrings, const double[::1] vals,
+                    unsigned int num_bits, list exp_ops):
+    """Computes expectation values of many diagonal operators over
+    packed bit-strings in a single pass.
+
+    Parameters:
+        bitstrings (ndarray): Packed bit-strings.
+        vals (ndarray): Value of each bit-string.
+        num_bits (int): Number of bits.
+        exp_ops (list): String representations of qubit operators.
+
+    Returns:
+        ndarray: Expectation values, one per operator.
+    """
+    z_masks, proj_masks, proj_vals = operator_masks(exp_ops, num_bits)
+    cdef const uint64_t[:, ::1] z_view = z_masks
+    cdef const uint64_t[:, ::1] pm_view = proj_masks
+    cdef const uint64_t[:, ::1] pv_view = proj_vals
+    cdef double[::1] out = np.zeros(len(exp_ops), dtype=float)
+    cdef size_t num_elems = vals.shape[0]
+    cdef unsigned int num_ops = len(exp_ops)
+    if num_ops == 0 or num_elems == 0:
+        return np.asarray(out)
+    with nogil:
+        batched_expval(&out[0], &bitstrings[0], &vals[0], num_elems, num_bits,
+                       &z_view[0, 0], &pm_view[0, 0], &pv_view[0, 0], num_ops)
+    return np.asarray(out)
+
+
+@cython.boundscheck(False)
+def exp_vals(object dist, list exp_ops):
+    """Computes expectation values of many diagonal operators
+    in a single pass over a distribution.
+
+    Parameters:
+        dist (dict): Input quasi-probability distribution.
+        exp_ops (list): String representations of qubit operators,
+                        an empty string is all Z.
+
+    Returns:
+        ndarray: Expectation values, one per operator.
+    """
+    cdef unsigned int num_bits = len(next(iter(dist)))
+    cdef size_t num_words = (num_bits + 63) // 64
+    cdef size_t num_elems = len(dist)
+    cdef uint64_t[::1] bitstrings = np.zeros(num_elems*num_words, dtype=np.uint64)
+    cdef double[::1] vals = np.empty(num_elems, dtype=float)
+    cdef string key
+    cdef size_t idx = 0, kk
+    for key, val in dist.items():
+        vals[idx] = val
+        for kk in range(num_bits):
+            if key[kk] == 49:
+                bitstrings[idx*num_words+(kk >> 6)] |= (<uint64_t>1) << (kk & 63)
+        idx += 1
+    return packed_exp_vals(bitstrings, vals, num_bits, exp_ops)
@@ -11,6 +11,7 @@
 # that they have been altered from the originals.
 # pylint: disable=no-name-in-module, invalid-name
 """Iterative solver routines"""
+
 import logging
 import time
 import numpy as np
@@ -18,7 +19,10 @@ import scipy.sparse.linalg as spla
 
 from mthree.norms import ainv_onenorm_est_iter
 from mthree.matvec import M3MatVec
-from mthree.utils import counts_to_vector, vector_to_quasiprobs
+from mthree.precond import build_preconditioner
+from mthree.converters import bytes_to_packed
+from mthree.utils import counts_to_vector, vector_to_quasiprobs, bytes_to_bitstrings
+from mthree.classes import ArrayQuasiDistribution
 from mthree.exceptions import M3Error
 
 logger = logging.getLogger(__name__)
@@ -34,11 +38,16 @@ def iterative_solver(
     details=0,
     callback=None,
     return_mitigation_overhead=False,
+    backend="scipy",
+    array_output=False,
+    previous=None,
+    preconditioner="jacobi",
 ):
-    """Compute solution using GMRES and Jacobi preconditioning.
+    """Compute solution using preconditioned GMRES.
 
     Parameters:
-        counts (dict): Input counts dict.
+        counts (dict or tuple): Input counts dict, or tuple of unique bit-string
+                                bytes and counts from counts_to_arrays.
         qubits (int): Qubits over which to calibrate.
         tol (float): Tolerance to use.
         max_iter (int): Maximum number of iterations to perform.
@@ -46,45 +55,150 @@ def iterative_solver(
         details (bool): Return col norms.
         callback (callable): Callback function to record iteration count.
         return_mitigation_overhead (bool): Returns the mitigation overhead, default=False.
+        backend (str): GMRES implementation, 'scipy' (default) or 'native'.
+        array_output (bool): Return an ArrayQuasiDistribution for tuple counts,
+                             default=False.
+        previous (QuasiDistribution or ArrayQuasiDistribution): Solution of a related
+                                                                correction used as the
+                                                                initial guess.
+        preconditioner (str): 'jacobi' (default), 'block', or 'ilu'.
 
     Returns:
         QuasiDistribution: dict of Quasiprobabilites
 
     Raises:
         M3Error: Solver did not converge.
+        M3Error: Invalid backend.
+        M3Error: Native backend with a preconditioner other than Jacobi.
     """
+    if backend not in ["scipy", "native"]:
+        raise M3Error(f"Invalid iterative backend {backend}.")
+    if backend == "native" and preconditioner != "jacobi":
+        raise M3Error("Native backend only supports the jacobi preconditioner.")
     cals = mitigator._form_cals(qubits)
+    cache = getattr(mitigator, "solver_cache", None)
+    entry = None
+    if cache is not None:
+        key = cache.key("iterative", qubits, distance, counts, mitigator.cals_version)
+        entry = cache.get(key)
+
+    packed = isinstance(counts, tuple)
+    x0 = None
+    P = None
+    P_bytes = 0
+    if entry is None:
+        st = time.perf_counter()
+        if packed:
+            probs = np.asarray(counts[1] / counts[1].sum(), dtype=np.float32)
+            bitstrings = bytes_to_packed(counts[0], len(qubits))
+            M = M3MatVec((bitstrings, probs, len(qubits)), cals, distance)
+        else:
+            M = M3MatVec(dict(counts), cals, distance)
+        fin = time.perf_counter()
+        logger.info(f"MatVec build time is {fin-st}")
+        sorted_counts = M.sorted_counts
+        st = time.perf_counter()
+        vec = np.asarray(M.probs, np.float32)
+        fin = time.perf_counter()
+        logger.info(f"Counts to vector time: {fin-st}")
+    else:
+        # Same bit-strings as a previous solve, so reuse its operator and
+        # preconditioner, and start GMRES from its solution.
+        logger.info("Using cached MatVec")
+        M = entry["matvec"]
+        x0 = entry["solution"]
+        if entry["preconditioner"][0] == preconditioner:
+            _, P, P_bytes = entry["preconditioner"]
+        if packed:
+            sorted_counts = None
+            vec = np.asarray(counts[1] / counts[1].sum(), dtype=np.float32)
+        else:
+            sorted_counts = {
+                bitstring: counts[bitstring] for bitstring in M.sorted_counts
+            }
+            vec = counts_to_vector(sorted_counts)
+
+    if previous is not None:
+        x0 = _initial_guess(previous, counts, sorted_counts, vec, len(qubits))
+
+    if backend == "native":
+        st = time.perf_counter()
+        out, error, resids = M.gmres(vec, tol=tol, max_iter=max_iter, x0=x0)
+        fin = time.perf_counter()
+        logger.info(f"Iterative solver time: {fin-st}")
+        # The solve runs without calling back into Python, so replay
+        # the residual history afterwards.
+        if callback is not None:
+            for res in resids:
+                callback(res)
+    else:
+        if P is None:
+            P, P_bytes = build_preconditioner(M, preconditioner)
+        out, error = _scipy_gmres(M, vec, tol, max_iter, callback, x0, P)
+    if error:
+        raise M3Error("GMRES did not converge: {}".format(error))
+
+    gamma = None if entry is None else entry["gamma"]
+    if return_mitigation_overhead and gamma is None:
+        gamma = ainv_onenorm_est_iter(M, tol=tol, max_iter=max_iter, P=P)
+
+    if cache is not None:
+        cache.put(
+            key,
+            {
+                "matvec": M,
+                "solution": out,
+                "gamma": gamma,
+                "preconditioner": (preconditioner, P, P_bytes),
+            },
+            M.nbytes + out.nbytes + P_bytes,
+        )
+
     st = time.perf_counter()
-    M = M3MatVec(dict(counts), cals, distance)
+    if packed and array_output:
+        quasi = vector_to_quasiprobs(out, counts[0], len(qubits))
+    elif packed:
+        quasi = vector_to_quasiprobs(out, bytes_to_bitstrings(counts[0], len(qubits)))
+    else:
+        quasi = vector_to_quasiprobs(out, sorted_counts)
     fin = time.perf_counter()
-    logger.info(f"MatVec build time is {fin-st}")
+    logger.info(f"Vector to quasi time: {fin-st}")
+    if details:
+        return quasi, M.get_col_norms(), gamma
+    return quasi, gamma
+
+
+def _scipy_gmres(M, vec, tol, max_iter, callback, x0=None, P=None):
+    """Solve using SciPy GMRES.
+
+    Parameters:
+        M (M3MatVec): Reduced A-matrix.
+        vec (ndarray): Right-hand side.
+        tol (float): Tolerance to use.
+        max_iter (int): Maximum number of iterations to perform.
+        callback (callable): Callback function to record iteration count.
+        x0 (ndarray): Initial guess, default is zeros.
+        P (LinearOperator): Preconditioner, Jacobi if not given.
+
+    Returns:
+        ndarray: Solution vector.
+        int: Convergence info from GMRES.
+    """
     L = spla.LinearOperator(
         (M.num_elems, M.num_elems),
         matvec=M.matvec,
         rmatvec=M.rmatvec,
+        matmat=M.matmat,
+        rmatmat=M.rmatmat,
         dtype=np.float32,
     )
-    st = time.perf_counter()
-    diags = M.get_diagonal()
-    fin = time.perf_counter()
-    logger.info(f"Diagonal build time: {fin-st}")
-
-    def precond_matvec(x):
-        out = x / diags
-        return out
-
-    P = spla.LinearOperator(
-        (M.num_elems, M.num_elems), precond_matvec, dtype=np.float32
-    )
-    st = time.perf_counter()
-    vec = np.asarray(M.probs, np.float32)
-    fin = time.perf_counter()
-    logger.info(f"Counts to vector time: {fin-st}")
-
+    if P is None:
+        P, _ = build_preconditioner(M)
     st = time.perf_counter()
     out, error = spla.gmres(
         L,
         vec,
+        x0=x0,
         rtol=tol,
         atol=tol,
         maxiter=max_iter,
@@ -94,17 +208,53 @@ def iterative_solver(
     )
     fin = time.perf_counter()
     logger.info(f"Iterative solver time: {fin-st}")
-    if error:
-        raise M3Error("GMRES did not converge: {}".format(error))
+    return out, error
 
-    gamma = None
-    if return_mitigation_overhead:
-        gamma = ainv_onenorm_est_iter(M, tol=tol, max_iter=max_iter)
 
-    st = time.perf_counter()
-    quasi = vector_to_quasiprobs(out, M.sorted_counts)
-    fin = time.perf_counter()
-    logger.info(f"Vector to quasi time: {fin-st}")
-    if details:
-        return quasi, M.get_col_norms(), gamma
-    return quasi, gamma
+def _initial_guess(previous, counts, sorted_counts, vec, num_bits):
+    """Initial guess mapped from the solution of a related correction.
+
+    Bit-strings that are not in the previous solution start from their
+    measured probability.
+
+    Parameters:
+        previous (QuasiDistribution or ArrayQuasiDistribution): Previous solution.
+        counts (dict or tuple): Input counts dict, or tuple of unique bit-string
+                                bytes and counts.
+        sorted_counts (dict): Counts in the order of vec, None for tuple counts.
+        vec (ndarray): Right-hand side.
+        num_bits (int): Number of bits in a bit-string.
+
+    Returns:
+        ndarray: Initial guess in the order of vec.
+    """
+    x0 = np.array(vec, dtype=np.float32)
+    if (
+        sorted_counts is None
+        and isinstance(previous, ArrayQuasiDistribution)
+        and previous.num_bits == num_bits
+    ):
+        # Match rows of bytes without building bit-strings
+        _, new_idx, old_idx = np.intersect1d(
+            _row_view(counts[0]),
+            _row_view(previous.bitstrings),
+            assume_unique=True,
+            return_indices=True,
+        )
+        x0[new_idx] = previous.vec[old_idx]
+        return x0
+    if sorted_counts is None:
+        keys = bytes_to_bitstrings(counts[0], num_bits)
+    else:
+        keys = sorted_counts
+    for idx, key in enumerate(keys):
+        val = previous.get(key)
+        if val is not None:
+            x0[idx] = val
+    return x0
+
+
+def _row_view(rows):
+    """View each row of a 2D uint8 array as a single comparable element."""
+    rows = np.ascontiguousarray(rows, dtype=np.uint8)
+    return rows.view(np.dtype((np.void, rows.shape[1]))).ravel()
@@ -16,12 +16,12 @@ import numpy as np
 cimport numpy as np
 np.import_array()
 
-from libc.stdlib cimport malloc, free
 from libcpp.map cimport map
 from libcpp.string cimport string
 from libcpp cimport bool
+from libc.stdint cimport uint64_t
 
-from .converters cimport counts_to_internal
+from .converters cimport _core_counts_to_packed
 
 
 cdef extern from "src/distance.h" nogil:
@@ -30,8 +30,19 @@ cdef extern from "src/distance.h" nogil:
                                unsigned int num_elems)
 
 cdef extern from "src/elements.h" nogil:
-    void column_elements(const unsigned char * bitstrings,
-                         const float * cals_ptr,
+    void compute_ratios(double * ratios,
+                        const float * cals,
+                        unsigned int num_bits)
+
+    int compute_diag_logs(double * diag_logs,
+                          const uint64_t * bitstrings,
+                          const float * cals,
+                          unsigned int num_bits,
+                          unsigned int num_elems)
+
+    void column_elements(const uint64_t * bitstrings,
+                         const double * ratios,
+                         const double * diag_logs,
                          unsigned int num_elems,
                          unsigned int num_bits,
                          unsigned int distance,
@@ -46,41 +57,70 @@ def bitstring_int(str string):
 
 @cython.boundscheck(False)
 @cython.cdivision(True)
-def _reduced_cal_matrix(object counts, float[::1] cals,
+def _reduced_cal_matrix(object counts, const float[::1] cals,
                         unsigned int num_bits, unsigned int distance):
     
     cdef float shots = sum(counts.values())
     cdef map[string, float] counts_map = counts
     cdef unsigned int num_elems = counts_map.size()
-    cdef unsigned int MAX_DIST
-    cdef int num_terms = -1
+    cdef unsigned int num_words = (num_bits + 63) // 64
+    cdef uint64_t[::1] bitstrings = np.empty(num_words*num_elems, dtype=np.uint64)
+    cdef float[::1] input_probs = np.empty(num_elems, dtype=np.float32)
+    cdef dict out_dict = counts_map
 
-    MAX_DIST = distance == num_bits
+    with nogil:
+        _core_counts_to_packed(&counts_map, num_bits, shots,
+                               &bitstrings[0], &input_probs[0])
+
+    W, col_norms = _packed_cal_matrix(bitstrings, cals, num_bits, distance)
+    return W, out_dict, col_norms
+
+
+@cython.boundscheck(False)
+@cython.cdivision(True)
+def _packed_cal_matrix(const uint64_t[::1] bitstrings, const float[::1] cals,
+                       unsigned int num_bits, unsigned int distance):
+    """Reduced cal matrix over packed bitstrings.
+
+    Parameters:
+        bitstrings (ndarray): Flat array of packed bitstrings.
+        cals (ndarray): Formed 1D cals array.
+        num_bits (int): Number of bits in a bitstring.
+        distance (int): Distance to correct for.
+
+    Returns:
+        ndarray: Reduced cal matrix.
+        ndarray: Column norms.
+    """
+    cdef unsigned int num_words = (num_bits + 63) // 64
+    cdef unsigned int num_elems = bitstrings.shape[0] // num_words
+    cdef bool MAX_DIST = distance == num_bits
+    cdef int num_terms = -1
     if not MAX_DIST:
         num_terms = <int>hamming_terms(num_bits, distance, num_elems)
 
     cdef float[::1,:] W = np.zeros((num_elems, num_elems), order='F', dtype=np.float32)
-
     cdef float[::1] col_norms = np.zeros(num_elems, dtype=np.float32)
+    cdef double[::1] ratios = np.empty(2*num_bits, dtype=np.float64)
+    cdef double[::1] diag_logs = np.empty(num_elems, dtype=np.float64)
 
-    cdef unsigned char * bitstrings = <unsigned char *>malloc(num_bits*num_elems*sizeof(unsigned char))
-    cdef float * input_probs = <float *>malloc(num_elems*sizeof(float))
-    counts_to_internal(&counts_map, bitstrings, input_probs, num_bits, shots)
-
-    cdef size_t ii, jj
-    cdef float col_norm, _temp
-    cdef dict out_dict = counts_map
+    cdef int status
+    with nogil:
+        compute_ratios(&ratios[0], &cals[0], num_bits)
+        status = compute_diag_logs(&diag_logs[0], &bitstrings[0], &cals[0],
+                                   num_bits, num_elems)
+    if status:
+        raise MemoryError("Could not allocate diagonal scratch space.")
+    with nogil:
+        column_elements(&bitstrings[0],
+                        &ratios[0],
+                        &diag_logs[0],
+                        num_elems,
+                        num_bits,
+                        distance,
+                        &W[0,0],
+                        &col_norms[0],
+                        num_terms,
+                        MAX_DIST)
 
-    column_elements(bitstrings,
-                    &cals[0],
-                    num_elems,
-                    num_bits,
-                    distance,
-                    &W[0,0],
-                    &col_norms[0],
-                    num_terms,
-                    MAX_DIST)
-
-    free(bitstrings)
-    free(input_probs)
-    return np.asarray(W), out_dict, np.asarray(col_norms)
+    return np.asarray(W), np.asarray(col_norms)
@@ -20,9 +20,11 @@ np.import_array()
 from libcpp cimport bool
 from libcpp.map cimport map
 from libcpp.string cimport string
-from cython.operator cimport dereference, postincrement
+from libc.stdint cimport uint64_t
+from libc.math cimport exp
 
-from mthree.converters cimport _core_counts_to_bp
+from mthree.converters cimport _core_counts_to_packed
+from mthree.exceptions import M3Error
 
 
 cdef extern from "src/distance.h" nogil:
@@ -31,67 +33,295 @@ cdef extern from "src/distance.h" nogil:
                                unsigned int num_elems)
 
 cdef extern from "src/elements.h" nogil:
-    float compute_element(unsigned int row,
-                          unsigned int col,
-                          const unsigned char * bitstrings,
+    void compute_ratios(double * ratios,
+                        const float * cals,
+                        unsigned int num_bits)
+
+    int compute_diag_logs(double * diag_logs,
+                          const uint64_t * bitstrings,
                           const float * cals,
-                          unsigned int num_bits)
+                          unsigned int num_bits,
+                          unsigned int num_elems)
 
 
-cdef extern from "src/col_renorm.h" nogil:
-    void compute_col_norms(float * col_norms,
-                           const unsigned char * bitstrings,
-                           const float * cals,
+
+cdef extern from "src/neighbors.h" nogil:
+    size_t neighbor_counts(size_t * row_ptrs,
+                           const uint64_t * bitstrings,
                            unsigned int num_bits,
                            unsigned int num_elems,
-                           unsigned int distance)
+                           unsigned int distance,
+                           int num_terms)
+
+    void fill_neighbors(unsigned int * col_inds,
+                        const size_t * row_ptrs,
+                        const uint64_t * bitstrings,
+                        unsigned int num_bits,
+                        unsigned int num_elems,
+                        unsigned int distance)
+
+    size_t sampled_neighbor_counts(const uint64_t * bitstrings,
+                                   unsigned int num_bits,
+                                   unsigned int num_elems,
+                                   unsigned int distance,
+                                   unsigned int num_samples)
+
+    bool use_hamming_ball(unsigned int num_bits,
+                          unsigned int distance,
+                          unsigned int num_elems)
+
+    size_t table_capacity(unsigned int num_elems)
+
+    void build_table(unsigned int * table,
+                     size_t capacity,
+                     const uint64_t * bitstrings,
+                     unsigned int num_bits,
+                     unsigned int num_elems)
+
+    int ball_neighbor_counts(size_t * row_ptrs,
+                             const unsigned int * table,
+                             size_t capacity,
+                             const uint64_t * bitstrings,
+                             unsigned int num_bits,
+                             unsigned int num_elems,
+                             unsigned int distance)
+
+    int ball_fill_neighbors(unsigned int * col_inds,
+                            const size_t * row_ptrs,
+                            const unsigned int * table,
+                            size_t capacity,
+                            const uint64_t * bitstrings,
+                            unsigned int num_bits,
+                            unsigned int num_elems,
+                            unsigned int distance)
+
+
+cdef extern from "src/col_renorm.h" nogil:
+    void compute_scaled_norms(double * scaled_norms,
+                              const uint64_t * bitstrings,
+                              const double * ratios,
+                              unsigned int num_bits,
+                              unsigned int num_elems,
+                              const size_t * row_ptrs,
+                              const unsigned int * col_inds,
+                              bool MAX_DIST)
 
 
 cdef extern from "src/matvec.h" nogil:
     void matvec(const float * x,
                 float * out,
-                float * col_norms,
-                const unsigned char * bitstrings,
-                const float * cals,
+                double * scaled_norms,
+                const uint64_t * bitstrings,
+                const double * ratios,
                 unsigned int num_bits,
                 unsigned int num_elems,
-                unsigned int distance,
-                int num_terms,
+                const size_t * row_ptrs,
+                const unsigned int * col_inds,
                 bool MAX_DIST)
 
     void rmatvec(const float * x,
                  float * out,
-                 float * col_norms,
-                 const unsigned char * bitstrings,
-                 const float * cals,
+                 double * scaled_norms,
+                 const uint64_t * bitstrings,
+                 const double * ratios,
+                 unsigned int num_bits,
+                 unsigned int num_elems,
+                 const size_t * row_ptrs,
+                 const unsigned int * col_inds,
+                 bool MAX_DIST)
+
+    void matmat(const float * X,
+                float * out,
+                double * scaled_norms,
+                const uint64_t * bitstrings,
+                const double * ratios,
+                unsigned int num_bits,
+                unsigned int num_elems,
+                unsigned int num_vecs,
+                const size_t * row_ptrs,
+                const unsigned int * col_inds,
+                bool MAX_DIST)
+
+    void rmatmat(const float * X,
+                 float * out,
+                 double * scaled_norms,
+                 const uint64_t * bitstrings,
+                 const double * ratios,
                  unsigned int num_bits,
                  unsigned int num_elems,
-                 unsigned int distance,
-                 int num_terms,
+                 unsigned int num_vecs,
+                 const size_t * row_ptrs,
+                 const unsigned int * col_inds,
                  bool MAX_DIST)
 
+    void csr_values(float * values,
+                    const double * scaled_norms,
+                    const uint64_t * bitstrings,
+                    const double * ratios,
+                    unsigned int num_bits,
+                    unsigned int num_elems,
+                    const size_t * row_ptrs,
+                    const unsigned int * col_inds)
+
+    void block_diag_values(float * values,
+                           const double * scaled_norms,
+                           const uint64_t * bitstrings,
+                           const double * ratios,
+                           unsigned int num_bits,
+                           unsigned int num_elems,
+                           unsigned int distance,
+                           unsigned int block_size)
+
+cdef extern from "src/gmres.h" nogil:
+    int gmres(float * x,
+              const float * b,
+              float * work,
+              double * hess,
+              double * resids,
+              unsigned int * num_iters,
+              const double * scaled_norms,
+              const uint64_t * bitstrings,
+              const double * ratios,
+              unsigned int num_bits,
+              unsigned int num_elems,
+              const size_t * row_ptrs,
+              const unsigned int * col_inds,
+              bool MAX_DIST,
+              unsigned int restart,
+              unsigned int max_iter,
+              double tol)
+
 logger = logging.getLogger(__name__)
 
+
+def neighbor_index(const uint64_t[::1] bitstrings, unsigned int num_bits,
+                   unsigned int num_elems, unsigned int distance, str method='auto'):
+    """CSR style index of all bit-strings within distance of one another.
+
+    Parameters:
+        bitstrings (ndarray): Flat array of packed bit-strings.
+        num_bits (int): Number of bits in a single bit-string.
+        num_elems (int): Number of bit-strings.
+        distance (int): Max Hamming distance.
+        method (str): 'scan' compares all pairs of bit-strings, 'ball'
+                      enumerates the Hamming ball around each bit-string
+                      and looks members up in a hash table, 'auto' (default)
+                      picks 'ball' when the ball is much smaller than num_elems.
+
+    Returns:
+        ndarray: Row pointers.
+        ndarray: Column indices.
+        str: Method used.
+    """
+    cdef size_t num_nbrs, capacity = 0
+    cdef int status = 0
+    cdef int num_terms = <int>hamming_terms(num_bits, distance, num_elems)
+    cdef size_t[::1] row_ptrs = np.zeros(num_elems+1, dtype=np.uintp)
+    cdef unsigned int[::1] col_inds
+    cdef unsigned int[::1] table
+
+    if method == 'auto':
+        method = 'ball' if use_hamming_ball(num_bits, distance, num_elems) else 'scan'
+    if method not in ['scan', 'ball']:
+        raise M3Error(f"Invalid neighbor index method {method}.")
+
+    if method == 'ball':
+        capacity = table_capacity(num_elems)
+        table = np.zeros(capacity, dtype=np.uint32)
+        with nogil:
+            build_table(&table[0], capacity, &bitstrings[0], num_bits, num_elems)
+            status = ball_neighbor_counts(&row_ptrs[0], &table[0], capacity,
+                                          &bitstrings[0], num_bits, num_elems, distance)
+        if status:
+            raise MemoryError("Could not allocate neighbor search scratch space.")
+        num_nbrs = row_ptrs[num_elems]
+        # Always allocate at least one element so that &col_inds[0] is valid
+        col_inds = np.empty(max(num_nbrs, 1), dtype=np.uint32)
+        with nogil:
+            status = ball_fill_neighbors(&col_inds[0], &row_ptrs[0], &table[0], capacity,
+                                         &bitstrings[0], num_bits, num_elems, distance)
+        if status:
+            raise MemoryError("Could not allocate neighbor search scratch space.")
+    else:
+        with nogil:
+            num_nbrs = neighbor_counts(&row_ptrs[0], &bitstrings[0], num_bits,
+                                       num_elems, distance, num_terms)
+        col_inds = np.empty(max(num_nbrs, 1), dtype=np.uint32)
+        with nogil:
+            fill_neighbors(&col_inds[0], &row_ptrs[0], &bitstrings[0], num_bits,
+                           num_elems, distance)
+    return np.asarray(row_ptrs), np.asarray(col_inds), method
+
+
+def mean_neighbors(const uint64_t[::1] bitstrings, unsigned int num_bits,
+                   unsigned int num_elems, unsigned int distance,
+                   unsigned int num_samples=256):
+    """Estimate the mean number of bit-strings within distance of each bit-string.
+
+    Only evenly spaced sample rows are compared against all bit-strings, so
+    this is much cheaper than building the neighbor index.
+
+    Parameters:
+        bitstrings (ndarray): Flat array of packed bit-strings.
+        num_bits (int): Number of bits in a single bit-string.
+        num_elems (int): Number of bit-strings.
+        distance (int): Max Hamming distance.
+        num_samples (int): Number of sample rows, default=256.
+
+    Returns:
+        float: Mean number of neighbors, including the bit-string itself.
+    """
+    cdef size_t total
+    num_samples = min(num_samples, num_elems)
+    if num_samples == 0:
+        return 0.0
+    with nogil:
+        total = sampled_neighbor_counts(&bitstrings[0], num_bits, num_elems,
+                                        distance, num_samples)
+    return total / num_samples
+
+
 cdef class M3MatVec():
-    cdef public unsigned char[::1] bitstrings
+    cdef public uint64_t[::1] bitstrings
     cdef public float[::1] probs
-    cdef float[::1] col_norms
+    cdef double[::1] scaled_norms
+    cdef double[::1] diag_logs
+    cdef double[::1] ratios
     cdef bool MAX_DIST
     cdef unsigned int distance
     cdef public unsigned int num_elems
     cdef public unsigned int num_bits
-    cdef float[::1] cals
+    cdef public unsigned int num_words
+    cdef const float[::1] cals
     cdef public dict sorted_counts
     cdef int num_terms
+    cdef size_t[::1] row_ptrs
+    cdef unsigned int[::1] col_inds
     
-    def __cinit__(self, object counts, float[::1] cals, int distance=-1):
-        
-        cdef float shots = sum(counts.values())
-        cdef map[string, float] counts_map = counts
-        self.num_elems = counts_map.size()
-        self.num_bits = len(next(iter(counts)))
+    def __cinit__(self, object counts, const float[::1] cals, int distance=-1):
+        """
+        Parameters:
+            counts (dict or tuple): Counts dict, or a tuple of flat packed bitstrings,
+                                    probabilities, and the number of bits.
+            cals (ndarray): Formed 1D cals array.
+            distance (int): Distance to correct for, default is max distance.
+        """
+        cdef float shots = 0
+        cdef map[string, float] counts_map
+        if isinstance(counts, dict):
+            shots = sum(counts.values())
+            counts_map = counts
+            self.num_elems = counts_map.size()
+            self.num_bits = len(next(iter(counts)))
+            self.sorted_counts = counts_map
+        else:
+            # Already packed, so there are no string keys
+            bitstrings, probs, num_bits = counts
+            self.num_elems = len(probs)
+            self.num_bits = num_bits
+            self.sorted_counts = None
+        self.num_words = (self.num_bits + 63) // 64
         self.cals = cals
-        self.sorted_counts = counts_map
         self.num_terms = -1
         
         if distance == -1:
@@ -104,17 +334,57 @@ cdef class M3MatVec():
         
         logger.info(f"Number of Hamming terms: {self.num_terms}")
         
-        self.bitstrings = np.empty(self.num_bits*self.num_elems, np.uint8)
-        self.probs = np.empty(self.num_elems, np.float32)
-        self.col_norms = np.empty(self.num_elems, np.float32)
+        self.scaled_norms = np.empty(self.num_elems, np.float64)
+        self.diag_logs = np.empty(self.num_elems, np.float64)
+        self.ratios = np.empty(2*self.num_bits, np.float64)
 
-        _core_counts_to_bp(&counts_map, self.num_bits, shots,
-                           &self.bitstrings[0], &self.probs[0])
-        
-        compute_col_norms(&self.col_norms[0], &self.bitstrings[0], &self.cals[0],
-                          self.num_bits, self.num_elems, distance)
+        if self.sorted_counts is None:
+            self.bitstrings = np.ascontiguousarray(bitstrings, dtype=np.uint64).ravel()
+            self.probs = np.ascontiguousarray(probs, dtype=np.float32)
+            if self.bitstrings.shape[0] != self.num_words*self.num_elems:
+                raise M3Error('Packed bitstrings do not match number of bits.')
+        else:
+            self.bitstrings = np.empty(self.num_words*self.num_elems, np.uint64)
+            self.probs = np.empty(self.num_elems, np.float32)
+            with nogil:
+                _core_counts_to_packed(&counts_map, self.num_bits, shots,
+                                       &self.bitstrings[0], &self.probs[0])
+
+        # CSR style index of all bit-strings within distance of one another.
+        # At max distance every pair is a neighbor so no index is needed.
+        if self.MAX_DIST:
+            self.row_ptrs = np.zeros(self.num_elems+1, dtype=np.uintp)
+            self.col_inds = np.empty(1, dtype=np.uint32)
+        else:
+            self.row_ptrs, self.col_inds, method = neighbor_index(self.bitstrings,
+                                                                  self.num_bits,
+                                                                  self.num_elems,
+                                                                  self.distance)
+            logger.info(f"Number of neighbors in index: {self.row_ptrs[self.num_elems]}"
+                        f" found using {method}")
+
+        # Elements are evaluated relative to the diagonal of their column
+        # so that only the differing bits need to be visited.
+        cdef int status
+        with nogil:
+            compute_ratios(&self.ratios[0], &self.cals[0], self.num_bits)
+            status = compute_diag_logs(&self.diag_logs[0], &self.bitstrings[0],
+                                       &self.cals[0], self.num_bits, self.num_elems)
+        if status:
+            raise MemoryError("Could not allocate diagonal scratch space.")
+        with nogil:
+            compute_scaled_norms(&self.scaled_norms[0], &self.bitstrings[0],
+                                 &self.ratios[0], self.num_bits, self.num_elems,
+                                 &self.row_ptrs[0], &self.col_inds[0], self.MAX_DIST)
 
         
+    @property
+    def nbytes(self):
+        """Total size of the internal arrays in bytes."""
+        return (self.bitstrings.nbytes + self.probs.nbytes + self.scaled_norms.nbytes
+                + self.diag_logs.nbytes + self.ratios.nbytes + self.cals.nbytes
+                + self.row_ptrs.nbytes + self.col_inds.nbytes)
+
     @cython.boundscheck(False)
     def get_col_norms(self):
         """
@@ -126,20 +396,92 @@ cdef class M3MatVec():
         cdef size_t kk
         cdef float[::1] out = np.empty(self.num_elems, dtype=np.float32)
         for kk in range(self.num_elems):
-            out[kk] = self.col_norms[kk]
+            out[kk] = <float>(exp(self.diag_logs[kk]) * self.scaled_norms[kk])
         return np.asarray(out, dtype=np.float32)
 
+    def get_neighbor_index(self):
+        """
+        Get the CSR style index of bit-strings within distance
+        of one another.
+
+        Returns:
+            ndarray: Row pointers.
+            ndarray: Column indices.
+
+        Notes:
+            At max distance every bit-string is a neighbor of every other,
+            and the full index is returned.
+        """
+        if self.MAX_DIST:
+            row_ptrs = np.arange(self.num_elems+1, dtype=np.uintp)*self.num_elems
+            col_inds = np.tile(np.arange(self.num_elems, dtype=np.uint32), self.num_elems)
+            return row_ptrs, col_inds
+        num_nbrs = self.row_ptrs[self.num_elems]
+        return (np.asarray(self.row_ptrs).copy(),
+                np.asarray(self.col_inds)[:num_nbrs].copy())
+
+    @cython.boundscheck(False)
+    def get_csr(self):
+        """
+        Get the reduced A-matrix in CSR format.
+
+        Returns:
+            ndarray: Values.
+            ndarray: Column indices.
+            ndarray: Row pointers.
+
+        Raises:
+            M3Error: Distance is the maximum, so the matrix is dense.
+        """
+        if self.MAX_DIST:
+            raise M3Error('Reduced A-matrix is dense at max distance.')
+        cdef size_t num_nbrs = self.row_ptrs[self.num_elems]
+        cdef float[::1] values = np.empty(max(num_nbrs, 1), dtype=np.float32)
+        with nogil:
+            csr_values(&values[0], &self.scaled_norms[0], &self.bitstrings[0],
+                       &self.ratios[0], self.num_bits, self.num_elems,
+                       &self.row_ptrs[0], &self.col_inds[0])
+        return (np.asarray(values)[:num_nbrs],
+                np.asarray(self.col_inds)[:num_nbrs].copy(),
+                np.asarray(self.row_ptrs).copy())
+
+    @cython.boundscheck(False)
+    def get_block_diagonal(self, unsigned int block_size):
+        """
+        Get dense diagonal blocks of the reduced A-matrix.
+
+        Parameters:
+            block_size (int): Number of rows and columns in a block.
+
+        Returns:
+            ndarray: Blocks of shape (num_blocks, block_size, block_size), with
+                     the identity past the end of the matrix in the last block.
+
+        Raises:
+            M3Error: Invalid block size.
+        """
+        if block_size == 0:
+            raise M3Error('Block size must be positive.')
+        cdef size_t num_blocks = (self.num_elems + block_size - 1) // block_size
+        cdef size_t kk
+        cdef float[:, :, ::1] values = np.zeros((num_blocks, block_size, block_size),
+                                                dtype=np.float32)
+        with nogil:
+            block_diag_values(&values[0, 0, 0], &self.scaled_norms[0],
+                              &self.bitstrings[0], &self.ratios[0], self.num_bits,
+                              self.num_elems, self.distance, block_size)
+        for kk in range(self.num_elems, num_blocks * block_size):
+            values[num_blocks-1, kk % block_size, kk % block_size] = 1
+        return np.asarray(values)
+
     @cython.boundscheck(False)
     @cython.cdivision(True)
     def get_diagonal(self):
         cdef size_t kk
-        cdef float temp_elem
         cdef float[::1] out = np.empty(self.num_elems, dtype=np.float32)
+        # Diagonal elements are one relative to themselves
         for kk in range(self.num_elems):
-            temp_elem = compute_element(kk, kk,&self.bitstrings[0],
-                                        &self.cals[0], self.num_bits)
-            temp_elem /= self.col_norms[kk]
-            out[kk] = temp_elem
+            out[kk] = <float>(1.0 / self.scaled_norms[kk])
         return np.asarray(out, dtype=np.float32)
 
     @cython.boundscheck(False)
@@ -148,16 +490,17 @@ cdef class M3MatVec():
         if x.shape[0] != self.num_elems:
             raise Exception('Incorrect length of input vector.')
         cdef float[::1] out = np.empty(self.num_elems, dtype=np.float32)
-        matvec(&x[0],
-               &out[0],
-               &self.col_norms[0],
-               &self.bitstrings[0],
-               &self.cals[0],
-               self.num_bits,
-               self.num_elems,
-               self.distance,
-               self.num_terms,
-               self.MAX_DIST)
+        with nogil:
+            matvec(&x[0],
+                   &out[0],
+                   &self.scaled_norms[0],
+                   &self.bitstrings[0],
+                   &self.ratios[0],
+                   self.num_bits,
+                   self.num_elems,
+                   &self.row_ptrs[0],
+                   &self.col_inds[0],
+                   self.MAX_DIST)
         return np.asarray(out, dtype=np.float32)
 
     @cython.boundscheck(False)
@@ -166,34 +509,149 @@ cdef class M3MatVec():
         if x.shape[0] != self.num_elems:
             raise Exception('Incorrect length of input vector.')
         cdef float[::1] out = np.empty(self.num_elems, dtype=np.float32)
-        rmatvec(&x[0],
-                &out[0],
-                &self.col_norms[0],
-                &self.bitstrings[0],
-                &self.cals[0],
-                self.num_bits,
-                self.num_elems,
-                self.distance,
-                self.num_terms,
-                self.MAX_DIST)
+        with nogil:
+            rmatvec(&x[0],
+                    &out[0],
+                    &self.scaled_norms[0],
+                    &self.bitstrings[0],
+                    &self.ratios[0],
+                    self.num_bits,
+                    self.num_elems,
+                    &self.row_ptrs[0],
+                    &self.col_inds[0],
+                    self.MAX_DIST)
         return np.asarray(out, dtype=np.float32)
 
+    @cython.boundscheck(False)
+    def matmat(self, object X):
+        """Action of the reduced A-matrix on a block of vectors.
+
+        Each matrix element is computed once for all of the vectors.
+
+        Parameters:
+            X (ndarray): Array of shape (num_elems, k).
+
+        Returns:
+            ndarray: Array of shape (num_elems, k).
+        """
+        cdef const float[:, ::1] _X = np.ascontiguousarray(X, dtype=np.float32)
+        if _X.shape[0] != self.num_elems:
+            raise Exception('Incorrect number of rows in input block.')
+        cdef unsigned int num_vecs = _X.shape[1]
+        cdef float[:, ::1] out = np.empty((self.num_elems, num_vecs), dtype=np.float32)
+        if num_vecs == 0:
+            return np.asarray(out)
+        if num_vecs == 1:
+            # A single column is contiguous, and the vector kernel is faster
+            with nogil:
+                matvec(&_X[0, 0],
+                       &out[0, 0],
+                       &self.scaled_norms[0],
+                       &self.bitstrings[0],
+                       &self.ratios[0],
+                       self.num_bits,
+                       self.num_elems,
+                       &self.row_ptrs[0],
+                       &self.col_inds[0],
+                       self.MAX_DIST)
+            return np.asarray(out)
+        with nogil:
+            matmat(&_X[0, 0],
+                   &out[0, 0],
+                   &self.scaled_norms[0],
+                   &self.bitstrings[0],
+                   &self.ratios[0],
+                   self.num_bits,
+                   self.num_elems,
+                   num_vecs,
+                   &self.row_ptrs[0],
+                   &self.col_inds[0],
+                   self.MAX_DIST)
+        return np.asarray(out)
+
+    @cython.boundscheck(False)
+    def rmatmat(self, object X):
+        """Action of the adjoint of the reduced A-matrix on a block of vectors.
+
+        Parameters:
+            X (ndarray): Array of shape (num_elems, k).
+
+        Returns:
+            ndarray: Array of shape (num_elems, k).
+        """
+        cdef const float[:, ::1] _X = np.ascontiguousarray(X, dtype=np.float32)
+        if _X.shape[0] != self.num_elems:
+            raise Exception('Incorrect number of rows in input block.')
+        cdef unsigned int num_vecs = _X.shape[1]
+        cdef float[:, ::1] out = np.empty((self.num_elems, num_vecs), dtype=np.float32)
+        if num_vecs == 0:
+            return np.asarray(out)
+        if num_vecs == 1:
+            # A single column is contiguous, and the vector kernel is faster
+            with nogil:
+                rmatvec(&_X[0, 0],
+                        &out[0, 0],
+                        &self.scaled_norms[0],
+                        &self.bitstrings[0],
+                        &self.ratios[0],
+                        self.num_bits,
+                        self.num_elems,
+                        &self.row_ptrs[0],
+                        &self.col_inds[0],
+                        self.MAX_DIST)
+            return np.asarray(out)
+        with nogil:
+            rmatmat(&_X[0, 0],
+                    &out[0, 0],
+                    &self.scaled_norms[0],
+                    &self.bitstrings[0],
+                    &self.ratios[0],
+                    self.num_bits,
+                    self.num_elems,
+                    num_vecs,
+                    &self.row_ptrs[0],
+                    &self.col_inds[0],
+                    self.MAX_DIST)
+        return np.asarray(out)
+
+    def gmres(self, const float[::1] b, double tol=1e-5, unsigned int max_iter=25,
+              unsigned int restart=20, object x0=None):
+        """Solve the reduced A-matrix system using Jacobi preconditioned GMRES.
+
+        The entire solve runs in the extension without the GIL, using
+        Krylov workspace that is allocated once up front.
+
+        Parameters:
+            b (ndarray): Right-hand side.
+            tol (float): Tolerance on the residual norm, relative and absolute.
+            max_iter (int): Maximum total number of iterations.
+            restart (int): Number of iterations between restarts, default=20.
+            x0 (ndarray): Initial guess, default is zeros.
+
+        Returns:
+            ndarray: Solution vector.
+            int: 0 if converged, else number of iterations performed.
+            ndarray: Residual norm at each iteration.
+        """
+        cdef unsigned int num_iters = 0
+        cdef int info
+        if b.shape[0] != self.num_elems:
+            raise Exception('Incorrect length of input vector.')
+        restart = max(min(restart, self.num_elems), 1)
+        cdef float[::1] x
+        if x0 is None:
+            x = np.zeros(self.num_elems, dtype=np.float32)
+        else:
+            x = np.array(x0, dtype=np.float32)
+            if x.shape[0] != self.num_elems:
+                raise Exception('Incorrect length of initial guess.')
+        cdef float[::1] work = np.empty((restart+2)*self.num_elems, dtype=np.float32)
+        cdef double[::1] hess = np.zeros((restart+1)*(restart+4), dtype=np.float64)
+        cdef double[::1] resids = np.zeros(max(max_iter, 1), dtype=np.float64)
+        with nogil:
+            info = gmres(&x[0], &b[0], &work[0], &hess[0], &resids[0], &num_iters,
+                         &self.scaled_norms[0], &self.bitstrings[0], &self.ratios[0],
+                         self.num_bits, self.num_elems, &self.row_ptrs[0],
+                         &self.col_inds[0], self.MAX_DIST, restart, max_iter, tol)
+        return np.asarray(x), info, np.asarray(resids)[:num_iters].copy()
 
-@cython.boundscheck(False)
-@cython.cdivision(True)
-cdef void counts_to_bitstrings(map[string, float] * counts_map,
-                               unsigned char * bitstrings,
-                               unsigned int num_bits):
-   
-    cdef unsigned int idx, letter, start
-    cdef map[string, float].iterator end = counts_map.end()
-    cdef map[string, float].iterator it = counts_map.begin()
-    cdef string temp
-    idx = 0
-    while it != end:
-        start = num_bits*idx
-        temp = dereference(it).first
-        for letter in range(num_bits):
-            bitstrings[start+letter] = <unsigned char>temp[letter]-48
-        idx += 1
-        postincrement(it)
@@ -15,15 +15,15 @@
 import warnings
 import threading
 import datetime
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from math import ceil
 from time import perf_counter
 import logging
 
-import psutil
 import numpy as np
 import orjson
-from qiskit.providers import BackendV2
-from qiskit_ibm_runtime import SamplerV2
+from qiskit.primitives import BitArray
 
 
 from mthree.circuits import (
@@ -35,9 +35,27 @@ from mthree.circuits import (
 from mthree.direct import direct_solver as direct_solve
 from mthree.direct import reduced_cal_matrix as cal_matrix
 from mthree.iterative import iterative_solver
+from mthree.sparse import sparse_solver
+from mthree.planner import plan_correction
+from mthree.precond import PRECONDITIONERS
+from mthree.components import component_solver
+from mthree.cache import SolverCache
+from mthree.calarray import (
+    CalibrationArray,
+    _CalibrationList,
+    write_cal_array,
+    load_cal_array,
+    is_cal_array_file,
+)
+from mthree.converters import counts_to_arrays, bitstrings_to_bytes
 
 from mthree.exceptions import M3Error
-from mthree.classes import QuasiCollection
+from mthree.classes import (
+    QuasiCollection,
+    ArrayProbDistribution,
+    PartitionedQuasiDistribution,
+)
+from mthree.utils import marginal_distribution
 from ._helpers import system_info
 
 logger = logging.getLogger(__name__)
@@ -46,13 +64,18 @@ logger = logging.getLogger(__name__)
 class M3Mitigation:
     """Main M3 calibration class."""
 
-    def __init__(self, system=None, iter_threshold=4096):
+    def __init__(self, system=None, iter_threshold=None, solver_cache_size=None):
         """Main M3 calibration class.
 
         Parameters:
             system (Backend): Target backend.
-            iter_threshold (int): Sets the bitstring count at which iterative mode
-                                  is turned on (assuming reasonable error rates).
+            iter_threshold (int): Bitstring count up to which the 'auto' method uses
+                                  the direct method without planning, and above
+                                  which it is not considered, default=None (chosen
+                                  by the cost model, except for tiny inputs).
+            solver_cache_size (int): Max. size in bytes of the cache of solvers reused by
+                                     corrections over the same qubits and bit-strings,
+                                     default=None (no cache).
 
         Attributes:
             system (Backend): The target system or execution manager.
@@ -60,7 +83,12 @@ class M3Mitigation:
             cal_method (str): Calibration method used
             cal_timestamp (str): Time at which cals were taken
             single_qubit_cals (list): 1Q calibration matrices
+            cals_version (int): Counter that is incremented whenever the cals change
+            solver_cache (SolverCache): Cache of solvers, if enabled
         """
+        # Formed cals for each qubit tuple, valid for the current cals version
+        self.cals_version = 0
+        self._formed_cals = {}
         self.executor = None
         self.system = system
         self.system_info = system_info(system) if system else {}
@@ -80,6 +108,25 @@ class M3Mitigation:
         self.faulty_qubits = []
         # The number of shots used for balanced denominator
         self._balanced_shots = None
+        # Cache of solvers for repeated corrections
+        self.solver_cache = None
+        if solver_cache_size is not None:
+            self.solver_cache = SolverCache(solver_cache_size)
+
+    def __setattr__(self, attr, value):
+        """Replacing the cals invalidates anything derived from them.
+
+        Lists of cals are copied into a list that, like a CalibrationArray,
+        reports in place changes, so those invalidate the cals as well.
+        """
+        if attr == "single_qubit_cals" and value is not None:
+            if isinstance(value, list):
+                value = _CalibrationList(value)
+            if isinstance(value, (_CalibrationList, CalibrationArray)):
+                value._watch(self._cals_updated)
+        super().__setattr__(attr, value)
+        if attr == "single_qubit_cals":
+            self._cals_updated()
 
     def __getattribute__(self, attr):
         """This allows for checking the status of the threaded cals call
@@ -92,21 +139,44 @@ class M3Mitigation:
                 self._thread_check()
         return super().__getattribute__(attr)
 
+    def _cals_updated(self):
+        """Bump the cals version and drop everything formed from older cals.
+
+        Called whenever ``single_qubit_cals`` is replaced or changed in place.
+        """
+        self.cals_version += 1
+        self._formed_cals = {}
+        if self.__dict__.get("solver_cache") is not None:
+            self.solver_cache.clear()
+
     def _form_cals(self, qubits):
         """Form the 1D cals array from tensored cals data
 
+        The result is memoized per qubit tuple until the cals change.
+
         Parameters:
             qubits (array_like): The qubits to calibrate over.
 
         Returns:
-            ndarray: 1D Array of float cals data.
+            ndarray: 1D Array of float cals data (read-only).
         """
-        qubits = np.asarray(qubits, dtype=int)
-        cals = np.zeros(4 * qubits.shape[0], dtype=np.float32)
-
-        # Reverse index qubits for easier indexing later
-        for kk, qubit in enumerate(qubits[::-1]):
-            cals[4 * kk : 4 * kk + 4] = self.single_qubit_cals[qubit].ravel()
+        # Accessing the cals waits on any calibration in progress
+        single_qubit_cals = self.single_qubit_cals
+        key = tuple(int(qu) for qu in qubits)
+        cals = self._formed_cals.get(key)
+        if cals is not None:
+            return cals
+
+        if isinstance(single_qubit_cals, CalibrationArray):
+            # Reverse index qubits for easier indexing later
+            cals = single_qubit_cals.data[list(key[::-1])].astype(np.float32).ravel()
+        else:
+            cals = np.zeros(4 * len(key), dtype=np.float32)
+            # Reverse index qubits for easier indexing later
+            for kk, qubit in enumerate(key[::-1]):
+                cals[4 * kk : 4 * kk + 4] = single_qubit_cals[qubit].ravel()
+        cals.flags.writeable = False
+        self._formed_cals[key] = cals
         return cals
 
     def tensored_cals_from_system(
@@ -160,6 +230,9 @@ class M3Mitigation:
         Raises:
             M3Error: Called while a calibration currently in progress.
         """
+        # The runtime client is slow to import and only needed to run jobs
+        from qiskit_ibm_runtime import SamplerV2
+
         if mode is not None:
             executor = SamplerV2(mode=mode)
             if mode.backend() != self.system.name:
@@ -209,6 +282,9 @@ class M3Mitigation:
     def cals_from_file(self, cals_file):
         """Generated the calibration data from a previous runs output
 
+        Both JSON files and binary files written with ``binary=True`` are
+        accepted.  Binary files are memory-mapped rather than read.
+
         Parameters:
             cals_file (str): A string path to the saved counts file from an
                              earlier run.
@@ -217,6 +293,13 @@ class M3Mitigation:
         """
         if self._thread:
             raise M3Error("Calibration currently in progress.")
+        if is_cal_array_file(cals_file):
+            cals, header = load_cal_array(cals_file)
+            self.single_qubit_cals = cals
+            self.cal_timestamp = header.get("timestamp", None)
+            self.cal_shots = header.get("shots", None)
+            self.faulty_qubits = _faulty_qubit_checker(self.single_qubit_cals)
+            return
         with open(cals_file, "r", encoding="utf-8") as fd:
             loaded_data = orjson.loads(fd.read())
             if isinstance(loaded_data, dict):
@@ -236,11 +319,13 @@ class M3Mitigation:
                 ]
         self.faulty_qubits = _faulty_qubit_checker(self.single_qubit_cals)
 
-    def cals_to_file(self, cals_file=None):
+    def cals_to_file(self, cals_file=None, binary=False):
         """Save calibration data to JSON file.
 
         Parameters:
             cals_file (str): File in which to store calibrations.
+            binary (bool): Save as a binary file of stacked calibrations that
+                           can be memory-mapped when loaded, default=False.
 
         Raises:
             M3Error: Calibration filename missing.
@@ -250,15 +335,68 @@ class M3Mitigation:
             raise M3Error("cals_file must be explicitly set.")
         if not self.single_qubit_cals:
             raise M3Error("Mitigator is not calibrated.")
-        save_dict = {
+        metadata = {
             "timestamp": self.cal_timestamp,
             "backend": self.system_info.get("name", None),
             "shots": self.cal_shots,
-            "cals": self.single_qubit_cals,
         }
+        if binary:
+            write_cal_array(cals_file, self.single_qubit_cals, metadata)
+            return
+        save_dict = dict(metadata)
+        save_dict["cals"] = [
+            None if cal is None else np.array(cal) for cal in self.single_qubit_cals
+        ]
         with open(cals_file, "wb") as fd:
             fd.write(orjson.dumps(save_dict, option=orjson.OPT_SERIALIZE_NUMPY))
 
+    def cals_from_store(self, store, before=None, backend=None):
+        """Load the most recent calibrations taken at or before a given time
+        from a calibration store.
+
+        Parameters:
+            store (CalibrationStore): Store of calibration snapshots.
+            before (str or datetime): Latest time, default is the newest snapshot.
+            backend (str): Name of the backend, default is the system name.
+
+        Raises:
+            M3Error: Calibration in progress.
+            M3Error: Backend name missing.
+        """
+        if self._thread:
+            raise M3Error("Calibration currently in progress.")
+        backend = backend or self.system_info.get("name", None)
+        if backend is None:
+            raise M3Error("backend must be set if mitigator has no system.")
+        cals, metadata = store.nearest(backend, before)
+        self.single_qubit_cals = cals
+        self.cal_timestamp = metadata["timestamp"]
+        self.cal_shots = metadata["shots"]
+        self.faulty_qubits = _faulty_qubit_checker(self.single_qubit_cals)
+
+    def cals_to_store(self, store, backend=None):
+        """Add the calibration data to a calibration store.
+
+        Parameters:
+            store (CalibrationStore): Store of calibration snapshots.
+            backend (str): Name of the backend, default is the system name.
+
+        Returns:
+            int: Id of the snapshot.
+
+        Raises:
+            M3Error: Mitigator is not calibrated.
+            M3Error: Backend name missing.
+        """
+        if not self.single_qubit_cals:
+            raise M3Error("Mitigator is not calibrated.")
+        backend = backend or self.system_info.get("name", None)
+        if backend is None:
+            raise M3Error("backend must be set if mitigator has no system.")
+        return store.add(
+            self.single_qubit_cals, backend, self.cal_timestamp, self.cal_shots
+        )
+
     def tensored_cals_from_file(self, cals_file):
         """Generated the tensored calibration data from a previous runs output
 
@@ -324,6 +462,8 @@ class M3Mitigation:
         if self.system is None:
             raise M3Error("System is not set.  Use 'cals_from_file'.")
         if self.executor is None:
+            from qiskit_ibm_runtime import SamplerV2
+
             self.executor = SamplerV2(mode=self.system)
         if self.single_qubit_cals is None:
             self.single_qubit_cals = [None] * self.num_qubits
@@ -397,6 +537,8 @@ class M3Mitigation:
                 )
 
         num_circs = len(trans_qcs)
+        from qiskit.providers import BackendV2
+
         if isinstance(self.system, BackendV2):
             max_circuits = getattr(self.system.configuration(), "max_circuits", 300)
             # Needed for https://github.com/Qiskit/qiskit-terra/issues/9947
@@ -418,6 +560,7 @@ class M3Mitigation:
             trans_qcs[kk * circ_slice : (kk + 1) * circ_slice]
             for kk in range(num_jobs - 1)
         ] + [trans_qcs[(num_jobs - 1) * circ_slice :]]
+        offsets = [kk * circ_slice for kk in range(num_jobs)]
         # Do job submission here
         jobs = []
         if self.rep_delay:
@@ -432,12 +575,12 @@ class M3Mitigation:
         if async_cal:
             thread = threading.Thread(
                 target=_job_thread,
-                args=(jobs, self, qubits, num_cal_qubits, cal_strings),
+                args=(jobs, self, qubits, num_cal_qubits, cal_strings, offsets),
             )
             self._thread = thread
             self._thread.start()
         else:
-            _job_thread(jobs, self, qubits, num_cal_qubits, cal_strings)
+            _job_thread(jobs, self, qubits, num_cal_qubits, cal_strings, offsets)
 
         return jobs
 
@@ -451,30 +594,120 @@ class M3Mitigation:
         tol=1e-3,
         return_mitigation_overhead=False,
         details=False,
+        iterative_backend="scipy",
+        max_workers=1,
+        parallel="thread",
+        array_output=False,
+        previous=None,
+        preconditioner="jacobi",
+        partition=None,
     ):
         """Applies correction to given counts.
 
         Parameters:
-            counts (dict, list): Input counts dict or list of dicts.
+            counts (dict, BitArray, tuple, list): Input counts dict or list of dicts.
+                                                  Counts can also be given as a Qiskit
+                                                  BitArray, or as a tuple of a 2D uint8
+                                                  array of big-endian bit-string bytes
+                                                  (one row per bit-string or shot) and
+                                                  an array of counts.
             qubits (dict, array_like): Qubits on which measurements applied.
             distance (int): Distance to correct for. Default=num_bits
-            method (str): Solution method: 'auto', 'direct' or 'iterative'.
+            method (str): Solution method: 'auto', 'direct', 'sparse', 'iterative',
+                          or 'components'.
             max_iter (int): Max. number of iterations, Default=25.
             tol (float): Convergence tolerance of iterative method, Default=1e-3.
             return_mitigation_overhead (bool): Returns the mitigation overhead, default=False.
             details (bool): Return extra info, default=False.
+            iterative_backend (str): GMRES implementation used by the iterative method,
+                                     'scipy' (default) or 'native'.
+            max_workers (int): Number of workers used to correct a list of counts,
+                               or the components of a single counts with the
+                               'components' method, default=1 (serial).
+            parallel (str): Type of worker pool used when max_workers > 1,
+                            'thread' (default) or 'process'. Process workers
+                            are spawned rather than forked.
+            array_output (bool): Return ArrayQuasiDistribution instances that hold
+                                 bit-strings as bytes instead of string keys,
+                                 default=False.
+            previous (QuasiDistribution or QuasiCollection): Corrections of closely
+                                                             related counts, e.g. the
+                                                             previous step of a
+                                                             variational algorithm,
+                                                             used as the starting point
+                                                             of the iterative method.
+            preconditioner (str): Preconditioner of the iterative method, 'jacobi'
+                                  (default), 'block' for block-Jacobi over groups of
+                                  bit-strings with the same leading bits, or 'ilu' for
+                                  incomplete LU of the elements within distance.
+            partition (list): Groups of bit indices, counted from the right of the
+                              bit-string, whose outcomes are independent of one another.
+                              Each group is corrected on its own marginal counts.
 
         Returns:
             QuasiDistribution or QuasiCollection: Dictionary of quasiprobabilities if
                                                   input is a single dict, else a collection
                                                   of quasiprobabilities.
+            PartitionedQuasiDistribution: Quasiprobabilities of each group if a
+                                          partition is given.
 
         Raises:
             M3Error: Bitstring length does not match number of qubits given.
+            M3Error: Invalid number of workers.
+            M3Error: Invalid parallel mode.
+            M3Error: Length of previous does not match length of counts.
+            M3Error: Invalid preconditioner.
+            M3Error: Invalid partition.
+            M3Error: previous is not a PartitionedQuasiDistribution over the same
+                     groups as the partition.
         """
-        logger.info("Apply correction to %s bitstrings", len(counts))
-        if len(counts) == 0:
-            raise M3Error("Input counts is any empty dict.")
+        if partition is not None:
+            groups, marginals, group_qubits = _partition_counts(
+                counts, qubits, partition
+            )
+            if previous is not None:
+                if not isinstance(previous, PartitionedQuasiDistribution):
+                    raise M3Error(
+                        "previous must be a PartitionedQuasiDistribution "
+                        "when a partition is given."
+                    )
+                if previous.groups != groups:
+                    raise M3Error("previous has different groups than the partition.")
+            out = self.apply_correction(
+                marginals,
+                group_qubits,
+                distance=distance,
+                method=method,
+                max_iter=max_iter,
+                tol=tol,
+                return_mitigation_overhead=return_mitigation_overhead,
+                details=details,
+                iterative_backend=iterative_backend,
+                max_workers=max_workers,
+                parallel=parallel,
+                array_output=array_output,
+                previous=None if previous is None else previous.dists,
+                preconditioner=preconditioner,
+            )
+            if details:
+                return (
+                    PartitionedQuasiDistribution(out[0], groups, len(qubits)),
+                    out[1],
+                )
+            return PartitionedQuasiDistribution(out, groups, len(qubits))
+        if isinstance(counts, BitArray) and counts.ndim:
+            # A BitArray with a shape holds one set of counts per index
+            counts = [counts[idx] for idx in np.ndindex(counts.shape)]
+        if not _is_array_counts(counts):
+            logger.info("Apply correction to %s bitstrings", len(counts))
+            if len(counts) == 0:
+                raise M3Error("Input counts is any empty dict.")
+        if max_workers < 1:
+            raise M3Error(f"Invalid number of workers {max_workers}.")
+        if parallel not in ["thread", "process"]:
+            raise M3Error(f"Invalid parallel mode {parallel}.")
+        if preconditioner not in PRECONDITIONERS:
+            raise M3Error(f"Invalid preconditioner {preconditioner}.")
         given_list = False
         if isinstance(counts, (list, np.ndarray)):
             given_list = True
@@ -494,6 +727,13 @@ class M3Mitigation:
         if len(qubits) != len(counts):
             raise M3Error("Length of counts does not match length of qubits.")
 
+        if previous is None:
+            previous = [None] * len(counts)
+        elif not given_list:
+            previous = [previous]
+        if len(previous) != len(counts):
+            raise M3Error("Length of previous does not match length of counts.")
+
         # Check if using faulty qubits
         bad_qubits = set()
         for item in qubits:
@@ -507,27 +747,86 @@ class M3Mitigation:
         details_out = []
         log_iter = max(len(counts) // 20, 1)
         logger.info("Start applying correction using method %s", method)
-        for idx, cnts in enumerate(counts):
-            if logger.isEnabledFor(logging.DEBUG):
-                if idx % log_iter == 0:
-                    logger.debug("Applying correction %s/%s", idx, len(counts))
-                st = perf_counter()
-            corrected = self._apply_correction(
-                cnts,
-                qubits=qubits[idx],
-                distance=distance,
-                method=method,
-                max_iter=max_iter,
-                tol=tol,
-                return_mitigation_overhead=return_mitigation_overhead,
-                details=details,
-            )
-            if logger.isEnabledFor(logging.DEBUG):
-                dur = perf_counter() - st
-                if dur > 1:
-                    logger.warning("It look %s seconds to process %s", dur, cnts)
-                    if details:
-                        logger.debug("Correction details: %s", corrected[1])
+        options = {
+            "distance": distance,
+            "method": method,
+            "max_iter": max_iter,
+            "tol": tol,
+            "return_mitigation_overhead": return_mitigation_overhead,
+            "details": details,
+            "iterative_backend": iterative_backend,
+            "array_output": array_output,
+            "preconditioner": preconditioner,
+            # Workers go to the components of a single counts, if not to the list
+            "max_workers": max_workers if len(counts) == 1 else 1,
+        }
+        if max_workers > 1 and len(counts) > 1:
+            # Calibrations are shared state, so grab any that are missing
+            # before the corrections are handed off to the workers.
+            used_qubits = sorted({qu for item in qubits for qu in item})
+            self._check_cals(used_qubits)
+            if parallel == "process":
+                # Each worker gets the cals for the used qubits once, when it starts
+                if isinstance(self.single_qubit_cals, CalibrationArray):
+                    # Sent as a file name if mapped from a file
+                    worker_cals = self.single_qubit_cals
+                else:
+                    worker_cals = [None] * len(self.single_qubit_cals)
+                    for qu in used_qubits:
+                        worker_cals[qu] = self.single_qubit_cals[qu]
+                tasks = [
+                    (
+                        cnts if _is_array_counts(cnts) else dict(cnts),
+                        list(qubits[idx]),
+                        dict(options, previous=previous[idx]),
+                    )
+                    for idx, cnts in enumerate(counts)
+                ]
+                # Forking after OpenMP has started its threads hangs the
+                # workers, so they are always spawned fresh.
+                with ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(worker_cals, self.iter_threshold),
+                ) as executor:
+                    results = list(
+                        executor.map(
+                            _worker_correction,
+                            tasks,
+                            chunksize=max(len(tasks) // (4 * max_workers), 1),
+                        )
+                    )
+            else:
+
+                def _correct(idx):
+                    return self._apply_correction(
+                        counts[idx],
+                        qubits=qubits[idx],
+                        previous=previous[idx],
+                        **options,
+                    )
+
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    results = list(executor.map(_correct, range(len(counts))))
+        else:
+            results = []
+            for idx, cnts in enumerate(counts):
+                if logger.isEnabledFor(logging.DEBUG):
+                    if idx % log_iter == 0:
+                        logger.debug("Applying correction %s/%s", idx, len(counts))
+                    st = perf_counter()
+                corrected = self._apply_correction(
+                    cnts, qubits=qubits[idx], previous=previous[idx], **options
+                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    dur = perf_counter() - st
+                    if dur > 1:
+                        logger.warning("It look %s seconds to process %s", dur, cnts)
+                        if details:
+                            logger.debug("Correction details: %s", corrected[1])
+                results.append(corrected)
+        for corrected in results:
             if details:
                 quasi_out.append(corrected[0])
                 details_out.append(corrected[1])
@@ -546,6 +845,25 @@ class M3Mitigation:
 
         return quasi_out
 
+    def _check_cals(self, qubits):
+        """Calibrate any of the given qubits that do not have calibration data.
+
+        Parameters:
+            qubits (array_like): Qubits to check.
+        """
+        # Check if no cals done yet
+        if self.single_qubit_cals is None:
+            warnings.warn("No calibration data. Calibrating: {}".format(qubits))
+            self._grab_additional_cals(qubits, method=self.cal_method)
+
+        # Check if one or more new qubits need to be calibrated.
+        missing_qubits = [qq for qq in qubits if self.single_qubit_cals[qq] is None]
+        if any(missing_qubits):
+            warnings.warn(
+                "Computing missing calibrations for qubits: {}".format(missing_qubits)
+            )
+            self._grab_additional_cals(missing_qubits, method=self.cal_method)
+
     def _apply_correction(
         self,
         counts,
@@ -556,18 +874,34 @@ class M3Mitigation:
         tol=1e-3,
         return_mitigation_overhead=False,
         details=False,
+        iterative_backend="scipy",
+        array_output=False,
+        previous=None,
+        preconditioner="jacobi",
+        max_workers=1,
     ):
         """Applies correction to given counts.
 
         Parameters:
-            counts (dict): Input counts dict.
+            counts (dict, BitArray, tuple): Input counts dict, BitArray, or tuple of
+                                            bit-string bytes and counts.
             qubits (array_like): Qubits on which measurements applied.
             distance (int): Distance to correct for. Default=num_bits
-            method (str): Solution method: 'auto', 'direct' or 'iterative'.
+            method (str): Solution method: 'auto', 'direct', 'sparse', 'iterative',
+                          or 'components'.
             max_iter (int): Max. number of iterations, Default=25.
             tol (float): Convergence tolerance of iterative method, Default=1e-3.
             return_mitigation_overhead (bool): Returns the mitigation overhead, default=False.
             details (bool): Return extra info, default=False.
+            iterative_backend (str): GMRES implementation used by the iterative method,
+                                     'scipy' (default) or 'native'.
+            array_output (bool): Return an ArrayQuasiDistribution, default=False.
+            previous (QuasiDistribution): Correction of closely related counts used
+                                          as the starting point of the iterative method.
+            preconditioner (str): Preconditioner of the iterative method, 'jacobi'
+                                  (default), 'block', or 'ilu'.
+            max_workers (int): Number of threads solving components with the
+                               'components' method, default=1.
 
         Returns:
             QuasiDistribution: Dictionary of quasiprobabilities.
@@ -575,53 +909,65 @@ class M3Mitigation:
         Raises:
             M3Error: Bitstring length does not match number of qubits given.
         """
-        # This is needed because counts is a Counts object in Qiskit not a dict.
-        counts = dict(counts)
-        shots = sum(counts.values())
+        num_bits = len(qubits)
+        if _is_array_counts(counts):
+            # Unique bit-strings as arrays, no string keys needed
+            rows, cnts, bitstring_len = counts_to_arrays(counts, num_bits)
+            counts = (rows, cnts)
+            shots = int(cnts.sum())
+            num_elems = rows.shape[0]
+        else:
+            # This is needed because counts is a Counts object in Qiskit not a dict.
+            counts = dict(counts)
+            shots = sum(counts.values())
+            num_elems = len(counts)
+            bitstring_len = len(next(iter(counts)))
 
         # If distance is None, then assume min(num_bits, 3).
-        num_bits = len(qubits)
-        num_elems = len(counts)
         if distance is None:
             distance = min(num_bits, 3)
         elif distance == -1:  # shortcut for setting max distance
             distance = num_bits
 
         # check if len of bitstrings does not equal number of qubits passed.
-        bitstring_len = len(next(iter(counts)))
         if bitstring_len != num_bits:
             raise M3Error(
                 "Bitstring length ({}) does not match".format(bitstring_len)
                 + " number of qubits ({})".format(num_bits)
             )
 
-        # Check if no cals done yet
-        if self.single_qubit_cals is None:
-            warnings.warn("No calibration data. Calibrating: {}".format(qubits))
-            self._grab_additional_cals(qubits, method=self.cal_method)
+        self._check_cals(qubits)
 
-        # Check if one or more new qubits need to be calibrated.
-        missing_qubits = [qq for qq in qubits if self.single_qubit_cals[qq] is None]
-        if any(missing_qubits):
-            warnings.warn(
-                "Computing missing calibrations for qubits: {}".format(missing_qubits)
+        plan = None
+        if method == "auto":
+            method, plan = plan_correction(
+                counts,
+                num_bits,
+                distance,
+                max_iter=max_iter,
+                return_mitigation_overhead=return_mitigation_overhead,
+                max_direct=self.iter_threshold,
             )
-            self._grab_additional_cals(missing_qubits, method=self.cal_method)
 
-        if method == "auto":
-            current_free_mem = psutil.virtual_memory().available / 1024**3
-            # First check if direct method can be run
-            if num_elems <= self.iter_threshold and (
-                (num_elems**2 + num_elems) * 8 / 1024**3 < current_free_mem / 2
-            ):
-                method = "direct"
-            else:
-                method = "iterative"
+        if (array_output or method == "components") and not isinstance(counts, tuple):
+            # Sorted unique bit-string bytes, as for array inputs
+            counts = counts_to_arrays(
+                (
+                    bitstrings_to_bytes(counts, num_bits),
+                    np.fromiter(counts.values(), dtype=float, count=num_elems),
+                ),
+                num_bits,
+            )[:2]
 
         if method == "direct":
             st = perf_counter()
             mit_counts, col_norms, gamma = direct_solve(
-                self, counts, qubits, distance, return_mitigation_overhead
+                self,
+                counts,
+                qubits,
+                distance,
+                return_mitigation_overhead,
+                array_output,
             )
             dur = perf_counter() - st
             mit_counts.shots = shots
@@ -629,6 +975,58 @@ class M3Mitigation:
                 mit_counts.mitigation_overhead = gamma * gamma
             if details:
                 info = {"method": "direct", "time": dur, "dimension": num_elems}
+                if plan is not None:
+                    info["plan"] = plan
+                info["col_norms"] = col_norms
+                return mit_counts, info
+            return mit_counts
+
+        elif method == "sparse":
+            st = perf_counter()
+            mit_counts, col_norms, gamma = sparse_solver(
+                self,
+                counts,
+                qubits,
+                distance,
+                return_mitigation_overhead,
+                array_output,
+            )
+            dur = perf_counter() - st
+            mit_counts.shots = shots
+            if gamma is not None:
+                mit_counts.mitigation_overhead = gamma * gamma
+            if details:
+                info = {"method": "sparse", "time": dur, "dimension": num_elems}
+                if plan is not None:
+                    info["plan"] = plan
+                info["col_norms"] = col_norms
+                return mit_counts, info
+            return mit_counts
+
+        elif method == "components":
+            st = perf_counter()
+            mit_counts, col_norms, gamma, comp_info = component_solver(
+                self,
+                counts,
+                qubits,
+                distance,
+                return_mitigation_overhead,
+                array_output,
+                max_workers,
+                tol=tol,
+                max_iter=max_iter,
+                iterative_backend=iterative_backend,
+                preconditioner=preconditioner,
+            )
+            dur = perf_counter() - st
+            mit_counts.shots = shots
+            if gamma is not None:
+                mit_counts.mitigation_overhead = gamma * gamma
+            if details:
+                info = {"method": "components", "time": dur, "dimension": num_elems}
+                if plan is not None:
+                    info["plan"] = plan
+                info.update(comp_info)
                 info["col_norms"] = col_norms
                 return mit_counts, info
             return mit_counts
@@ -651,12 +1049,20 @@ class M3Mitigation:
                     1,
                     callback,
                     return_mitigation_overhead,
+                    iterative_backend,
+                    array_output,
+                    previous,
+                    preconditioner,
                 )
                 dur = perf_counter() - st
                 mit_counts.shots = shots
                 if gamma is not None:
                     mit_counts.mitigation_overhead = gamma * gamma
                 info = {"method": "iterative", "time": dur, "dimension": num_elems}
+                if plan is not None:
+                    info["plan"] = plan
+                info["backend"] = iterative_backend
+                info["preconditioner"] = preconditioner
                 info["iterations"] = iter_count[0]
                 info["col_norms"] = col_norms
                 return mit_counts, info
@@ -671,6 +1077,10 @@ class M3Mitigation:
                 0,
                 callback,
                 return_mitigation_overhead,
+                iterative_backend,
+                array_output,
+                previous,
+                preconditioner,
             )
             logger.info(f"Number of GMRES iterations: {iter_count[0]}")
             mit_counts.shots = shots
@@ -685,7 +1095,8 @@ class M3Mitigation:
         """Return the reduced calibration matrix used in the solution.
 
         Parameters:
-            counts (dict): Input counts dict.
+            counts (dict, BitArray, tuple): Input counts dict, BitArray, or tuple of
+                                            bit-string bytes and counts.
             qubits (array_like): Qubits on which measurements applied.
             distance (int): Distance to correct for. Default=num_bits
 
@@ -744,37 +1155,62 @@ class M3Mitigation:
             raise self._job_error  # pylint: disable=raising-bad-type
 
 
-def _job_thread(jobs, mit, qubits, num_cal_qubits, cal_strings):
+def _job_thread(jobs, mit, qubits, num_cal_qubits, cal_strings, offsets):
     """Run the calibration job in a different thread and post-process
 
+    Jobs are waited on concurrently, and the results of each job are folded
+    into running per-qubit tallies as soon as it finishes, so raw counts are
+    never held for more than one job at a time.
+
     Parameters:
         jobs (list): A list of job instances
         mit (M3Mitigator): The mitigator instance
         qubits (list): List of qubits used
         num_cal_qubits (int): Number of calibration qubits
         cal_strings (list): List of cal strings for balanced cals
+        offsets (list): Index of the first circuit of each job
     """
-    counts = []
-    for job in jobs:
-        try:
-            res = job.result()
-        # pylint: disable=broad-except
-        except Exception as error:
-            mit._job_error = error
-            return
-        else:
-            _counts = [rr.data.c.get_counts() for rr in res]
-            # _counts can be a list or a dict (if only one circuit was executed within the job)
-            if isinstance(_counts, list):
-                counts.extend(_counts)
-            else:
-                counts.append(_counts)
+    # Shots where each qubit prepared in 0 (row 0) or 1 (row 1) read correctly
+    good = np.zeros((2, num_cal_qubits), dtype=float)
+    timestamps = [None] * len(jobs)
+    executor = ThreadPoolExecutor(max_workers=max(len(jobs), 1))
+    try:
+        futures = {executor.submit(job.result): idx for idx, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            job_idx = futures[future]
+            try:
+                res = future.result()
+            # pylint: disable=broad-except
+            except Exception as error:
+                mit._job_error = error
+                # Cancel the other jobs so their threads stop waiting on them
+                for other, other_idx in futures.items():
+                    if not other.done() and hasattr(jobs[other_idx], "cancel"):
+                        try:
+                            jobs[other_idx].cancel()
+                        # pylint: disable=broad-except
+                        except Exception:
+                            pass
+                return
+            for kk, rr in enumerate(res):
+                ones, shots = _bit_counts(rr.data.c)
+                _fold_bit_counts(
+                    good,
+                    mit.cal_method,
+                    offsets[job_idx] + kk,
+                    ones,
+                    shots,
+                    cal_strings,
+                )
+            logger.info("Calibration job %s of %s is done.", job_idx + 1, len(jobs))
             # attach timestamp
-            if hasattr(job, "metrics"):
-                timestamp = job.metrics()["timestamps"]["running"]
-            else:
-                timestamp = None
+            if hasattr(jobs[job_idx], "metrics"):
+                timestamps[job_idx] = jobs[job_idx].metrics()["timestamps"]["running"]
+    finally:
+        # No thread is left blocked on a job once this returns
+        executor.shutdown(wait=True, cancel_futures=True)
     logger.info("All jobs are done.")
+    timestamp = timestamps[-1]
     # Timestamp can be None
     if timestamp is None:
         timestamp = datetime.datetime.now()
@@ -786,73 +1222,17 @@ def _job_thread(jobs, mit, qubits, num_cal_qubits, cal_strings):
     dt = datetime.datetime.fromisoformat(timestamp)
     dt_utc = dt.astimezone(datetime.timezone.utc)
     mit.cal_timestamp = dt_utc.isoformat()
-    # A list of qubits with bad meas cals
-    bad_list = []
-    if mit.cal_method == "independent":
-        for idx, qubit in enumerate(qubits):
-            mit.single_qubit_cals[qubit] = np.zeros((2, 2), dtype=np.float32)
-            # Counts 0 has all P00, P10 data, so do that here
-            prep0_counts = counts[2 * idx]
-            P10 = prep0_counts.get("1", 0) / mit.cal_shots
-            P00 = 1 - P10
-            mit.single_qubit_cals[qubit][:, 0] = [P00, P10]
-            # plus 1 here since zeros data at pos=0
-            prep1_counts = counts[2 * idx + 1]
-            P01 = prep1_counts.get("0", 0) / mit.cal_shots
-            P11 = 1 - P01
-            mit.single_qubit_cals[qubit][:, 1] = [P01, P11]
-            if P01 >= P00:
-                bad_list.append(qubit)
-    elif mit.cal_method == "marginal":
-        prep0_counts = counts[0]
-        prep1_counts = counts[1]
-        for idx, qubit in enumerate(qubits):
-            mit.single_qubit_cals[qubit] = np.zeros((2, 2), dtype=np.float32)
-            count_vals = 0
-            index = num_cal_qubits - idx - 1
-            for key, val in prep0_counts.items():
-                if key[index] == "0":
-                    count_vals += val
-            P00 = count_vals / mit.cal_shots
-            P10 = 1 - P00
-            mit.single_qubit_cals[qubit][:, 0] = [P00, P10]
-            count_vals = 0
-            for key, val in prep1_counts.items():
-                if key[index] == "1":
-                    count_vals += val
-            P11 = count_vals / mit.cal_shots
-            P01 = 1 - P11
-            mit.single_qubit_cals[qubit][:, 1] = [P01, P11]
-            if P01 >= P00:
-                bad_list.append(qubit)
-    # balanced calibration
-    else:
-        cals = [np.zeros((2, 2), dtype=np.float32) for kk in range(num_cal_qubits)]
-
-        for idx, count in enumerate(counts):
-            target = cal_strings[idx][::-1]
-            good_prep = np.zeros(num_cal_qubits, dtype=np.float32)
-            # divide by 2 since total shots is double
-            denom = mit._balanced_shots
-
-            for key, val in count.items():
-                key = key[::-1]
-                for kk in range(num_cal_qubits):
-                    if key[kk] == target[kk]:
-                        good_prep[kk] += val
-
-            for kk, cal in enumerate(cals):
-                if target[kk] == "0":
-                    cal[0, 0] += good_prep[kk] / denom
-                else:
-                    cal[1, 1] += good_prep[kk] / denom
-
-        for cal in cals:
-            cal[1, 0] = 1.0 - cal[0, 0]
-            cal[0, 1] = 1.0 - cal[1, 1]
 
-        for idx, cal in enumerate(cals):
-            mit.single_qubit_cals[qubits[idx]] = cal
+    if mit.cal_method == "balanced":
+        denom = mit._balanced_shots
+    else:
+        denom = mit.cal_shots
+    P00 = good[0] / denom
+    P11 = good[1] / denom
+    for idx, qubit in enumerate(qubits):
+        mit.single_qubit_cals[qubit] = np.array(
+            [[P00[idx], 1 - P11[idx]], [1 - P00[idx], P11[idx]]], dtype=np.float32
+        )
 
     # save cals to file, if requested
     if mit.cals_file:
@@ -861,6 +1241,151 @@ def _job_thread(jobs, mit, qubits, num_cal_qubits, cal_strings):
     mit.faulty_qubits = _faulty_qubit_checker(mit.single_qubit_cals)
 
 
+def _fold_bit_counts(good, method, circ_idx, ones, shots, cal_strings):
+    """Add the results of one calibration circuit to the per-qubit tallies.
+
+    Parameters:
+        good (ndarray): Shots where each qubit prepared in 0 (row 0) or 1 (row 1)
+                        was read correctly, updated in place.
+        method (str): Calibration method.
+        circ_idx (int): Index of the circuit.
+        ones (ndarray): Number of ones at each position, in bit-string order.
+        shots (int): Number of shots.
+        cal_strings (list): List of cal strings for balanced cals.
+    """
+    if method == "independent":
+        # Circuits alternate 0 and 1 preparations, one qubit at a time
+        qubit, prep = divmod(circ_idx, 2)
+        good[prep, qubit] += ones[0] if prep else shots - ones[0]
+    else:
+        # Reverse so that position idx is qubits[idx]
+        ones = ones[::-1]
+        if method == "marginal":
+            # Circuit 0 prepares all zeros, circuit 1 all ones
+            targets = np.full(ones.shape[0], bool(circ_idx))
+        else:
+            targets = np.array([bit == "1" for bit in cal_strings[circ_idx][::-1]])
+        good[0] += np.where(targets, 0, shots - ones)
+        good[1] += np.where(targets, ones, 0)
+
+
+def _bit_counts(bit_array):
+    """Number of shots with each bit set.
+
+    Parameters:
+        bit_array (BitArray): Measured bits of a single circuit.
+
+    Returns:
+        ndarray: Number of ones at each position, in bit-string order.
+        int: Number of shots.
+    """
+    rows = bit_array.array.reshape(-1, bit_array.array.shape[-1])
+    ones = np.empty((rows.shape[1], 8), dtype=np.int64)
+    for bit in range(8):
+        # Bit 0 of each byte is the rightmost of its eight characters
+        ones[:, 7 - bit] = np.count_nonzero(rows & np.uint8(1 << bit), axis=0)
+    return ones.ravel()[ones.size - bit_array.num_bits :], rows.shape[0]
+
+
+def _partition_counts(counts, qubits, partition):
+    """Marginal counts and qubits of each group of a partition.
+
+    Parameters:
+        counts (dict, BitArray, tuple): Input counts.
+        qubits (dict, array_like): Qubits on which measurements applied.
+        partition (list): Groups of bit indices counted from the right.
+
+    Returns:
+        list: Bit indices of each group.
+        list: Marginal counts of each group.
+        list: Qubits of each group.
+
+    Raises:
+        M3Error: Invalid partition.
+        M3Error: Partition needs a single counts.
+        M3Error: Bitstring length does not match number of qubits given.
+    """
+    if isinstance(qubits, dict):
+        qubits = list(qubits.values())
+    qubits = list(qubits)
+    num_bits = len(qubits)
+    groups = [[int(kk) for kk in group] for group in partition]
+    flat = [kk for group in groups for kk in group]
+    if (
+        not groups
+        or not all(groups)
+        or len(set(flat)) != len(flat)
+        or any(kk < 0 or kk >= num_bits for kk in flat)
+    ):
+        raise M3Error("Partition groups must be non-empty, disjoint, and within range.")
+    if isinstance(counts, (list, np.ndarray)) or (
+        isinstance(counts, BitArray) and counts.ndim
+    ):
+        raise M3Error("Partitioned correction requires a single counts.")
+
+    if _is_array_counts(counts):
+        rows, cnts, bitstring_len = counts_to_arrays(counts, num_bits)
+    else:
+        counts = dict(counts)
+        bitstring_len = len(next(iter(counts)))
+    if bitstring_len != num_bits:
+        raise M3Error(
+            "Bitstring length ({}) does not match".format(bitstring_len)
+            + " number of qubits ({})".format(num_bits)
+        )
+    if _is_array_counts(counts):
+        full = ArrayProbDistribution(rows, cnts, num_bits)
+        marginals = []
+        for group in groups:
+            marg = full.marginal(group)
+            marginals.append((marg.bitstrings, marg.vec))
+    else:
+        marginals = [marginal_distribution(counts, group) for group in groups]
+    group_qubits = [[qubits[kk] for kk in group] for group in groups]
+    return groups, marginals, group_qubits
+
+
+def _is_array_counts(counts):
+    """Check if counts are given as arrays rather than a dict
+
+    Parameters:
+        counts (object): Input counts.
+
+    Returns:
+        bool: True if counts is a BitArray or a tuple of arrays.
+    """
+    return isinstance(counts, (BitArray, tuple))
+
+
+# Mitigator used by the corrections in a process pool worker
+_WORKER_MITIGATOR = None
+
+
+def _init_worker(single_qubit_cals, iter_threshold):
+    """Initialize a process pool worker for apply_correction
+
+    Parameters:
+        single_qubit_cals (list): 1Q calibration matrices
+        iter_threshold (int): Max. bitstring count of the direct method in 'auto' mode
+    """
+    global _WORKER_MITIGATOR  # pylint: disable=global-statement
+    _WORKER_MITIGATOR = M3Mitigation(iter_threshold=iter_threshold)
+    _WORKER_MITIGATOR.single_qubit_cals = single_qubit_cals
+
+
+def _worker_correction(task):
+    """Apply correction in a process pool worker
+
+    Parameters:
+        task (tuple): Counts, qubits, and options for _apply_correction
+
+    Returns:
+        QuasiDistribution: Dictionary of quasiprobabilities, and details if requested.
+    """
+    counts, qubits, options = task
+    return _WORKER_MITIGATOR._apply_correction(counts, qubits=qubits, **options)
+
+
 def _faulty_qubit_checker(cals):
     """Find faulty qubits in cals
 
@@ -870,6 +1395,8 @@ def _faulty_qubit_checker(cals):
     Returns:
         list: Faulty qubits
     """
+    if isinstance(cals, CalibrationArray):
+        return cals.faulty_qubits()
     faulty_qubits = []
     for idx, cal in enumerate(cals):
         if cal is not None:
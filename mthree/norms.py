@@ -35,8 +35,58 @@ def ainv_onenorm_est_lu(A, LU=None):
         This uses the modified Hager's method (Alg. 4.1) from
         N. J. Higham, ACM Trans. Math. Software, Vol. 14, 381 (1988).
     """
-    dims = A.shape[0]
+    # Factor A and A.T
+    if LU is None:
+        LU = la.lu_factor(A, check_finite=False)
+    LU_T = la.lu_factor(A.T, check_finite=False)
+
+    def solve(vec):
+        return la.lu_solve(LU, vec, check_finite=False)
+
+    def solve_T(vec):
+        return la.lu_solve(LU_T, vec, check_finite=False)
+
+    return _hager_onenorm(solve, solve_T, A.shape[0])
+
+
+def ainv_onenorm_est_splu(LU):
+    """
+    Estimates the one-norm of the inverse A**-1 of a sparse
+    matrix A from its sparse LU factorization.
+
+    Parameters:
+        LU (SuperLU): Sparse LU factorization of A from splu.
+
+    Returns:
+        float: Estimate of one-norm for A**-1.
+
+    Notes:
+        This uses the modified Hager's method (Alg. 4.1) from
+        N. J. Higham, ACM Trans. Math. Software, Vol. 14, 381 (1988).
+    """
+
+    def solve(vec):
+        return LU.solve(np.asarray(vec, dtype=LU.U.dtype))
+
+    def solve_T(vec):
+        return LU.solve(np.asarray(vec, dtype=LU.U.dtype), trans="T")
+
+    return _hager_onenorm(solve, solve_T, LU.shape[0])
+
 
+def _hager_onenorm(solve, solve_T, dims):
+    """
+    Modified Hager's method for the one-norm of A**-1 given solvers
+    for A and A.T.
+
+    Parameters:
+        solve (callable): Solves A x = b.
+        solve_T (callable): Solves A.T x = b.
+        dims (int): Dimension of A.
+
+    Returns:
+        float: Estimate of one-norm for A**-1.
+    """
     # If only a single bitstring then there is no overhead
     if dims == 1:
         return 1.0
@@ -44,16 +94,11 @@ def ainv_onenorm_est_lu(A, LU=None):
     # Starting vec
     v = (1.0 / dims) * np.ones(dims, dtype=np.float32)
 
-    # Factor A and A.T
-    if LU is None:
-        LU = la.lu_factor(A, check_finite=False)
-    LU_T = la.lu_factor(A.T, check_finite=False)
-
     # Initial solve
-    v = la.lu_solve(LU, v, check_finite=False)
+    v = solve(v)
     gamma = la.norm(v, 1)
     eta = np.sign(v)
-    x = la.lu_solve(LU_T, eta, check_finite=False)
+    x = solve_T(eta)
 
     # loop over reasonable number of trials
     k = 2
@@ -62,7 +107,7 @@ def ainv_onenorm_est_lu(A, LU=None):
         idx = np.where(np.abs(x) == x_nrm)[0][0]
         v = np.zeros(dims, dtype=float)
         v[idx] = 1
-        v = la.lu_solve(LU, v, check_finite=False)
+        v = solve(v)
 
         gamma_prime = gamma
         gamma = la.norm(v, 1)
@@ -71,7 +116,7 @@ def ainv_onenorm_est_lu(A, LU=None):
             break
 
         eta = np.sign(v)
-        x = la.lu_solve(LU_T, eta, check_finite=False)
+        x = solve_T(eta)
         if la.norm(x, np.inf) == x[idx]:
             break
         k += 1
@@ -80,7 +125,7 @@ def ainv_onenorm_est_lu(A, LU=None):
     x = np.arange(1, dims + 1)
     x = (-1) ** (x + 1) * (1 + (x - 1) / (dims - 1))
 
-    x = la.lu_solve(LU, x, check_finite=False)
+    x = solve(x)
 
     temp = 2 * la.norm(x, 1) / (3 * dims)
 
@@ -90,7 +135,7 @@ def ainv_onenorm_est_lu(A, LU=None):
     return gamma
 
 
-def ainv_onenorm_est_iter(M, tol=1e-5, max_iter=25):
+def ainv_onenorm_est_iter(M, tol=1e-5, max_iter=25, P=None):
     """
     Estimates the one-norm of the inverse A**-1 of the input
     matrix A using itertive GMRES.
@@ -99,6 +144,8 @@ def ainv_onenorm_est_iter(M, tol=1e-5, max_iter=25):
         M (M3MatVec): M3 matrix-vector multiplication container.
         tol (float): Tolerance of iterative solver.
         max_iter (int): Number of max iterations to perform.
+        P (LinearOperator): Preconditioner, whose adjoint is used for A.T,
+                            default is Jacobi.
 
     Returns:
         float: Estimate of one-norm for A**-1.
@@ -110,24 +157,26 @@ def ainv_onenorm_est_iter(M, tol=1e-5, max_iter=25):
     Raises:
         M3Error: Error in iterative solver.
     """
-    # Setup linear operator interfaces
-    L = spla.LinearOperator(
-        (M.num_elems, M.num_elems), matvec=M.matvec, dtype=np.float32
-    )
+    if P is None:
+        diags = M.get_diagonal()
 
-    LT = spla.LinearOperator(
-        (M.num_elems, M.num_elems), matvec=M.rmatvec, dtype=np.float32
-    )
+        def precond_matvec(x):
+            out = np.ravel(x) / diags
+            return out
 
-    diags = M.get_diagonal()
+        P = spla.LinearOperator(
+            (M.num_elems, M.num_elems),
+            precond_matvec,
+            rmatvec=precond_matvec,
+            dtype=np.float32,
+        )
+    PT = P.adjoint()
 
-    def precond_matvec(x):
-        out = x / diags
-        return out
+    def solve(B):
+        return _block_gmres(M.matmat, B, P, tol, max_iter)
 
-    P = spla.LinearOperator(
-        (M.num_elems, M.num_elems), precond_matvec, dtype=np.float32
-    )
+    def solve_T(B):
+        return _block_gmres(M.rmatmat, B, PT, tol, max_iter)
 
     dims = M.num_elems
 
@@ -135,28 +184,25 @@ def ainv_onenorm_est_iter(M, tol=1e-5, max_iter=25):
     if dims == 1:
         return 1.0
 
-    # Starting vec
-    v = (1.0 / dims) * np.ones(dims, dtype=np.float32)
-
-    # Initial solve
-    v, error = spla.gmres(L, v, rtol=tol, atol=tol, maxiter=max_iter, M=P)
-    if error:
-        raise M3Error("Iterative solver error {}".format(error))
+    # The starting vector and Higham's cancellation check do not depend
+    # on each other, so solve for both in a single block.
+    B = np.empty((dims, 2), dtype=np.float32)
+    B[:, 0] = 1.0 / dims
+    x = np.arange(1, dims + 1, dtype=np.float32)
+    B[:, 1] = (-1) ** (x + 1) * (1 + (x - 1) / (dims - 1))
+    V = solve(B)
+    v = V[:, 0]
     gamma = la.norm(v, 1)
     eta = np.sign(v)
-    x, error = spla.gmres(LT, eta, rtol=tol, atol=tol, maxiter=max_iter, M=P)
-    if error:
-        raise M3Error("Iterative solver error {}".format(error))
+    x = solve_T(eta[:, None])[:, 0]
     # loop over reasonable number of trials
     k = 2
     while k < 6:
         x_nrm = la.norm(x, np.inf)
         idx = np.where(np.abs(x) == x_nrm)[0][0]
-        v = np.zeros(dims, dtype=np.float32)
+        v = np.zeros((dims, 1), dtype=np.float32)
         v[idx] = 1
-        v, error = spla.gmres(L, v, rtol=tol, atol=tol, maxiter=max_iter, M=P)
-        if error:
-            raise M3Error("Iterative solver error {}".format(error))
+        v = solve(v)[:, 0]
         gamma_prime = gamma
         gamma = la.norm(v, 1)
 
@@ -164,24 +210,94 @@ def ainv_onenorm_est_iter(M, tol=1e-5, max_iter=25):
             break
 
         eta = np.sign(v)
-        x, error = spla.gmres(LT, eta, rtol=tol, atol=tol, maxiter=max_iter, M=P)
-        if error:
-            raise M3Error("Iterative solver error {}".format(error))
+        x = solve_T(eta[:, None])[:, 0]
         if la.norm(x, np.inf) == x[idx]:
             break
         k += 1
 
-    # After loop do Higham's check for cancellations.
-    x = np.arange(1, dims + 1, dtype=np.float32)
-    x = (-1) ** (x + 1) * (1 + (x - 1) / (dims - 1))
-
-    x, error = spla.gmres(L, x, rtol=tol, atol=tol, maxiter=max_iter, M=P)
-    if error:
-        raise M3Error("Iterative solver error {}".format(error))
-
-    temp = 2 * la.norm(x, 1) / (3 * dims)
+    temp = 2 * la.norm(V[:, 1], 1) / (3 * dims)
 
     if temp > gamma:
         gamma = temp
 
     return gamma
+
+
+def _block_gmres(matmat, B, P, tol, max_iter, restart=20):
+    """Restarted GMRES for several right-hand sides at once.
+
+    Each right-hand side has its own Krylov space, but the spaces are
+    built in lockstep so that every step is a single product of the
+    operator with a block of vectors.
+
+    Parameters:
+        matmat (callable): Action of the operator on a block of vectors.
+        B (ndarray): Right-hand sides of shape (dims, k).
+        P (LinearOperator): Right preconditioner.
+        tol (float): Relative and absolute tolerance of the residuals.
+        max_iter (int): Maximum number of restarts.
+        restart (int): Number of steps between restarts.
+
+    Returns:
+        ndarray: Solutions of shape (dims, k).
+
+    Raises:
+        M3Error: Error in iterative solver.
+    """
+    B = np.asarray(B, dtype=float)
+    dims, num_vecs = B.shape
+    restart = min(restart, dims)
+    X = np.zeros_like(B)
+    thresh = np.maximum(tol * np.linalg.norm(B, axis=0), tol)
+    for _ in range(max_iter):
+        R = B - matmat(X)
+        beta = np.linalg.norm(R, axis=0)
+        active = beta > thresh
+        if not active.any():
+            return X
+        beta[~active] = 0
+        V = np.zeros((restart + 1, dims, num_vecs))
+        Z = np.zeros((restart, dims, num_vecs))
+        H = np.zeros((num_vecs, restart + 1, restart))
+        V[0][:, active] = R[:, active] / beta[active]
+        for step in range(restart):
+            Z[step] = P.matmat(V[step])
+            W = np.asarray(matmat(Z[step]), dtype=float)
+            # Modified Gram-Schmidt of every column at once
+            for kk in range(step + 1):
+                H[:, kk, step] = np.einsum("ij,ij->j", W, V[kk])
+                W -= H[:, kk, step] * V[kk]
+            H[:, step + 1, step] = np.linalg.norm(W, axis=0)
+            nonzero = H[:, step + 1, step] > 0
+            V[step + 1][:, nonzero] = W[:, nonzero] / H[nonzero, step + 1, step]
+            Y, resids = _hessenberg_lstsq(H[:, : step + 2, : step + 1], beta)
+            if np.all(resids[active] <= thresh[active]) or not nonzero[active].any():
+                break
+        X += np.einsum("sij,js->ij", Z[: step + 1], Y)
+    if np.any(np.linalg.norm(B - matmat(X), axis=0) > thresh):
+        raise M3Error("Iterative solver error {}".format(max_iter))
+    return X
+
+
+def _hessenberg_lstsq(H, beta):
+    """Least-squares solutions of the GMRES Hessenberg systems.
+
+    Parameters:
+        H (ndarray): Hessenberg matrices of shape (k, m + 1, m).
+        beta (ndarray): Initial residual norms of shape (k,).
+
+    Returns:
+        ndarray: Solutions of shape (k, m).
+        ndarray: Residual norms of shape (k,).
+    """
+    num_vecs, rows, cols = H.shape
+    Y = np.zeros((num_vecs, cols))
+    resids = np.zeros(num_vecs)
+    rhs = np.zeros(rows)
+    for kk in range(num_vecs):
+        if beta[kk] == 0:
+            continue
+        rhs[0] = beta[kk]
+        Y[kk] = np.linalg.lstsq(H[kk], rhs, rcond=None)[0]
+        resids[kk] = np.linalg.norm(rhs - H[kk] @ Y[kk])
+    return Y, resids
@@ -0,0 +1,407 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module, invalid-name
+"""Cost model based selection of the solution method"""
+
+import logging
+import os
+import threading
+import time
+from math import comb
+import numpy as np
+import scipy.linalg as la
+import scipy.sparse.linalg as spla
+
+from mthree.matrix import _packed_cal_matrix
+from mthree.matvec import M3MatVec, neighbor_index, mean_neighbors
+from mthree.sparse import sparse_cal_matrix, SPARSE_MAX_ROW_ELEMS
+from mthree.components import DIRECT_BLOCK_ELEMS
+from mthree.converters import bytes_to_packed, bitstrings_to_bytes
+
+try:
+    from mthree.version import openmp
+except ImportError:
+    openmp = False
+
+logger = logging.getLogger(__name__)
+
+# Methods in order of preference when their estimated times are equal
+PLANNED_METHODS = ["direct", "sparse", "iterative", "components"]
+
+# Number of bit-strings and bits of the micro-benchmark problem
+BENCH_ELEMS = 512
+BENCH_BITS = 24
+# Dimension of the matrix of the dense LU benchmark
+LU_BENCH_ELEMS = 1024
+# Probability of each bit being flipped in the sparse LU benchmark
+SPARSE_BENCH_FLIP = 0.1
+
+# Typical number of GMRES iterations of a Jacobi preconditioned solve
+GMRES_ITERATIONS = 10
+# Krylov vectors kept by SciPy GMRES between restarts
+GMRES_RESTART = 20
+# Ratio of LU factor elements to the square of the elements per row
+SPARSE_FILL = 2
+# Number of solves of the modified Hager one-norm estimate
+ONENORM_SOLVES = 5
+
+# Ratio of all-pairs scan cost to Hamming-ball probe cost at which the
+# neighbor index uses the ball enumeration engine, as in neighbors.h
+BALL_COST_FACTOR = 4
+
+# Number of bit-strings up to which the direct method is used without
+# planning, as the dense solve takes no longer than the planning itself
+DIRECT_ELEMS = 64
+# Seconds for which a reading of the free memory is reused
+FREE_MEMORY_TTL = 1.0
+
+_CONSTANTS = {}
+_FREE_MEMORY = {}
+_LOCK = threading.Lock()
+
+
+def machine_constants(refresh=False):
+    """Machine constants of the cost model, measured once per process.
+
+    Each constant is the time taken per unit of work of one of the kernels
+    used by the solution methods, measured on a small random problem.  The
+    kernels run with the same threading as the corrections themselves, so
+    OpenMP and BLAS threads are accounted for.
+
+    Parameters:
+        refresh (bool): Measure again even if already measured, default=False.
+
+    Returns:
+        dict: Seconds per unit of work of each kernel.
+    """
+    with _LOCK:
+        if refresh or not _CONSTANTS:
+            _CONSTANTS.update(_benchmark())
+        return dict(_CONSTANTS)
+
+
+def _benchmark():
+    """Time each kernel on a small random problem.
+
+    Returns:
+        dict: Seconds per unit of work of each kernel.
+    """
+    st = time.perf_counter()
+    rng = np.random.default_rng(1234)
+    bits = rng.integers(0, 2, size=(BENCH_ELEMS, BENCH_BITS), dtype=np.uint8)
+    rows = np.unique(np.packbits(bits, axis=1), axis=0)
+    num_elems = rows.shape[0]
+    bitstrings = bytes_to_packed(rows, BENCH_BITS)
+    probs = np.full(num_elems, 1 / num_elems, dtype=np.float32)
+    cals = np.tile(np.array([0.97, 0.04, 0.03, 0.96], dtype=np.float32), BENCH_BITS)
+    pairs = num_elems * num_elems
+    out = {}
+
+    # Counting and filling passes both compare all pairs
+    out["scan_pair"] = _best_time(
+        neighbor_index, bitstrings, BENCH_BITS, num_elems, 1, "scan"
+    ) / (2 * pairs)
+    out["ball_probe"] = _best_time(
+        neighbor_index, bitstrings, BENCH_BITS, num_elems, 1, "ball"
+    ) / (2 * num_elems * (BENCH_BITS + 1))
+
+    out["dense_elem"] = (
+        _best_time(_packed_cal_matrix, bitstrings, cals, BENCH_BITS, BENCH_BITS) / pairs
+    )
+    # BLAS is far from its peak rate on matrices as small as the others
+    A = rng.random((LU_BENCH_ELEMS, LU_BENCH_ELEMS), dtype=np.float32)
+    A += LU_BENCH_ELEMS * np.eye(LU_BENCH_ELEMS, dtype=np.float32)
+    out["lu_flop"] = _best_time(la.lu_factor, A, repeats=2, check_finite=False) / (
+        2 * LU_BENCH_ELEMS**3 / 3
+    )
+
+    # Nearly all pairs of random bit-strings are within distance BENCH_BITS-1,
+    # so both matvec kernels visit every element
+    M = M3MatVec((bitstrings, probs, BENCH_BITS), cals, BENCH_BITS)
+    out["matvec_full_elem"] = _best_time(M.matvec, probs) / pairs
+    M = M3MatVec((bitstrings, probs, BENCH_BITS), cals, BENCH_BITS - 1)
+    out["matvec_elem"] = _best_time(M.matvec, probs) / M.get_csr()[1].shape[0]
+
+    # Few pairs are within distance one, so the cost of each GMRES iteration
+    # is mostly orthogonalization and Python overhead
+    M = M3MatVec((bitstrings, probs, BENCH_BITS), cals, 1)
+    iters = np.zeros(1, dtype=int)
+
+    def callback(_):
+        iters[0] += 1
+
+    L = spla.LinearOperator((num_elems, num_elems), matvec=M.matvec, dtype=np.float32)
+    gmres_time = _best_time(
+        spla.gmres,
+        L,
+        probs + rng.random(num_elems, dtype=np.float32),
+        repeats=1,
+        rtol=1e-12,
+        atol=0,
+        restart=GMRES_RESTART,
+        maxiter=1,
+        callback=callback,
+        callback_type="pr_norm",
+    )
+    out["gmres_iter"] = gmres_time / max(iters[0], 1)
+
+    # Bit-strings clustered around all zeros have a few neighbors each, so
+    # the LU factors fill in as they do for real counts
+    bits = rng.random((BENCH_ELEMS, BENCH_BITS)) < SPARSE_BENCH_FLIP
+    rows = np.unique(np.packbits(bits.astype(np.uint8), axis=1), axis=0)
+    M = M3MatVec(
+        (bytes_to_packed(rows, BENCH_BITS), probs[: rows.shape[0]], BENCH_BITS),
+        cals,
+        1,
+    )
+    A = sparse_cal_matrix(M)
+    LU = spla.splu(A, permc_spec="MMD_AT_PLUS_A")
+    out["splu_elem"] = _best_time(spla.splu, A, permc_spec="MMD_AT_PLUS_A") / (
+        LU.L.nnz + LU.U.nnz
+    )
+    logger.info(f"Cost model benchmark time: {time.perf_counter()-st}")
+    return out
+
+
+def _best_time(func, *args, repeats=3, **kwargs):
+    """Shortest time of a few calls of a function."""
+    best = np.inf
+    for _ in range(repeats):
+        st = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - st)
+    return best
+
+
+def plan_correction(
+    counts,
+    num_bits,
+    distance,
+    max_iter=25,
+    return_mitigation_overhead=False,
+    max_direct=None,
+):
+    """Pick the solution method with the least estimated time.
+
+    The time and memory of each method are estimated from the number of
+    bit-strings, the number of bits, the mean number of bit-strings within
+    distance of each bit-string, and the machine constants.  Methods that
+    need more than half the free memory are not considered.  Small problems
+    go to the direct method without any estimates.
+
+    Parameters:
+        counts (dict or tuple): Input counts dict, or tuple of unique bit-string
+                                bytes and counts from counts_to_arrays.
+        num_bits (int): Number of bits in a bit-string.
+        distance (int): Distance to correct for.
+        max_iter (int): Max. number of iterations of the iterative method.
+        return_mitigation_overhead (bool): Mitigation overhead is estimated,
+                                           default=False.
+        max_direct (int): Max. number of bit-strings for the direct method, which
+                          is used without planning up to this count, default=None
+                          (no limit, and no planning up to DIRECT_ELEMS).
+
+    Returns:
+        str: Solution method.
+        dict: Plan holding the estimates of each method, None if not planned.
+    """
+    num_elems = counts[0].shape[0] if isinstance(counts, tuple) else len(counts)
+    if num_elems <= (DIRECT_ELEMS if max_direct is None else max_direct):
+        logger.info(f"Direct method for {num_elems} bit-strings without planning")
+        plan = {
+            "method": "direct",
+            "mean_neighbors": None,
+            "estimates": None,
+            "openmp": openmp,
+            "threads": _num_threads(),
+        }
+        return "direct", plan
+
+    consts = machine_constants()
+    if isinstance(counts, tuple):
+        rows = counts[0]
+    else:
+        rows = bitstrings_to_bytes(counts, num_bits)
+    if distance >= num_bits:
+        num_nbrs = float(num_elems)
+    else:
+        num_nbrs = mean_neighbors(
+            bytes_to_packed(rows, num_bits), num_bits, num_elems, distance
+        )
+    free_mem = _free_memory()
+    iterations = min(GMRES_ITERATIONS, max_iter * GMRES_RESTART)
+    if return_mitigation_overhead:
+        iterations *= 1 + ONENORM_SOLVES
+
+    estimates = _estimates(
+        consts, num_elems, num_bits, distance, num_nbrs, iterations, max_direct
+    )
+    for est in estimates.values():
+        est["feasible"] = est["feasible"] and est["memory"] < free_mem / 2
+    feasible = [meth for meth in PLANNED_METHODS if estimates[meth]["feasible"]]
+    if feasible:
+        method = min(feasible, key=lambda meth: estimates[meth]["time"])
+    else:
+        # Nothing fits, so use the method with the least memory
+        method = min(PLANNED_METHODS, key=lambda meth: estimates[meth]["memory"])
+    logger.info(f"Planned method {method} for {num_elems} bit-strings")
+    plan = {
+        "method": method,
+        "mean_neighbors": num_nbrs,
+        "estimates": estimates,
+        "openmp": openmp,
+        "threads": _num_threads(),
+    }
+    return method, plan
+
+
+def _estimates(
+    consts, num_elems, num_bits, distance, num_nbrs, iterations, max_direct=None
+):
+    """Estimated time in seconds and memory in bytes of each method.
+
+    Parameters:
+        consts (dict): Machine constants.
+        num_elems (int): Number of bit-strings.
+        num_bits (int): Number of bits in a bit-string.
+        distance (int): Distance to correct for.
+        num_nbrs (float): Mean number of bit-strings within distance, including
+                          the bit-string itself.
+        iterations (int): Number of GMRES iterations.
+        max_direct (int): Max. number of bit-strings for the direct method.
+
+    Returns:
+        dict: Time, memory, and feasibility of each method.
+    """
+    truncated = distance < num_bits
+    nnz = num_elems * num_nbrs
+    index_time = 0.0
+    if truncated:
+        terms = _hamming_terms(num_bits, distance, num_elems)
+        if terms * BALL_COST_FACTOR < num_elems:
+            index_time = 2 * num_elems * terms * consts["ball_probe"]
+        else:
+            index_time = 2 * num_elems**2 * consts["scan_pair"]
+    matvec_elem = consts["matvec_elem" if truncated else "matvec_full_elem"]
+    words = (num_bits + 63) // 64
+    matvec_mem = num_elems * (8 * words + 32) + (4 * nnz if truncated else 0)
+
+    out = {}
+    out["direct"] = {
+        "time": num_elems**2 * consts["dense_elem"]
+        + 2 * num_elems**3 / 3 * consts["lu_flop"],
+        # The matrix and its LU factors
+        "memory": 8 * num_elems**2 + 16 * num_elems,
+        "feasible": max_direct is None or num_elems <= max_direct,
+    }
+    factor_nnz = SPARSE_FILL * num_elems * num_nbrs**2
+    out["sparse"] = {
+        "time": index_time + nnz * matvec_elem + factor_nnz * consts["splu_elem"],
+        "memory": matvec_mem + 12 * nnz + 12 * factor_nnz,
+        # Fill-in of the LU factors grows quickly with more neighbors
+        "feasible": truncated and num_nbrs <= SPARSE_MAX_ROW_ELEMS,
+    }
+    out["iterative"] = {
+        "time": index_time
+        + iterations
+        * (
+            nnz * matvec_elem
+            + num_elems * GMRES_RESTART * consts["lu_flop"]
+            + consts["gmres_iter"]
+        ),
+        "memory": matvec_mem + 4 * (GMRES_RESTART + 2) * num_elems,
+        "feasible": True,
+    }
+    # Each neighbor beyond the bit-string itself joins at most one more
+    # bit-string to a component, which bounds how many are not alone.
+    # Lone bit-strings need no solve, and at worst the rest form one block.
+    joined = min(num_elems, int(np.ceil(num_elems * (num_nbrs - 1))))
+    comps = {"time": np.inf, "memory": matvec_mem, "feasible": False}
+    if truncated and 1 < joined < num_elems:
+        sub = _estimates(
+            consts,
+            joined,
+            num_bits,
+            distance,
+            1 + num_elems * (num_nbrs - 1) / joined,
+            iterations,
+            max_direct,
+        )
+        # Blocks are solved as in component_solver, without planning
+        block_direct = DIRECT_BLOCK_ELEMS if max_direct is None else max_direct
+        best = sub["direct" if joined <= block_direct else "iterative"]
+        comps = {
+            "time": index_time + nnz * matvec_elem + best["time"],
+            "memory": matvec_mem + best["memory"],
+            "feasible": True,
+        }
+    elif truncated and joined <= 1:
+        comps = {
+            "time": index_time + nnz * matvec_elem,
+            "memory": matvec_mem,
+            "feasible": True,
+        }
+    out["components"] = comps
+    return out
+
+
+def _free_memory():
+    """Available memory in bytes, read at most once per FREE_MEMORY_TTL seconds."""
+    now = time.monotonic()
+    with _LOCK:
+        if not _FREE_MEMORY or now - _FREE_MEMORY["time"] > FREE_MEMORY_TTL:
+            _FREE_MEMORY["bytes"] = _available_memory()
+            _FREE_MEMORY["time"] = now
+        return _FREE_MEMORY["bytes"]
+
+
+def _available_memory():
+    """Available memory in bytes.
+
+    Read from the OS where possible, so that planning does not need to
+    import psutil, which is only used as a fallback.
+    """
+    try:
+        # Includes reclaimable page cache, unlike the free pages below
+        with open("/proc/meminfo", "rb") as fd:
+            for line in fd:
+                if line.startswith(b"MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        pass
+    import psutil
+
+    return psutil.virtual_memory().available
+
+
+def _hamming_terms(num_bits, distance, num_elems):
+    """Number of bit-strings within distance, up to the number of elements."""
+    terms = 0
+    for kk in range(distance + 1):
+        terms += comb(num_bits, kk)
+        if terms >= num_elems:
+            return num_elems
+    return terms
+
+
+def _num_threads():
+    """Number of threads used by the compiled kernels."""
+    if not openmp:
+        return 1
+    threads = os.environ.get("OMP_NUM_THREADS", "")
+    if threads.isdigit():
+        return int(threads)
+    return os.cpu_count() or 1
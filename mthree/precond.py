@@ -0,0 +1,100 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module, invalid-name
+"""Preconditioners for the iterative solver"""
+
+import logging
+import time
+import numpy as np
+import scipy.sparse.linalg as spla
+
+from mthree.sparse import sparse_cal_matrix, _splu_nbytes
+from mthree.exceptions import M3Error
+
+logger = logging.getLogger(__name__)
+
+PRECONDITIONERS = ["jacobi", "block", "ilu"]
+
+# Number of consecutive bit-strings in each block of the block-Jacobi preconditioner
+BLOCK_SIZE = 64
+
+# Drop tolerance and maximum ratio of factor to matrix elements of the ILU preconditioner
+ILU_DROP_TOL = 1e-2
+ILU_FILL_FACTOR = 2
+
+
+def build_preconditioner(M, preconditioner="jacobi"):
+    """Build a preconditioner for the reduced A-matrix.
+
+    Parameters:
+        M (M3MatVec): M3 matrix-vector multiplication container.
+        preconditioner (str): 'jacobi' (default) divides by the diagonal, 'block'
+                              applies the inverses of dense diagonal blocks of
+                              consecutive bit-strings, and 'ilu' uses an incomplete
+                              LU factorization of the elements within distance.
+
+    Returns:
+        LinearOperator: Approximate inverse of the reduced A-matrix.
+        int: Memory used by the preconditioner in bytes.
+
+    Raises:
+        M3Error: Invalid preconditioner.
+        M3Error: ILU preconditioner at max distance.
+    """
+    if preconditioner not in PRECONDITIONERS:
+        raise M3Error(f"Invalid preconditioner {preconditioner}.")
+    st = time.perf_counter()
+    dims = M.num_elems
+    if preconditioner == "jacobi":
+        diags = M.get_diagonal()
+
+        def precond_matvec(x):
+            out = np.ravel(x) / diags
+            return out
+
+        precond_rmatvec = precond_matvec
+        nbytes = diags.nbytes
+    elif preconditioner == "block":
+        inv_blocks = np.linalg.inv(M.get_block_diagonal(BLOCK_SIZE))
+        num_padded = inv_blocks.shape[0] * BLOCK_SIZE
+
+        def apply_blocks(blocks, x):
+            padded = np.zeros(num_padded, dtype=np.float32)
+            padded[:dims] = np.ravel(x)
+            out = np.matmul(blocks, padded.reshape(-1, BLOCK_SIZE, 1))
+            return out.ravel()[:dims]
+
+        def precond_matvec(x):
+            return apply_blocks(inv_blocks, x)
+
+        def precond_rmatvec(x):
+            return apply_blocks(inv_blocks.transpose(0, 2, 1), x)
+
+        nbytes = inv_blocks.nbytes
+    else:
+        # Elements within distance are well connected, so fill must be bounded
+        ILU = spla.spilu(
+            sparse_cal_matrix(M), drop_tol=ILU_DROP_TOL, fill_factor=ILU_FILL_FACTOR
+        )
+
+        def precond_matvec(x):
+            return ILU.solve(np.asarray(x, dtype=np.float32).ravel())
+
+        def precond_rmatvec(x):
+            return ILU.solve(np.asarray(x, dtype=np.float32).ravel(), trans="T")
+
+        nbytes = _splu_nbytes(ILU)
+    logger.info(f"Preconditioner {preconditioner} build time: {time.perf_counter()-st}")
+    P = spla.LinearOperator(
+        (dims, dims), precond_matvec, rmatvec=precond_rmatvec, dtype=np.float32
+    )
+    return P, nbytes
@@ -9,11 +9,62 @@
 # Any modifications or derivative works of this code must retain this
 # copyright notice, and modified files need to carry a notice indicating
 # that they have been altered from the originals.
-cimport cython
-from libc.math cimport sqrt
 
-@cython.boundscheck(False)
-@cython.cdivision(True)
+import numpy as np
+from itertools import compress
+
+
+def nearest_probs(object vals, object offsets=None):
+    """Maps one or more quasi-probability vectors to the closest
+    probability vectors as defined by the L2-norm.
+
+    The nearest probability vector keeps the total of the input and is
+    max(vals - tau, 0) for a shift tau.  Instead of sorting, the set of kept
+    entries is found by repeatedly recomputing tau from the entries not below
+    the current tau, which needs only a handful of vectorized passes.  Several
+    distributions concatenated in vals are all solved in the same passes.
+
+    Parameters:
+        vals (ndarray): Quasi-probabilities, one or more distributions concatenated.
+        offsets (array_like): Start index of each distribution in vals,
+                              default is a single distribution.
+
+    Returns:
+        ndarray: Boolean mask of the entries kept.
+        ndarray: Probabilities, zero for entries not kept.
+        ndarray: Distance between distributions, one per distribution.
+
+    Notes:
+        Method from Smolin et al., Phys. Rev. Lett. 108, 070502 (2012).
+    """
+    vals = np.asarray(vals, dtype=float)
+    if offsets is None:
+        offsets = [0]
+    offsets = np.asarray(offsets, dtype=np.intp)
+    num_dists = offsets.shape[0]
+    lengths = np.diff(np.append(offsets, vals.shape[0]))
+    segments = np.repeat(np.arange(num_dists), lengths)
+    totals = np.bincount(segments, weights=vals, minlength=num_dists)
+    tau = np.zeros(num_dists, dtype=float)
+    keep = np.ones(vals.shape[0], dtype=bool)
+    while True:
+        new_keep = vals >= tau[segments]
+        if np.array_equal(new_keep, keep):
+            break
+        keep = new_keep
+        counts = np.bincount(segments, weights=keep, minlength=num_dists)
+        sums = np.bincount(segments, weights=vals * keep, minlength=num_dists)
+        tau = np.divide(
+            sums - totals, counts, out=np.full(num_dists, np.inf), where=counts > 0
+        )
+    probs = np.where(keep, vals - tau[segments], 0)
+    counts = np.bincount(segments, weights=keep, minlength=num_dists)
+    dropped = np.bincount(segments, weights=np.where(keep, 0, vals * vals),
+                          minlength=num_dists)
+    shift = np.where(counts > 0, tau, 0)
+    return keep, probs, np.sqrt(dropped + counts * shift * shift)
+
+
 def quasi_to_probs(object quasiprobs):
     """Takes a quasiprobability distribution and maps
     it to the closest probability distribution as defined by
@@ -26,19 +77,7 @@ def quasi_to_probs(object quasiprobs):
     Notes:
         Method from Smolin et al., Phys. Rev. Lett. 108, 070502 (2012).
     """
-    cdef dict sorted_probs = dict(sorted(quasiprobs.items(), key=lambda item: item[1]))
-    cdef unsigned int num_elems = len(sorted_probs)
-    cdef dict new_probs = {}
-    cdef double beta = 0
-    cdef object key
-    cdef double val, temp, diff = 0
-    for key, val in sorted_probs.items():
-        temp = val+beta/num_elems
-        if temp < 0:
-            beta += val
-            num_elems -= 1
-            diff += val*val
-        else:
-            diff += (beta/num_elems)*(beta/num_elems)
-            new_probs[key] = sorted_probs[key] + beta/num_elems
-    return new_probs, sqrt(diff)
+    vals = np.fromiter(quasiprobs.values(), dtype=float, count=len(quasiprobs))
+    keep, probs, dist = nearest_probs(vals)
+    new_probs = dict(zip(compress(quasiprobs, keep), probs[keep].tolist()))
+    return new_probs, dist[0]
@@ -0,0 +1,153 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module, invalid-name
+"""Sparse direct solver routines"""
+
+import logging
+import time
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from mthree.norms import ainv_onenorm_est_splu
+from mthree.matvec import M3MatVec
+from mthree.converters import bytes_to_packed
+from mthree.utils import counts_to_vector, vector_to_quasiprobs, bytes_to_bitstrings
+from mthree.exceptions import M3Error
+
+logger = logging.getLogger(__name__)
+
+# Average number of elements per row of the reduced A-matrix above which
+# fill-in makes the sparse LU factorization slower than GMRES
+SPARSE_MAX_ROW_ELEMS = 4
+
+
+def sparse_cal_matrix(M):
+    """Reduced A-matrix of a matrix-free operator as a sparse matrix.
+
+    Parameters:
+        M (M3MatVec): M3 matrix-vector multiplication container.
+
+    Returns:
+        csc_matrix: Reduced A-matrix.
+    """
+    values, col_inds, row_ptrs = M.get_csr()
+    A = sp.csr_matrix(
+        (values, col_inds.astype(np.int64), row_ptrs.astype(np.int64)),
+        shape=(M.num_elems, M.num_elems),
+    )
+    return A.tocsc()
+
+
+def sparse_solver(
+    mitigator,
+    counts,
+    qubits,
+    distance,
+    return_mitigation_overhead=False,
+    array_output=False,
+):
+    """Apply the mitigation using a sparse LU factorization.
+
+    Only the elements within the given distance are stored, so memory
+    is bounded by the number of neighbors rather than the square of the
+    number of bit-strings.
+
+    Parameters:
+        counts (dict or tuple): Input counts dict, or tuple of unique bit-string
+                                bytes and counts from counts_to_arrays.
+        qubits (int): Qubits over which to calibrate.
+        distance (int): Distance to correct for, less than the number of qubits.
+        return_mitigation_overhead (bool): Returns the mitigation overhead, default=False.
+        array_output (bool): Return an ArrayQuasiDistribution for tuple counts,
+                             default=False.
+
+    Returns:
+        QuasiDistribution: dict of Quasiprobabilites
+
+    Raises:
+        M3Error: Distance is the maximum, so the matrix is dense.
+    """
+    num_bits = len(qubits)
+    if distance >= num_bits:
+        raise M3Error("Sparse method requires distance less than number of qubits.")
+    cals = mitigator._form_cals(qubits)
+    packed = isinstance(counts, tuple)
+    cache = getattr(mitigator, "solver_cache", None)
+    entry = None
+    if cache is not None:
+        key = cache.key("sparse", qubits, distance, counts, mitigator.cals_version)
+        entry = cache.get(key)
+        if entry is not None and return_mitigation_overhead and entry["gamma"] is None:
+            entry = None
+
+    sorted_counts = None
+    if entry is None:
+        st = time.perf_counter()
+        if packed:
+            probs = np.asarray(counts[1] / counts[1].sum(), dtype=np.float32)
+            bitstrings = bytes_to_packed(counts[0], num_bits)
+            M = M3MatVec((bitstrings, probs, num_bits), cals, distance)
+        else:
+            M = M3MatVec(dict(counts), cals, distance)
+            sorted_counts = M.sorted_counts
+        A = sparse_cal_matrix(M)
+        # Minimum degree ordering on A.T + A suits the symmetric structure
+        LU = spla.splu(A, permc_spec="MMD_AT_PLUS_A")
+        col_norms = M.get_col_norms()
+        logger.info(
+            f"Sparse LU with {A.nnz} elements and {LU.L.nnz + LU.U.nnz} factor "
+            f"elements took {time.perf_counter()-st}"
+        )
+        gamma = None
+        if return_mitigation_overhead:
+            gamma = ainv_onenorm_est_splu(LU)
+        vec = np.asarray(M.probs, dtype=np.float32)
+        if cache is not None:
+            cache.put(
+                key,
+                {
+                    "LU": LU,
+                    "col_norms": col_norms,
+                    "gamma": gamma,
+                    "bitstrings": None if packed else list(sorted_counts),
+                },
+                _splu_nbytes(LU) + col_norms.nbytes,
+            )
+    else:
+        # Same bit-strings as a previous solve, so only the triangular solves are needed
+        LU = entry["LU"]
+        col_norms = entry["col_norms"]
+        gamma = entry["gamma"]
+        if packed:
+            vec = np.asarray(counts[1] / counts[1].sum(), dtype=np.float32)
+        else:
+            sorted_counts = {
+                bitstring: counts[bitstring] for bitstring in entry["bitstrings"]
+            }
+            vec = counts_to_vector(sorted_counts)
+    x = LU.solve(np.asarray(vec, dtype=LU.U.dtype))
+    if packed and array_output:
+        out = vector_to_quasiprobs(x, counts[0], num_bits)
+    elif packed:
+        out = vector_to_quasiprobs(x, bytes_to_bitstrings(counts[0], num_bits))
+    else:
+        out = vector_to_quasiprobs(x, sorted_counts)
+    return out, col_norms, gamma
+
+
+def _splu_nbytes(LU):
+    """Memory used by a sparse LU factorization in bytes."""
+    nbytes = LU.perm_r.nbytes + LU.perm_c.nbytes
+    for mat in [LU.L, LU.U]:
+        nbytes += mat.data.nbytes + mat.indices.nbytes + mat.indptr.nbytes
+    return nbytes
@@ -13,60 +13,60 @@ that they have been altered from the originals.
 */
 #include <stddef.h>
 #include <stdbool.h>
-#include "distance.h"
+#include <stdint.h>
 #include "elements.h"
 
 #pragma once
 
-void compute_col_norms(float * col_norms,
-                       const unsigned char * __restrict bitstrings,
-                       const float * __restrict cals,
-                       unsigned int num_bits,
-                       unsigned int num_elems,
-                       unsigned int distance)
+void compute_scaled_norms(double * scaled_norms,
+                          const uint64_t * __restrict bitstrings,
+                          const double * __restrict ratios,
+                          unsigned int num_bits,
+                          unsigned int num_elems,
+                          const size_t * __restrict row_ptrs,
+                          const unsigned int * __restrict col_inds,
+                          bool MAX_DIST)
     /**
-   * @brief Computes the renormalization factor for each column of A-matrix
+   * @brief Computes the renormalization factor for each column of A-matrix,
+   * relative to the diagonal element of that column
    *
-   * @param col_norms Pointer to where to store col norm data
-   * @param bitstrings Pointer to array of bitstrings
-   * @param cals Pointer to array containing calibration data
+   * The column norm is the scaled norm times exp(diag_logs[col]).
+   *
+   * @param scaled_norms Pointer to where to store scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
    * @param num_bits Number of bits in a single bit-string
    * @param num_elems Number of elements (dimension) of reduced A-matrix
-   * @param distance Max Hamming distance
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
+   * @param MAX_DIST Is the distance maximum (equal to number of bits)
    */
     {
 
       size_t col;
-      bool MAX_DIST = false;
-      int num_terms = -1;
-
-      if (distance == num_bits)
-      {
-        MAX_DIST = true;
-      }
-      else{
-        num_terms = (int)hamming_terms(num_bits, distance, num_elems); 
-      }
+      unsigned int words = num_words(num_bits);
 
       #pragma omp parallel for
       for (col = 0; col < num_elems; ++col)
       {
-        float col_norm = 0.0F;
-        size_t row;
-        int terms = 0;
-        for (row = 0; row < num_elems; ++row)
+        double col_norm = 0.0;
+        size_t kk, row, start, stop;
+        if (MAX_DIST)
+        {
+          start = 0;
+          stop = num_elems;
+        }
+        else
+        {
+          start = row_ptrs[col];
+          stop = row_ptrs[col+1];
+        }
+        for (kk = start; kk < stop; ++kk)
         {
-          if (MAX_DIST || within_distance(row, col, bitstrings, num_bits, distance))
-          {
-            col_norm += compute_element(row, col, bitstrings, cals, num_bits);
-            terms += 1;
-            if (terms == num_terms)
-            {
-              break;
-            }
-          }
+          row = MAX_DIST ? kk : col_inds[kk];
+          col_norm += flip_product(row, col, bitstrings, ratios, words);
         }
-        col_norms[col] = col_norm;
+        scaled_norms[col] = col_norm;
       }
 
     }
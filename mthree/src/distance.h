@@ -13,21 +13,74 @@ that they have been altered from the originals.
 */
 #include <stddef.h>
 #include <stdbool.h>
+#include <stdint.h>
+#if defined(_MSC_VER)
+#include <intrin.h>
+#endif
 
 #pragma once
 
+static inline unsigned int popcount64(uint64_t word)
+  /**
+   * @brief Number of set bits in a 64-bit word.
+   *
+   * @param word Input word
+   *
+   * @return Number of set bits
+   */
+  {
+#if defined(_MSC_VER)
+    return (unsigned int)__popcnt64(word);
+#else
+    return (unsigned int)__builtin_popcountll(word);
+#endif
+  }
+
+
+static inline unsigned int ctz64(uint64_t word)
+  /**
+   * @brief Index of the lowest set bit in a non-zero 64-bit word.
+   *
+   * @param word Input word
+   *
+   * @return Number of trailing zeros
+   */
+  {
+#if defined(_MSC_VER)
+    unsigned long index;
+    _BitScanForward64(&index, word);
+    return (unsigned int)index;
+#else
+    return (unsigned int)__builtin_ctzll(word);
+#endif
+  }
+
+
+static inline unsigned int num_words(unsigned int num_bits)
+  /**
+   * @brief Number of 64-bit words needed to hold a packed bit-string.
+   *
+   * @param num_bits Number of bits in a single bit-string
+   *
+   * @return Number of words
+   */
+  {
+    return (num_bits + 63U) / 64U;
+  }
+
+
 static inline bool within_distance(unsigned int row,
                                    unsigned int col,
-                                   const unsigned char * __restrict bitstrings,
-                                   unsigned int num_bits,
+                                   const uint64_t * __restrict bitstrings,
+                                   unsigned int words,
                                    unsigned int distance)
   /**
    * @brief Computes if two bit-strings are within the specified Hamming distance.
    *
    * @param row Index for row bit-string
    * @param col Index for col bit-string
-   * @param bitstrings Pointer to array of bit-strings
-   * @param num_bits Number of bits in a single bit-string
+   * @param bitstrings Pointer to array of packed bit-strings
+   * @param words Number of 64-bit words in a single packed bit-string
    * @param distance Max Hamming distance
    *
    * @return Are the bit-strings within the Hamming distance 
@@ -35,31 +88,38 @@ static inline bool within_distance(unsigned int row,
   {
     size_t kk;
     unsigned int sum=0;
-    const unsigned char * row_pos = &bitstrings[num_bits*row];
-    const unsigned char * col_pos = &bitstrings[num_bits*col];
-    #pragma omp simd reduction(+:sum)
-    for (kk = 0; kk < num_bits; ++kk)
+    const uint64_t * row_pos = &bitstrings[(size_t)words*row];
+    const uint64_t * col_pos = &bitstrings[(size_t)words*col];
+    for (kk = 0; kk < words; ++kk)
         {
-          sum += row_pos[kk] ^ col_pos[kk];
+          sum += popcount64(row_pos[kk] ^ col_pos[kk]);
+          if (sum > distance)
+          {
+            return false;
+          }
         }
-    return sum <= distance;
+    return true;
     
   }
 
 
-static inline unsigned int binomial_coeff(unsigned int n, unsigned int k)
+static inline double binomial_coeff(unsigned int n, unsigned int k)
+  /**
+   * @brief Binomial coefficient, computed in floating point so that
+   * large bit-string lengths do not overflow.
+   */
   {
     if (k > n)
       {
-        return 0U;
+        return 0.0;
       }
     else if ((k == 0) || (k == n))
       {
-        return 1U;
+        return 1.0;
       }
     else if ((k == 1) || (k == (n-1)))
       {
-        return n;
+        return (double)n;
       }
     else if (k+k < n)
       {
@@ -84,15 +144,14 @@ unsigned int hamming_terms(unsigned int num_bits, unsigned int distance, unsigne
    */
 {
   unsigned int kk;
-  unsigned int out = 0;
+  double out = 0;
   for (kk=0; kk < (distance+1); ++kk)
     {
       out += binomial_coeff(num_bits, kk);
       if (out >= num_elems)
       {
-        out = num_elems;
-        break;
+        return num_elems;
       }
     }
-  return out;
+  return (unsigned int)out;
 }
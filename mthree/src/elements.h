@@ -13,33 +13,143 @@ that they have been altered from the originals.
 */
 #include <stddef.h>
 #include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <math.h>
 #include "distance.h"
 
 #pragma once
 
-static inline float compute_element(unsigned int row,
-                                   unsigned int col,
-                                   const unsigned char * __restrict bitstrings,
-                                   const float * __restrict cals,
-                                   unsigned int num_bits)
+/* Smallest diagonal calibration value used when forming flip ratios, so
+   that a completely failed qubit does not give infinite ratios.  Flip ratios
+   can then reach 1/MIN_DIAG_CAL, so products of them are kept in double
+   precision and only elements normalized by their column are stored as float. */
+#define MIN_DIAG_CAL 1e-12F
+
+
+void compute_ratios(double * ratios,
+                    const float * __restrict cals,
+                    unsigned int num_bits)
+    /**
+   * @brief Computes the ratio of off-diagonal to diagonal calibration data
+   * for flipping each bit
+   *
+   * ratios[2*k+c] is the factor by which an A-matrix element changes when
+   * bit k of the row bit-string is flipped away from the column bit value c.
+   *
+   * @param ratios Pointer to array of length 2*num_bits
+   * @param cals Pointer to array containing calibration data
+   * @param num_bits Number of bits in a single bit-string
+   */
+    {
+      size_t kk;
+      double p00, p11;
+      for (kk = 0; kk < num_bits; ++kk)
+      {
+        p00 = cals[4*kk] > MIN_DIAG_CAL ? cals[4*kk] : MIN_DIAG_CAL;
+        p11 = cals[4*kk+3] > MIN_DIAG_CAL ? cals[4*kk+3] : MIN_DIAG_CAL;
+        ratios[2*kk] = cals[4*kk+2] / p00;
+        ratios[2*kk+1] = cals[4*kk+1] / p11;
+      }
+    }
+
+
+int compute_diag_logs(double * diag_logs,
+                      const uint64_t * __restrict bitstrings,
+                      const float * __restrict cals,
+                      unsigned int num_bits,
+                      unsigned int num_elems)
+    /**
+   * @brief Computes the log of the diagonal A-matrix element of each bit-string
+   *
+   * Kept in log form since the product over many bits can underflow.
+   *
+   * @param diag_logs Pointer to array of length num_elems
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param cals Pointer to array containing calibration data
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   *
+   * @return 0 on success, -1 if the scratch space could not be allocated
+   */
+    {
+      size_t idx, kk;
+      unsigned int words = num_words(num_bits);
+      float temp;
+      double * log_cals = (double *)malloc(2*num_bits*sizeof(double));
+      if (log_cals == NULL)
+      {
+        return -1;
+      }
+
+      for (kk = 0; kk < num_bits; ++kk)
+      {
+        temp = cals[4*kk] > MIN_DIAG_CAL ? cals[4*kk] : MIN_DIAG_CAL;
+        log_cals[2*kk] = log((double)temp);
+        temp = cals[4*kk+3] > MIN_DIAG_CAL ? cals[4*kk+3] : MIN_DIAG_CAL;
+        log_cals[2*kk+1] = log((double)temp);
+      }
+
+      #pragma omp parallel for private(kk)
+      for (idx = 0; idx < num_elems; ++idx)
+      {
+        double out = 0;
+        const uint64_t * pos = &bitstrings[(size_t)words*idx];
+        for (kk = 0; kk < num_bits; ++kk)
+        {
+          out += log_cals[2*kk + ((pos[kk >> 6] >> (kk & 63U)) & 1U)];
+        }
+        diag_logs[idx] = out;
+      }
+      free(log_cals);
+      return 0;
+    }
+
+
+static inline double flip_product(unsigned int row,
+                                  unsigned int col,
+                                  const uint64_t * __restrict bitstrings,
+                                  const double * __restrict ratios,
+                                  unsigned int words)
+  /**
+   * @brief A-matrix element relative to the diagonal element of the column
+   *
+   * Only the bits that differ between the two bit-strings contribute, so the
+   * cost is set by the Hamming distance rather than the number of bits.
+   *
+   * @param row Index for row bit-string
+   * @param col Index for col bit-string
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
+   * @param words Number of 64-bit words in a single packed bit-string
+   *
+   * @return Element A[row, col] / A[col, col]
+   */
   {
-    float res = 1.0F;
+    double res = 1.0;
     size_t kk;
-    unsigned int offset;
-    const unsigned char * row_pos = &bitstrings[num_bits*row];
-    const unsigned char * col_pos = &bitstrings[num_bits*col];
-    #pragma omp simd reduction(*:res)
-    for (kk=0; kk < num_bits; ++kk)
+    uint64_t diff, col_word;
+    unsigned int bit;
+    const uint64_t * row_pos = &bitstrings[(size_t)words*row];
+    const uint64_t * col_pos = &bitstrings[(size_t)words*col];
+    for (kk = 0; kk < words; ++kk)
     {
-      offset = 2*row_pos[kk] + col_pos[kk];
-      res *= cals[4*kk+offset];
+      col_word = col_pos[kk];
+      diff = row_pos[kk] ^ col_word;
+      while (diff)
+      {
+        bit = ctz64(diff);
+        res *= ratios[2*(64*kk + bit) + ((col_word >> bit) & 1U)];
+        diff &= diff - 1;
+      }
     }
     return res;
   }
 
 
-void column_elements(const unsigned char * __restrict bitstrings,
-                     const float * __restrict cals_ptr,
+void column_elements(const uint64_t * __restrict bitstrings,
+                     const double * __restrict ratios,
+                     const double * __restrict diag_logs,
                      unsigned int num_elems,
                      unsigned int num_bits,
                      unsigned int distance,
@@ -49,21 +159,22 @@ void column_elements(const unsigned char * __restrict bitstrings,
                      bool MAX_DIST)
     {
       size_t jj;
+      unsigned int words = num_words(num_bits);
 
       #pragma omp parallel for
       for (jj = 0; jj < num_elems; ++jj)
       {
-        float temp, col_norm = 0;
+        double col_norm = 0;
         size_t ii;
         int terms = 0;
         float * col_ptr = &W_ptr[jj*num_elems];
+        /* Elements relative to the diagonal can exceed the float range, so
+           the column is normalized before any element is stored */
         for (ii = 0; ii < num_elems; ++ii)
         {
-          if (MAX_DIST || within_distance(ii, jj, bitstrings, num_bits, distance))
+          if (MAX_DIST || within_distance(ii, jj, bitstrings, words, distance))
           {
-            temp = compute_element(ii, jj, bitstrings, cals_ptr, num_bits);
-            col_ptr[ii] = temp;
-            col_norm += temp;
+            col_norm += flip_product(ii, jj, bitstrings, ratios, words);
             terms += 1;
             if (terms == num_terms)
             {
@@ -71,9 +182,20 @@ void column_elements(const unsigned char * __restrict bitstrings,
             }
           }
         }
-        col_norms_ptr[jj] = col_norm;
-        #pragma omp simd
+        terms = 0;
         for (ii = 0; ii < num_elems; ++ii)
-          col_ptr[ii] /= col_norm;
+        {
+          if (MAX_DIST || within_distance(ii, jj, bitstrings, words, distance))
+          {
+            col_ptr[ii] = (float)(flip_product(ii, jj, bitstrings, ratios, words) / col_norm);
+            terms += 1;
+            if (terms == num_terms)
+            {
+              break;
+            }
+          }
+        }
+        /* Rounded the same way as the column norms of M3MatVec */
+        col_norms_ptr[jj] = (float)(exp(diag_logs[jj]) * col_norm);
       }
-    }
\ No newline at end of file
+    }
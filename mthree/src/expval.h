@@ -0,0 +1,92 @@
+/*
+This code is part of Mthree.
+
+(C) Copyright IBM 2024.
+
+This code is licensed under the Apache License, Version 2.0. You may
+obtain a copy of this license in the LICENSE.txt file in the root directory
+of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+
+Any modifications or derivative works of this code must retain this
+copyright notice, and modified files need to carry a notice indicating
+that they have been altered from the originals.
+*/
+#include <stddef.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include "distance.h"
+
+#pragma once
+
+/* Number of bit-strings evaluated against all operators before moving on,
+   so that a block stays in cache while every operator reads it. */
+#define EXPVAL_BLOCK 4096
+
+
+void batched_expval(double * __restrict out,
+                    const uint64_t * __restrict bitstrings,
+                    const double * __restrict vals,
+                    size_t num_elems,
+                    unsigned int num_bits,
+                    const uint64_t * __restrict z_masks,
+                    const uint64_t * __restrict proj_masks,
+                    const uint64_t * __restrict proj_vals,
+                    unsigned int num_ops)
+    /**
+   * @brief Expectation values of many diagonal operators in one pass over a distribution
+   *
+   * Each operator is encoded as three packed masks: the bits acted on by Z,
+   * the bits acted on by a 0 or 1 projector, and the values those projectors
+   * select.  A bit-string contributes its value times (-1)^(number of Z bits set),
+   * or zero if any projector does not match.
+   *
+   * @param out Pointer to where to store the expectation value of each operator
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param vals Pointer to value of each bitstring
+   * @param num_elems Number of bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param z_masks Pointer to packed Z masks, one per operator
+   * @param proj_masks Pointer to packed projector masks, one per operator
+   * @param proj_vals Pointer to packed projector values, one per operator
+   * @param num_ops Number of operators
+   */
+    {
+      size_t start, stop, kk;
+      int op;
+      unsigned int ww, parity;
+      unsigned int words = num_words(num_bits);
+      bool match;
+
+      for (op = 0; op < (int)num_ops; ++op)
+      {
+        out[op] = 0.0;
+      }
+      for (start = 0; start < num_elems; start += EXPVAL_BLOCK)
+      {
+        stop = start + EXPVAL_BLOCK < num_elems ? start + EXPVAL_BLOCK : num_elems;
+        #pragma omp parallel for private(kk, ww, parity, match)
+        for (op = 0; op < (int)num_ops; ++op)
+        {
+          const uint64_t * z = z_masks + (size_t)op*words;
+          const uint64_t * pm = proj_masks + (size_t)op*words;
+          const uint64_t * pv = proj_vals + (size_t)op*words;
+          double acc = 0.0;
+          for (kk = start; kk < stop; ++kk)
+          {
+            const uint64_t * bs = bitstrings + kk*words;
+            parity = 0;
+            match = true;
+            for (ww = 0; ww < words; ++ww)
+            {
+              parity += popcount64(bs[ww] & z[ww]);
+              match &= (bs[ww] & pm[ww]) == pv[ww];
+            }
+            if (match)
+            {
+              acc += (parity & 1U) ? -vals[kk] : vals[kk];
+            }
+          }
+          out[op] += acc;
+        }
+      }
+    }
@@ -0,0 +1,272 @@
+/*
+This code is part of Mthree.
+
+(C) Copyright IBM 2024.
+
+This code is licensed under the Apache License, Version 2.0. You may
+obtain a copy of this license in the LICENSE.txt file in the root directory
+of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+
+Any modifications or derivative works of this code must retain this
+copyright notice, and modified files need to carry a notice indicating
+that they have been altered from the originals.
+*/
+#include <stddef.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <math.h>
+#include "matvec.h"
+
+#pragma once
+
+double vec_dot(const float * __restrict x,
+               const float * __restrict y,
+               unsigned int num_elems)
+    /**
+   * @brief Dot product of two vectors accumulated in double
+   *
+   * @param x Pointer to first vector
+   * @param y Pointer to second vector
+   * @param num_elems Length of vectors
+   */
+    {
+      size_t kk;
+      double out = 0.0;
+      #pragma omp parallel for reduction(+:out)
+      for (kk = 0; kk < num_elems; ++kk)
+      {
+        out += (double)x[kk] * (double)y[kk];
+      }
+      return out;
+    }
+
+
+void residual(const float * __restrict x,
+              const float * __restrict b,
+              float * __restrict out,
+              const double * __restrict scaled_norms,
+              const uint64_t * __restrict bitstrings,
+              const double * __restrict ratios,
+              unsigned int num_bits,
+              unsigned int num_elems,
+              const size_t * __restrict row_ptrs,
+              const unsigned int * __restrict col_inds,
+              bool MAX_DIST)
+    /**
+   * @brief Computes the residual b - A x of the reduced A-matrix
+   *
+   * @param x Pointer to current solution
+   * @param b Pointer to right-hand side
+   * @param out Pointer to where to store the residual
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
+   * @param MAX_DIST Is the distance maximum (equal to number of bits)
+   */
+    {
+      size_t kk;
+      matvec(x, out, scaled_norms, bitstrings, ratios, num_bits, num_elems,
+             row_ptrs, col_inds, MAX_DIST);
+      #pragma omp parallel for
+      for (kk = 0; kk < num_elems; ++kk)
+      {
+        out[kk] = b[kk] - out[kk];
+      }
+    }
+
+
+int gmres(float * __restrict x,
+          const float * __restrict b,
+          float * __restrict work,
+          double * __restrict hess,
+          double * __restrict resids,
+          unsigned int * num_iters,
+          const double * __restrict scaled_norms,
+          const uint64_t * __restrict bitstrings,
+          const double * __restrict ratios,
+          unsigned int num_bits,
+          unsigned int num_elems,
+          const size_t * __restrict row_ptrs,
+          const unsigned int * __restrict col_inds,
+          bool MAX_DIST,
+          unsigned int restart,
+          unsigned int max_iter,
+          double tol)
+    /**
+   * @brief Restarted GMRES with right Jacobi preconditioning on the reduced A-matrix
+   *
+   * The inverse of the diagonal of the reduced A-matrix is the scaled col norms,
+   * so the preconditioner is applied without storing the diagonal.  Right
+   * preconditioning keeps the Arnoldi residual equal to the true residual, and
+   * the solver stops once it is below max(tol * |b|, tol), as in SciPy.
+   *
+   * @param x Pointer to initial guess, overwritten by the solution
+   * @param b Pointer to right-hand side
+   * @param work Pointer to float workspace of size (restart+2)*num_elems
+   * @param hess Pointer to double workspace of size (restart+1)*(restart+4)
+   * @param resids Pointer to where to store the residual norm of each iteration
+   * @param num_iters Pointer to where to store the number of iterations performed
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
+   * @param MAX_DIST Is the distance maximum (equal to number of bits)
+   * @param restart Number of iterations between restarts
+   * @param max_iter Maximum total number of iterations
+   * @param tol Tolerance on the residual norm
+   *
+   * @return 0 if converged, else the number of iterations performed
+   */
+    {
+      size_t kk;
+      unsigned int ii, jj, steps, total = 0;
+      bool converged = false;
+      double beta, nrm, denom, temp, thresh;
+      double * H = hess;
+      double * cs = hess + (size_t)(restart+1)*restart;
+      double * sn = cs + restart;
+      double * g = sn + restart;
+      double * y = g + restart + 1;
+      float * V = work;
+      float * z = work + (size_t)(restart+1)*num_elems;
+      float * v, * w;
+
+      thresh = tol * sqrt(vec_dot(b, b, num_elems));
+      if (thresh < tol)
+      {
+        thresh = tol;
+      }
+
+      residual(x, b, V, scaled_norms, bitstrings, ratios, num_bits, num_elems,
+               row_ptrs, col_inds, MAX_DIST);
+      beta = sqrt(vec_dot(V, V, num_elems));
+      converged = beta <= thresh;
+
+      while (!converged && total < max_iter)
+      {
+        #pragma omp parallel for
+        for (kk = 0; kk < num_elems; ++kk)
+        {
+          V[kk] = (float)(V[kk] / beta);
+        }
+        g[0] = beta;
+        for (ii = 1; ii <= restart; ++ii)
+        {
+          g[ii] = 0.0;
+        }
+
+        steps = 0;
+        for (jj = 0; jj < restart && total < max_iter; ++jj)
+        {
+          v = V + (size_t)jj*num_elems;
+          w = V + (size_t)(jj+1)*num_elems;
+          // Jacobi preconditioner: z = D^-1 v
+          #pragma omp parallel for
+          for (kk = 0; kk < num_elems; ++kk)
+          {
+            z[kk] = (float)(v[kk] * scaled_norms[kk]);
+          }
+          matvec(z, w, scaled_norms, bitstrings, ratios, num_bits, num_elems,
+                 row_ptrs, col_inds, MAX_DIST);
+          // Modified Gram-Schmidt
+          for (ii = 0; ii <= jj; ++ii)
+          {
+            v = V + (size_t)ii*num_elems;
+            temp = vec_dot(w, v, num_elems);
+            H[(size_t)jj*(restart+1)+ii] = temp;
+            #pragma omp parallel for
+            for (kk = 0; kk < num_elems; ++kk)
+            {
+              w[kk] -= (float)temp * v[kk];
+            }
+          }
+          nrm = sqrt(vec_dot(w, w, num_elems));
+          H[(size_t)jj*(restart+1)+jj+1] = nrm;
+          if (nrm > 0)
+          {
+            #pragma omp parallel for
+            for (kk = 0; kk < num_elems; ++kk)
+            {
+              w[kk] = (float)(w[kk] / nrm);
+            }
+          }
+          // Apply previous Givens rotations to the new column
+          for (ii = 0; ii < jj; ++ii)
+          {
+            temp = cs[ii]*H[(size_t)jj*(restart+1)+ii] + sn[ii]*H[(size_t)jj*(restart+1)+ii+1];
+            H[(size_t)jj*(restart+1)+ii+1] = -sn[ii]*H[(size_t)jj*(restart+1)+ii]
+                                             + cs[ii]*H[(size_t)jj*(restart+1)+ii+1];
+            H[(size_t)jj*(restart+1)+ii] = temp;
+          }
+          denom = hypot(H[(size_t)jj*(restart+1)+jj], nrm);
+          if (denom == 0)
+          {
+            cs[jj] = 1.0;
+            sn[jj] = 0.0;
+          }
+          else
+          {
+            cs[jj] = H[(size_t)jj*(restart+1)+jj] / denom;
+            sn[jj] = nrm / denom;
+          }
+          H[(size_t)jj*(restart+1)+jj] = denom;
+          H[(size_t)jj*(restart+1)+jj+1] = 0.0;
+          g[jj+1] = -sn[jj]*g[jj];
+          g[jj] = cs[jj]*g[jj];
+
+          resids[total] = fabs(g[jj+1]);
+          total += 1;
+          steps += 1;
+          if (fabs(g[jj+1]) <= thresh || nrm == 0)
+          {
+            converged = fabs(g[jj+1]) <= thresh;
+            break;
+          }
+        }
+
+        // Back substitution for the Krylov coefficients
+        for (ii = steps; ii-- > 0;)
+        {
+          temp = g[ii];
+          for (jj = ii+1; jj < steps; ++jj)
+          {
+            temp -= H[(size_t)jj*(restart+1)+ii] * y[jj];
+          }
+          y[ii] = H[(size_t)ii*(restart+1)+ii] != 0 ? temp / H[(size_t)ii*(restart+1)+ii] : 0.0;
+        }
+        // x += D^-1 V y
+        #pragma omp parallel for private(ii)
+        for (kk = 0; kk < num_elems; ++kk)
+        {
+          double update = 0.0;
+          for (ii = 0; ii < steps; ++ii)
+          {
+            update += y[ii] * V[(size_t)ii*num_elems+kk];
+          }
+          x[kk] += (float)(update * scaled_norms[kk]);
+        }
+
+        // Restart from the true residual
+        residual(x, b, V, scaled_norms, bitstrings, ratios, num_bits, num_elems,
+                 row_ptrs, col_inds, MAX_DIST);
+        beta = sqrt(vec_dot(V, V, num_elems));
+        converged = beta <= thresh;
+        if (steps == 0 || beta == 0)
+        {
+          break;
+        }
+      }
+      *num_iters = total;
+      if (converged)
+      {
+        return 0;
+      }
+      return total > 0 ? (int)total : 1;
+    }
@@ -13,58 +13,60 @@ that they have been altered from the originals.
 */
 #include <stddef.h>
 #include <stdbool.h>
-#include "distance.h"
+#include <stdint.h>
 #include "elements.h"
 
 #pragma once
 
 void matvec(const float * __restrict x,
             float * out,
-            const float * __restrict col_norms,
-            const unsigned char * __restrict bitstrings,
-            const float * __restrict cals,
+            const double * __restrict scaled_norms,
+            const uint64_t * __restrict bitstrings,
+            const double * __restrict ratios,
             unsigned int num_bits,
             unsigned int num_elems,
-            unsigned int distance,
-            int num_terms,
+            const size_t * __restrict row_ptrs,
+            const unsigned int * __restrict col_inds,
             bool MAX_DIST)
     /**
    * @brief Action of reduced A-matrix on a vector
    *
    * @param x Pointer to input vector of data
    * @param out Pointer to zeroed output vector
-   * @param col_norms Pointer to where to store col norm data
-   * @param bitstrings Pointer to array of bitstrings
-   * @param cals Pointer to array containing calibration data
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
    * @param num_bits Number of bits in a single bit-string
    * @param num_elems Number of elements (dimension) of reduced A-matrix
-   * @param distance Max Hamming distance
-   * @param num_terms Number of terms within hamming distance
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
    * @param MAX_DIST Is the distance maximum (equal to number of bits)
    */
     {
 
       size_t row;
+      unsigned int words = num_words(num_bits);
 
       #pragma omp parallel for
       for (row = 0; row < num_elems; ++row)
       {
         float temp_elem, row_sum = 0;
-        size_t col;
-        int terms = 0;
-        for (col = 0; col < num_elems; ++col)
+        size_t kk, col, start, stop;
+        if (MAX_DIST)
         {
-          if (MAX_DIST || within_distance(row, col, bitstrings, num_bits, distance))
-          {
-            temp_elem = compute_element(row, col, bitstrings, cals, num_bits);
-            temp_elem /= col_norms[col];
-            row_sum += temp_elem * x[col];
-            terms += 1;
-            if (terms == num_terms)
-            {
-              break; /* Break out of col for-loop*/
-            }
-          }
+          start = 0;
+          stop = num_elems;
+        }
+        else
+        {
+          start = row_ptrs[row];
+          stop = row_ptrs[row+1];
+        }
+        for (kk = start; kk < stop; ++kk)
+        {
+          col = MAX_DIST ? kk : col_inds[kk];
+          temp_elem = (float)(flip_product(row, col, bitstrings, ratios, words) / scaled_norms[col]);
+          row_sum += temp_elem * x[col];
         }
         out[row] = row_sum;
       }
@@ -73,52 +75,285 @@ void matvec(const float * __restrict x,
 
 void rmatvec(const float * __restrict x,
              float * out,
-             const float * __restrict col_norms,
-             const unsigned char * __restrict bitstrings,
-             const float * __restrict cals,
+             const double * __restrict scaled_norms,
+             const uint64_t * __restrict bitstrings,
+             const double * __restrict ratios,
              unsigned int num_bits,
              unsigned int num_elems,
-             unsigned int distance,
-             int num_terms,
+             const size_t * __restrict row_ptrs,
+             const unsigned int * __restrict col_inds,
              bool MAX_DIST)
     /**
    * @brief Action of adjoint of reduced A-matrix on a vector
    *
+   * The neighbor index is symmetric, so the neighbors of a column
+   * are found at the same place as those of the matching row.
+   *
    * @param x Pointer to input vector of data
    * @param out Pointer to zeroed output vector
-   * @param col_norms Pointer to where to store col norm data
-   * @param bitstrings Pointer to array of bitstrings
-   * @param cals Pointer to array containing calibration data
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
    * @param num_bits Number of bits in a single bit-string
    * @param num_elems Number of elements (dimension) of reduced A-matrix
-   * @param distance Max Hamming distance
-   * @param num_terms Number of terms within hamming distance
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
    * @param MAX_DIST Is the distance maximum (equal to number of bits)
    */
     {
 
       size_t col;
+      unsigned int words = num_words(num_bits);
 
       #pragma omp parallel for
       for (col = 0; col < num_elems; ++col)
       {
-        float temp_elem, row_sum = 0;
-        size_t row;
-        int terms = 0;
-        for (row = 0; row < num_elems; ++row)
+        /* Elements relative to the diagonal can exceed the float range */
+        double row_sum = 0;
+        size_t kk, row, start, stop;
+        if (MAX_DIST)
+        {
+          start = 0;
+          stop = num_elems;
+        }
+        else
+        {
+          start = row_ptrs[col];
+          stop = row_ptrs[col+1];
+        }
+        for (kk = start; kk < stop; ++kk)
+        {
+          row = MAX_DIST ? kk : col_inds[kk];
+          row_sum += flip_product(row, col, bitstrings, ratios, words) * x[row];
+        }
+        out[col] = (float)(row_sum / scaled_norms[col]);
+      }
+    }
+
+
+void matmat(const float * __restrict X,
+            float * out,
+            const double * __restrict scaled_norms,
+            const uint64_t * __restrict bitstrings,
+            const double * __restrict ratios,
+            unsigned int num_bits,
+            unsigned int num_elems,
+            unsigned int num_vecs,
+            const size_t * __restrict row_ptrs,
+            const unsigned int * __restrict col_inds,
+            bool MAX_DIST)
+    /**
+   * @brief Action of reduced A-matrix on a block of vectors
+   *
+   * Each matrix element is computed once and applied to all vectors.
+   *
+   * @param X Pointer to row-major (num_elems, num_vecs) input data
+   * @param out Pointer to row-major (num_elems, num_vecs) output data
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param num_vecs Number of vectors in block
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
+   * @param MAX_DIST Is the distance maximum (equal to number of bits)
+   */
+    {
+
+      size_t row;
+      unsigned int words = num_words(num_bits);
+
+      #pragma omp parallel for
+      for (row = 0; row < num_elems; ++row)
+      {
+        float temp_elem;
+        size_t kk, jj, col, start, stop;
+        float * out_row = &out[row*num_vecs];
+        const float * x_row;
+        for (jj = 0; jj < num_vecs; ++jj)
+        {
+          out_row[jj] = 0;
+        }
+        if (MAX_DIST)
+        {
+          start = 0;
+          stop = num_elems;
+        }
+        else
+        {
+          start = row_ptrs[row];
+          stop = row_ptrs[row+1];
+        }
+        for (kk = start; kk < stop; ++kk)
+        {
+          col = MAX_DIST ? kk : col_inds[kk];
+          temp_elem = (float)(flip_product(row, col, bitstrings, ratios, words) / scaled_norms[col]);
+          x_row = &X[col*num_vecs];
+          #pragma omp simd
+          for (jj = 0; jj < num_vecs; ++jj)
+          {
+            out_row[jj] += temp_elem * x_row[jj];
+          }
+        }
+      }
+    }
+
+
+void rmatmat(const float * __restrict X,
+             float * out,
+             const double * __restrict scaled_norms,
+             const uint64_t * __restrict bitstrings,
+             const double * __restrict ratios,
+             unsigned int num_bits,
+             unsigned int num_elems,
+             unsigned int num_vecs,
+             const size_t * __restrict row_ptrs,
+             const unsigned int * __restrict col_inds,
+             bool MAX_DIST)
+    /**
+   * @brief Action of adjoint of reduced A-matrix on a block of vectors
+   *
+   * @param X Pointer to row-major (num_elems, num_vecs) input data
+   * @param out Pointer to row-major (num_elems, num_vecs) output data
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param num_vecs Number of vectors in block
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
+   * @param MAX_DIST Is the distance maximum (equal to number of bits)
+   */
+    {
+
+      size_t col;
+      unsigned int words = num_words(num_bits);
+
+      #pragma omp parallel for
+      for (col = 0; col < num_elems; ++col)
+      {
+        float temp_elem;
+        double norm = scaled_norms[col];
+        size_t kk, jj, row, start, stop;
+        float * out_row = &out[col*num_vecs];
+        const float * x_row;
+        for (jj = 0; jj < num_vecs; ++jj)
+        {
+          out_row[jj] = 0;
+        }
+        if (MAX_DIST)
+        {
+          start = 0;
+          stop = num_elems;
+        }
+        else
+        {
+          start = row_ptrs[col];
+          stop = row_ptrs[col+1];
+        }
+        for (kk = start; kk < stop; ++kk)
+        {
+          row = MAX_DIST ? kk : col_inds[kk];
+          temp_elem = (float)(flip_product(row, col, bitstrings, ratios, words) / norm);
+          x_row = &X[row*num_vecs];
+          #pragma omp simd
+          for (jj = 0; jj < num_vecs; ++jj)
+          {
+            out_row[jj] += temp_elem * x_row[jj];
+          }
+        }
+      }
+    }
+
+
+void csr_values(float * __restrict values,
+                const double * __restrict scaled_norms,
+                const uint64_t * __restrict bitstrings,
+                const double * __restrict ratios,
+                unsigned int num_bits,
+                unsigned int num_elems,
+                const size_t * __restrict row_ptrs,
+                const unsigned int * __restrict col_inds)
+    /**
+   * @brief Elements of reduced A-matrix at the entries of the neighbor index
+   *
+   * Together with the neighbor index this is the reduced A-matrix in CSR format,
+   * for distances less than the maximum.
+   *
+   * @param values Pointer to where to store one value per neighbor index entry
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param row_ptrs Pointer to CSR row pointers of neighbor index
+   * @param col_inds Pointer to CSR column indices of neighbor index
+   */
+    {
+
+      size_t row;
+      unsigned int words = num_words(num_bits);
+
+      #pragma omp parallel for
+      for (row = 0; row < num_elems; ++row)
+      {
+        size_t kk, col;
+        for (kk = row_ptrs[row]; kk < row_ptrs[row+1]; ++kk)
+        {
+          col = col_inds[kk];
+          values[kk] = (float)(flip_product(row, col, bitstrings, ratios, words) / scaled_norms[col]);
+        }
+      }
+    }
+
+
+void block_diag_values(float * __restrict values,
+                       const double * __restrict scaled_norms,
+                       const uint64_t * __restrict bitstrings,
+                       const double * __restrict ratios,
+                       unsigned int num_bits,
+                       unsigned int num_elems,
+                       unsigned int distance,
+                       unsigned int block_size)
+    /**
+   * @brief Dense diagonal blocks of the reduced A-matrix
+   *
+   * Blocks cover consecutive bit-strings, which share their leading bits
+   * when sorted.  Elements of the last, partial block that fall outside
+   * the matrix are left untouched.
+   *
+   * @param values Pointer to zeroed array of num_blocks*block_size*block_size
+   * @param scaled_norms Pointer to scaled col norm data
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param ratios Pointer to flip ratios from compute_ratios
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param distance Max Hamming distance
+   * @param block_size Number of rows and columns in a block
+   */
+    {
+      size_t row;
+      unsigned int words = num_words(num_bits);
+
+      #pragma omp parallel for
+      for (row = 0; row < num_elems; ++row)
+      {
+        size_t col;
+        size_t start = (row / block_size) * block_size;
+        size_t stop = start + block_size;
+        float * block_row = &values[start * block_size + (row - start) * block_size];
+        if (stop > num_elems)
         {
-          if (MAX_DIST || within_distance(row, col, bitstrings, num_bits, distance))
+          stop = num_elems;
+        }
+        for (col = start; col < stop; ++col)
+        {
+          if (within_distance(row, col, bitstrings, words, distance))
           {
-            temp_elem = compute_element(row, col, bitstrings, cals, num_bits);
-            temp_elem /= col_norms[col];
-            row_sum += temp_elem * x[row];
-            terms += 1;
-            if (terms == num_terms)
-            {
-              break;
-            }
+            block_row[col - start] = (float)(flip_product(row, col, bitstrings, ratios, words) / scaled_norms[col]);
           }
         }
-        out[col] = row_sum;
       }
-    }
\ No newline at end of file
+    }
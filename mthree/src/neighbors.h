@@ -0,0 +1,497 @@
+/*
+This code is part of Mthree.
+
+(C) Copyright IBM 2024.
+
+This code is licensed under the Apache License, Version 2.0. You may
+obtain a copy of this license in the LICENSE.txt file in the root directory
+of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+
+Any modifications or derivative works of this code must retain this
+copyright notice, and modified files need to carry a notice indicating
+that they have been altered from the originals.
+*/
+#include <stddef.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include "distance.h"
+
+#pragma once
+
+/* Ratio of all-pairs scan cost to Hamming-ball probe cost at which
+   the ball enumeration engine is used. */
+#define BALL_COST_FACTOR 4U
+
+size_t neighbor_counts(size_t * row_ptrs,
+                       const uint64_t * __restrict bitstrings,
+                       unsigned int num_bits,
+                       unsigned int num_elems,
+                       unsigned int distance,
+                       int num_terms)
+    /**
+   * @brief Counts the bit-strings within distance of each bit-string and
+   * converts the counts into CSR style row pointers
+   *
+   * @param row_ptrs Pointer to array of length num_elems+1 for row pointers
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param distance Max Hamming distance
+   * @param num_terms Number of terms within hamming distance
+   *
+   * @return Total number of neighbors (non-zero elements)
+   */
+    {
+      size_t row, kk;
+      unsigned int words = num_words(num_bits);
+
+      row_ptrs[0] = 0;
+      #pragma omp parallel for
+      for (row = 0; row < num_elems; ++row)
+      {
+        size_t col;
+        int terms = 0;
+        for (col = 0; col < num_elems; ++col)
+        {
+          if (within_distance(row, col, bitstrings, words, distance))
+          {
+            terms += 1;
+            if (terms == num_terms)
+            {
+              break;
+            }
+          }
+        }
+        row_ptrs[row+1] = (size_t)terms;
+      }
+      /* Cumulative sum turns counts into offsets */
+      for (kk = 0; kk < num_elems; ++kk)
+      {
+        row_ptrs[kk+1] += row_ptrs[kk];
+      }
+      return row_ptrs[num_elems];
+    }
+
+
+void fill_neighbors(unsigned int * col_inds,
+                    const size_t * __restrict row_ptrs,
+                    const uint64_t * __restrict bitstrings,
+                    unsigned int num_bits,
+                    unsigned int num_elems,
+                    unsigned int distance)
+    /**
+   * @brief Fills the CSR style column indices of the bit-strings within
+   * distance of each bit-string
+   *
+   * @param col_inds Pointer to array of length row_ptrs[num_elems] for column indices
+   * @param row_ptrs Pointer to row pointers computed by neighbor_counts
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param distance Max Hamming distance
+   */
+    {
+      size_t row;
+      unsigned int words = num_words(num_bits);
+
+      #pragma omp parallel for
+      for (row = 0; row < num_elems; ++row)
+      {
+        size_t col;
+        size_t pos = row_ptrs[row];
+        size_t stop = row_ptrs[row+1];
+        for (col = 0; col < num_elems; ++col)
+        {
+          if (pos == stop)
+          {
+            break;
+          }
+          if (within_distance(row, col, bitstrings, words, distance))
+          {
+            col_inds[pos] = (unsigned int)col;
+            pos += 1;
+          }
+        }
+      }
+    }
+
+
+size_t sampled_neighbor_counts(const uint64_t * __restrict bitstrings,
+                               unsigned int num_bits,
+                               unsigned int num_elems,
+                               unsigned int distance,
+                               unsigned int num_samples)
+    /**
+   * @brief Counts the bit-strings within distance of evenly spaced sample
+   * rows, to estimate the number of neighbors without building the index
+   *
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param distance Max Hamming distance
+   * @param num_samples Number of sample rows, at most num_elems
+   *
+   * @return Total number of neighbors of the sample rows
+   */
+    {
+      size_t kk;
+      size_t total = 0;
+      unsigned int words = num_words(num_bits);
+
+      #pragma omp parallel for reduction(+:total)
+      for (kk = 0; kk < num_samples; ++kk)
+      {
+        size_t col;
+        unsigned int row = (unsigned int)((kk * num_elems) / num_samples);
+        for (col = 0; col < num_elems; ++col)
+        {
+          if (within_distance(row, col, bitstrings, words, distance))
+          {
+            total += 1;
+          }
+        }
+      }
+      return total;
+    }
+
+
+static inline bool use_hamming_ball(unsigned int num_bits,
+                                    unsigned int distance,
+                                    unsigned int num_elems)
+  /**
+   * @brief Should neighbors be found by enumerating Hamming balls
+   * rather than scanning all pairs of bit-strings
+   *
+   * @param num_bits Number of bits in a single bit-string
+   * @param distance Max Hamming distance
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   *
+   * @return Use Hamming-ball enumeration
+   */
+  {
+    unsigned int ball_terms = hamming_terms(num_bits, distance, num_elems);
+    return (size_t)ball_terms * BALL_COST_FACTOR < (size_t)num_elems;
+  }
+
+
+static inline size_t table_capacity(unsigned int num_elems)
+  /**
+   * @brief Capacity of the open-addressing bit-string table, a power
+   * of two at least twice the number of elements
+   */
+  {
+    size_t capacity = 2;
+    while (capacity < 2 * (size_t)num_elems)
+    {
+      capacity <<= 1;
+    }
+    return capacity;
+  }
+
+
+static inline uint64_t hash_bitstring(const uint64_t * __restrict key,
+                                      unsigned int words)
+  /**
+   * @brief Hash of a packed bit-string (splitmix64 finalizer over words)
+   */
+  {
+    size_t kk;
+    uint64_t hash = 0x9E3779B97F4A7C15ULL;
+    for (kk = 0; kk < words; ++kk)
+    {
+      hash ^= key[kk];
+      hash ^= hash >> 30;
+      hash *= 0xBF58476D1CE4E5B9ULL;
+      hash ^= hash >> 27;
+      hash *= 0x94D049BB133111EBULL;
+      hash ^= hash >> 31;
+    }
+    return hash;
+  }
+
+
+void build_table(unsigned int * table,
+                 size_t capacity,
+                 const uint64_t * __restrict bitstrings,
+                 unsigned int num_bits,
+                 unsigned int num_elems)
+    /**
+   * @brief Inserts all bit-strings into an open-addressing hash table
+   *
+   * Table entries hold the bit-string index plus one, with zero
+   * marking an empty slot.
+   *
+   * @param table Pointer to zeroed table of length capacity
+   * @param capacity Table capacity (power of two)
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   */
+    {
+      size_t idx, slot;
+      size_t mask = capacity - 1;
+      unsigned int words = num_words(num_bits);
+
+      for (idx = 0; idx < num_elems; ++idx)
+      {
+        slot = hash_bitstring(&bitstrings[words*idx], words) & mask;
+        while (table[slot])
+        {
+          slot = (slot + 1) & mask;
+        }
+        table[slot] = (unsigned int)(idx + 1);
+      }
+    }
+
+
+static inline long long table_lookup(const uint64_t * __restrict key,
+                                     const unsigned int * __restrict table,
+                                     size_t capacity,
+                                     const uint64_t * __restrict bitstrings,
+                                     unsigned int words)
+  /**
+   * @brief Index of a packed bit-string in the table, or -1 if absent
+   */
+  {
+    size_t mask = capacity - 1;
+    size_t slot = hash_bitstring(key, words) & mask;
+    unsigned int entry;
+    while ((entry = table[slot]))
+    {
+      if (memcmp(key, &bitstrings[words*(size_t)(entry-1)], words*sizeof(uint64_t)) == 0)
+      {
+        return (long long)(entry - 1);
+      }
+      slot = (slot + 1) & mask;
+    }
+    return -1;
+  }
+
+
+static inline void flip_bit(uint64_t * key, unsigned int bit)
+  {
+    key[bit >> 6] ^= (uint64_t)1 << (bit & 63U);
+  }
+
+
+static inline void sort_indices(unsigned int * inds, size_t length)
+  /**
+   * @brief Insertion sort of a (short) array of indices
+   */
+  {
+    size_t ii, jj;
+    unsigned int temp;
+    for (ii = 1; ii < length; ++ii)
+    {
+      temp = inds[ii];
+      jj = ii;
+      while ((jj > 0) && (inds[jj-1] > temp))
+      {
+        inds[jj] = inds[jj-1];
+        jj -= 1;
+      }
+      inds[jj] = temp;
+    }
+  }
+
+
+static size_t ball_neighbors(size_t row,
+                             uint64_t * key,
+                             unsigned int * pos,
+                             const unsigned int * __restrict table,
+                             size_t capacity,
+                             const uint64_t * __restrict bitstrings,
+                             unsigned int num_bits,
+                             unsigned int distance,
+                             unsigned int * out)
+  /**
+   * @brief Enumerates the Hamming ball around a bit-string and probes the
+   * table for each member
+   *
+   * @param row Index of center bit-string
+   * @param key Scratch space of one packed bit-string
+   * @param pos Scratch space of distance flip positions
+   * @param table Pointer to bit-string table
+   * @param capacity Table capacity
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param distance Max Hamming distance
+   * @param out Pointer to where to store neighbor indices, or NULL to only count
+   *
+   * @return Number of neighbors found
+   */
+  {
+    size_t found = 0;
+    unsigned int dist, kk;
+    int ii;
+    long long idx;
+    unsigned int words = num_words(num_bits);
+
+    memcpy(key, &bitstrings[words*row], words*sizeof(uint64_t));
+    for (dist = 0; (dist <= distance) && (dist <= num_bits); ++dist)
+    {
+      /* First combination of dist flipped positions */
+      for (kk = 0; kk < dist; ++kk)
+      {
+        pos[kk] = kk;
+        flip_bit(key, kk);
+      }
+      while (true)
+      {
+        idx = table_lookup(key, table, capacity, bitstrings, words);
+        if (idx >= 0)
+        {
+          if (out)
+          {
+            out[found] = (unsigned int)idx;
+          }
+          found += 1;
+        }
+        /* Advance to next combination, restoring key when done */
+        ii = (int)dist - 1;
+        while ((ii >= 0) && (pos[ii] == num_bits - dist + (unsigned int)ii))
+        {
+          ii -= 1;
+        }
+        for (kk = (ii < 0) ? 0 : (unsigned int)ii; kk < dist; ++kk)
+        {
+          flip_bit(key, pos[kk]);
+        }
+        if (ii < 0)
+        {
+          break;
+        }
+        pos[ii] += 1;
+        for (kk = (unsigned int)ii + 1; kk < dist; ++kk)
+        {
+          pos[kk] = pos[kk-1] + 1;
+        }
+        for (kk = (unsigned int)ii; kk < dist; ++kk)
+        {
+          flip_bit(key, pos[kk]);
+        }
+      }
+    }
+    return found;
+  }
+
+
+int ball_neighbor_counts(size_t * row_ptrs,
+                         const unsigned int * __restrict table,
+                         size_t capacity,
+                         const uint64_t * __restrict bitstrings,
+                         unsigned int num_bits,
+                         unsigned int num_elems,
+                         unsigned int distance)
+    /**
+   * @brief Same as neighbor_counts but found by Hamming-ball enumeration
+   *
+   * The total number of neighbors is row_ptrs[num_elems].
+   *
+   * @param row_ptrs Pointer to array of length num_elems+1 for row pointers
+   * @param table Pointer to bit-string table from build_table
+   * @param capacity Table capacity
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param distance Max Hamming distance
+   *
+   * @return 0 on success, -1 if scratch space could not be allocated
+   */
+    {
+      size_t kk;
+      int failed = 0;
+      unsigned int words = num_words(num_bits);
+
+      row_ptrs[0] = 0;
+      #pragma omp parallel
+      {
+        size_t row;
+        uint64_t * key = (uint64_t *)malloc(words*sizeof(uint64_t));
+        unsigned int * pos = (unsigned int *)malloc((distance+1)*sizeof(unsigned int));
+        if (key == NULL || pos == NULL)
+        {
+          #pragma omp atomic write
+          failed = 1;
+        }
+        /* Every thread must reach the loop, even if it has no scratch space */
+        #pragma omp for
+        for (row = 0; row < num_elems; ++row)
+        {
+          if (key != NULL && pos != NULL)
+          {
+            row_ptrs[row+1] = ball_neighbors(row, key, pos, table, capacity,
+                                             bitstrings, num_bits, distance, NULL);
+          }
+        }
+        free(key);
+        free(pos);
+      }
+      if (failed)
+      {
+        return -1;
+      }
+      for (kk = 0; kk < num_elems; ++kk)
+      {
+        row_ptrs[kk+1] += row_ptrs[kk];
+      }
+      return 0;
+    }
+
+
+int ball_fill_neighbors(unsigned int * col_inds,
+                        const size_t * __restrict row_ptrs,
+                        const unsigned int * __restrict table,
+                        size_t capacity,
+                        const uint64_t * __restrict bitstrings,
+                        unsigned int num_bits,
+                        unsigned int num_elems,
+                        unsigned int distance)
+    /**
+   * @brief Same as fill_neighbors but found by Hamming-ball enumeration
+   *
+   * Indices are sorted within each row so that sums over the index run in
+   * the same order as for fill_neighbors.
+   *
+   * @param col_inds Pointer to array of length row_ptrs[num_elems] for column indices
+   * @param row_ptrs Pointer to row pointers computed by ball_neighbor_counts
+   * @param table Pointer to bit-string table from build_table
+   * @param capacity Table capacity
+   * @param bitstrings Pointer to array of packed bitstrings
+   * @param num_bits Number of bits in a single bit-string
+   * @param num_elems Number of elements (dimension) of reduced A-matrix
+   * @param distance Max Hamming distance
+   *
+   * @return 0 on success, -1 if scratch space could not be allocated
+   */
+    {
+      int failed = 0;
+      unsigned int words = num_words(num_bits);
+
+      #pragma omp parallel
+      {
+        size_t row;
+        uint64_t * key = (uint64_t *)malloc(words*sizeof(uint64_t));
+        unsigned int * pos = (unsigned int *)malloc((distance+1)*sizeof(unsigned int));
+        if (key == NULL || pos == NULL)
+        {
+          #pragma omp atomic write
+          failed = 1;
+        }
+        #pragma omp for
+        for (row = 0; row < num_elems; ++row)
+        {
+          if (key != NULL && pos != NULL)
+          {
+            ball_neighbors(row, key, pos, table, capacity, bitstrings,
+                           num_bits, distance, &col_inds[row_ptrs[row]]);
+            sort_indices(&col_inds[row_ptrs[row]], row_ptrs[row+1] - row_ptrs[row]);
+          }
+        }
+        free(key);
+        free(pos);
+      }
+      return failed ? -1 : 0;
+    }
@@ -10,16 +10,52 @@ cimport numpy as np
 from libc.stdlib cimport malloc, free
 from libcpp.map cimport map
 from libcpp.string cimport string
+from libcpp cimport bool
+from libc.stdint cimport uint64_t
+from libc.math cimport exp
 
-from mthree.converters cimport counts_to_internal
+from mthree.converters cimport _core_counts_to_packed
 
-cdef extern from "../src/col_renorm.h" nogil:
-    void compute_col_norms(float * col_norms,
-                           const unsigned char * bitstrings,
-                           const float * cals,
+cdef extern from "../src/distance.h" nogil:
+    unsigned int hamming_terms(unsigned int num_bits,
+                               unsigned int distance,
+                               unsigned int num_elems)
+
+cdef extern from "../src/neighbors.h" nogil:
+    size_t neighbor_counts(size_t * row_ptrs,
+                           const uint64_t * bitstrings,
                            unsigned int num_bits,
                            unsigned int num_elems,
-                           unsigned int distance)
+                           unsigned int distance,
+                           int num_terms)
+
+    void fill_neighbors(unsigned int * col_inds,
+                        const size_t * row_ptrs,
+                        const uint64_t * bitstrings,
+                        unsigned int num_bits,
+                        unsigned int num_elems,
+                        unsigned int distance)
+
+cdef extern from "../src/elements.h" nogil:
+    void compute_ratios(double * ratios,
+                        const float * cals,
+                        unsigned int num_bits)
+
+    int compute_diag_logs(double * diag_logs,
+                          const uint64_t * bitstrings,
+                          const float * cals,
+                          unsigned int num_bits,
+                          unsigned int num_elems)
+
+cdef extern from "../src/col_renorm.h" nogil:
+    void compute_scaled_norms(double * scaled_norms,
+                              const uint64_t * bitstrings,
+                              const double * ratios,
+                              unsigned int num_bits,
+                              unsigned int num_elems,
+                              const size_t * row_ptrs,
+                              const unsigned int * col_inds,
+                              bool MAX_DIST)
 
 
 def _test_vector_column_norm(object counts,
@@ -36,18 +72,40 @@ def _test_vector_column_norm(object counts,
     cdef float shots = sum(counts.values())
     cdef map[string, float] counts_map = counts
     cdef unsigned int num_elems = counts_map.size()
+    cdef size_t kk
 
     # Assign memeory for bitstrings and input probabilities
-    cdef unsigned char * bitstrings = <unsigned char *>malloc(num_bits*num_elems*sizeof(unsigned char))
+    cdef unsigned int num_words = (num_bits + 63) // 64
+    cdef uint64_t * bitstrings = <uint64_t *>malloc(num_words*num_elems*sizeof(uint64_t))
     cdef float * input_probs = <float *>malloc(num_elems*sizeof(float))
     # Assign memeory for column norms
-    cdef float[::1] col_norms = np.zeros(num_elems, dtype=np.float32)
+    cdef double[::1] col_norms = np.zeros(num_elems, dtype=np.float64)
 
     # Convert sorted counts dict into bistrings and input probability arrays
-    counts_to_internal(&counts_map, bitstrings, input_probs, num_bits, shots)
+    _core_counts_to_packed(&counts_map, num_bits, shots, bitstrings, input_probs)
+    # Build neighbor index
+    cdef bool MAX_DIST = distance == num_bits
+    cdef int num_terms = <int>hamming_terms(num_bits, distance, num_elems)
+    cdef size_t num_nbrs = 0
+    cdef size_t[::1] row_ptrs = np.zeros(num_elems+1, dtype=np.uintp)
+    if not MAX_DIST:
+        num_nbrs = neighbor_counts(&row_ptrs[0], bitstrings, num_bits,
+                                   num_elems, distance, num_terms)
+    cdef unsigned int[::1] col_inds = np.empty(max(num_nbrs, 1), dtype=np.uint32)
+    if not MAX_DIST:
+        fill_neighbors(&col_inds[0], &row_ptrs[0], bitstrings, num_bits,
+                       num_elems, distance)
     # Compute column norms
-    compute_col_norms(&col_norms[0], bitstrings, &cals[0], num_bits, num_elems, distance)
+    cdef double[::1] ratios = np.empty(2*num_bits, dtype=np.float64)
+    cdef double[::1] diag_logs = np.empty(num_elems, dtype=np.float64)
+    compute_ratios(&ratios[0], &cals[0], num_bits)
+    if compute_diag_logs(&diag_logs[0], bitstrings, &cals[0], num_bits, num_elems):
+        raise MemoryError("Could not allocate diagonal scratch space.")
+    compute_scaled_norms(&col_norms[0], bitstrings, &ratios[0], num_bits, num_elems,
+                         &row_ptrs[0], &col_inds[0], MAX_DIST)
+    for kk in range(num_elems):
+        col_norms[kk] *= exp(diag_logs[kk])
     
     free(bitstrings)
     free(input_probs)
-    return np.asarray(col_norms)
\ No newline at end of file
+    return np.asarray(col_norms, dtype=np.float32)
\ No newline at end of file
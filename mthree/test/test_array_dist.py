@@ -0,0 +1,116 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module
+
+"""Test array-backed distributions"""
+
+import pickle
+
+import numpy as np
+import pytest
+from qiskit.result import marginal_distribution
+import mthree
+from mthree.classes import (
+    QuasiDistribution,
+    ArrayQuasiDistribution,
+    ArrayProbDistribution,
+    QuasiCollection,
+)
+from mthree.converters import bitstrings_to_bytes
+from mthree.exceptions import M3Error
+
+
+def _random_quasi(num_bits, num_elems=60, seed=1234):
+    rng = np.random.default_rng(seed)
+    keys = sorted({"".join(rng.choice(["0", "1"], num_bits)) for _ in range(num_elems)})
+    vals = rng.normal(1, 1, len(keys))
+    vals /= vals.sum()
+    quasi = QuasiDistribution(
+        dict(zip(keys, vals)), shots=1000, mitigation_overhead=2.5
+    )
+    arr = ArrayQuasiDistribution(
+        bitstrings_to_bytes(keys, num_bits), vals, num_bits, 1000, 2.5
+    )
+    return quasi, arr
+
+
+@pytest.mark.parametrize("num_bits", [5, 12, 70])
+def test_array_quasi_matches_dict(num_bits):
+    """Test array-backed quasi-distribution matches the dict version"""
+    quasi, arr = _random_quasi(num_bits)
+    assert len(arr) == len(quasi)
+    assert dict(arr.items()).keys() == quasi.keys()
+    key = next(iter(quasi))
+    assert abs(arr[key] - quasi[key]) < 1e-6
+    assert key in arr
+    ops = ["", "Z" * num_bits, "I" * (num_bits - 1) + "Z", "0" + "Z" * (num_bits - 1)]
+    ops.append("1" * num_bits)
+    for op in ops:
+        assert abs(arr.expval(op) - quasi.expval(op)) < 1e-5
+    assert np.allclose(arr.expval(ops), quasi.expval(ops), atol=1e-5)
+    assert arr.stddev() == quasi.stddev()
+
+    probs, dist = arr.nearest_probability_distribution(return_distance=True)
+    ref_probs, ref_dist = quasi.nearest_probability_distribution(return_distance=True)
+    assert isinstance(probs, ArrayProbDistribution)
+    assert abs(dist - ref_dist) < 1e-5
+    assert probs.keys() == ref_probs.keys()
+    for key, val in ref_probs.items():
+        assert abs(probs[key] - val) < 1e-6
+
+    indices = [0, num_bits - 1, 2]
+    marg = arr.marginal(indices)
+    ref = marginal_distribution(quasi, indices)
+    assert marg.num_bits == 3
+    for key, val in ref.items():
+        assert abs(marg[key] - val) < 1e-6
+    op = "Z" + "I" * (num_bits - 3) + "ZZ"
+    assert abs(arr.marginal(op).expval() - quasi.expval(op)) < 1e-5
+
+    with pytest.raises(M3Error):
+        arr.expval("Z")
+    with pytest.raises(M3Error):
+        arr.marginal([num_bits])
+
+    # Slots keep the arrays and can be pickled for process pools
+    arr2 = pickle.loads(pickle.dumps(arr))
+    assert np.array_equal(arr2.vec, arr.vec)
+    assert arr2.shots == 1000
+
+
+def test_array_output():
+    """Test apply_correction array output matches dict output"""
+    num_bits = 6
+    mit = mthree.M3Mitigation(None)
+    rng = np.random.default_rng(42)
+    cals = []
+    for _ in range(num_bits):
+        p0, p1 = rng.uniform(0.9, 0.99, 2)
+        cals.append(np.array([[p0, 1 - p1], [1 - p0, p1]], dtype=np.float32))
+    mit.single_qubit_cals = cals
+    counts = {}
+    for _ in range(200):
+        key = "".join(rng.choice(["0", "1"], num_bits))
+        counts[key] = counts.get(key, 0) + int(rng.integers(1, 10))
+    qubits = list(range(num_bits))
+    for method in ["direct", "iterative"]:
+        quasi = mit.apply_correction(counts, qubits, method=method)
+        arr = mit.apply_correction(counts, qubits, method=method, array_output=True)
+        assert isinstance(arr, ArrayQuasiDistribution)
+        assert arr.shots == quasi.shots
+        for key, val in quasi.items():
+            assert abs(arr[key] - val) < 1e-4
+        out = mit.apply_correction(
+            [counts, counts], qubits, method=method, array_output=True
+        )
+        assert isinstance(out, QuasiCollection)
+        assert np.allclose(out.expval(), quasi.expval(), atol=1e-4)
@@ -0,0 +1,85 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module
+
+"""Test array and BitArray inputs"""
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.primitives import BitArray
+from qiskit_ibm_runtime.fake_provider import FakeAthensV2 as FakeAthens
+import mthree
+from mthree.converters import bytes_to_packed, counts_to_packed_and_probs
+from mthree.exceptions import M3Error
+from mthree.utils import counts_to_arrays, bytes_to_bitstrings
+
+
+def test_bytes_to_packed():
+    """Test byte rows pack the same as string keys"""
+    rng = np.random.default_rng(1234)
+    for num_bits in [5, 64, 70, 130]:
+        keys = {"".join(rng.choice(["0", "1"], num_bits)) for _ in range(50)}
+        counts = {key: int(rng.integers(1, 20)) for key in keys}
+        bit_array = BitArray.from_counts(counts, num_bits=num_bits)
+        rows, cnts, nbits = counts_to_arrays(bit_array)
+        assert nbits == num_bits
+        assert bytes_to_bitstrings(rows, num_bits) == sorted(counts)
+        assert np.allclose(cnts, [counts[key] for key in sorted(counts)])
+        packed, _ = counts_to_packed_and_probs(counts)
+        assert np.array_equal(bytes_to_packed(rows, num_bits), packed.ravel())
+
+
+def test_counts_to_arrays_tuple():
+    """Test tuple inputs are made unique and sorted"""
+    rows = np.array([[3], [1], [3], [0]], dtype=np.uint8)
+    rows, cnts, _ = counts_to_arrays((rows, [1, 2, 3, 4]), 2)
+    assert bytes_to_bitstrings(rows, 2) == ["00", "01", "11"]
+    assert np.allclose(cnts, [4, 2, 4])
+    with pytest.raises(M3Error):
+        counts_to_arrays((rows, [1, 2, 3]), 12)
+
+
+@pytest.mark.parametrize("method", ["direct", "iterative"])
+def test_array_inputs(method):
+    """Test BitArray and tuple inputs match dict inputs"""
+    backend = FakeAthens()
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(2, 3)
+    qc.cx(1, 0)
+    qc.cx(3, 4)
+    qc.measure_all()
+
+    counts = backend.run(qc, shots=4096).result().get_counts()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system()
+
+    expected = mit.apply_correction(counts, range(5), method=method, tol=1e-6)
+    bit_array = BitArray.from_counts(counts, num_bits=5)
+    rows, cnts, _ = counts_to_arrays(bit_array)
+    for inp in [bit_array, (rows, cnts)]:
+        quasi = mit.apply_correction(inp, range(5), method=method, tol=1e-6)
+        assert quasi.shots == 4096
+        assert quasi.keys() == expected.keys()
+        for key, val in expected.items():
+            assert abs(val - quasi[key]) < 1e-5
+
+    # A BitArray with a shape is a list of counts
+    stacked = BitArray(np.stack([bit_array.array] * 3), num_bits=5)
+    quasis = mit.apply_correction(stacked, range(5), method=method, tol=1e-6)
+    assert len(quasis) == 3
+    for quasi in quasis:
+        assert quasi.keys() == expected.keys()
+
+    with pytest.raises(M3Error):
+        mit.apply_correction(bit_array, range(4), method=method)
@@ -11,7 +11,11 @@
 # that they have been altered from the originals.
 
 """Test balanced cals"""
+
+import numpy as np
+from qiskit.primitives import BitArray
 from mthree.circuits import balanced_cal_strings
+from mthree.mitigation import _bit_counts
 
 
 def test_balanced_strings():
@@ -26,3 +30,15 @@ def test_balanced_strings():
             for jj in range(num_qubits):
                 _sum += int(str1[jj]) + int(str2[jj])
             assert _sum == num_qubits
+
+
+def test_bit_counts():
+    """Validate per-bit counts from BitArray match counts dict"""
+    rng = np.random.default_rng(1234)
+    for num_bits in [1, 7, 8, 13, 70]:
+        keys = ["".join(rng.choice(["0", "1"], num_bits)) for _ in range(40)]
+        counts = {key: int(rng.integers(1, 10)) for key in keys}
+        ones, shots = _bit_counts(BitArray.from_counts(counts, num_bits=num_bits))
+        assert shots == sum(counts.values())
+        for kk in range(num_bits):
+            assert ones[kk] == sum(val for key, val in counts.items() if key[kk] == "1")
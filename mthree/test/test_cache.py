@@ -0,0 +1,146 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module
+
+"""Test solver cache"""
+
+import pickle
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit_ibm_runtime.fake_provider import FakeAthensV2 as FakeAthens
+import mthree
+from mthree.cache import SolverCache
+from mthree.calarray import CalibrationArray
+from mthree.exceptions import M3Error
+
+
+def _ghz_counts(shots):
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(1, 0)
+    qc.cx(2, 3)
+    qc.cx(3, 4)
+    qc.measure_all()
+    backend = FakeAthens()
+    return backend, backend.run(qc, shots=shots).result().get_counts()
+
+
+@pytest.mark.parametrize("method", ["direct", "iterative"])
+def test_cached_solve(method):
+    """Test cached solvers give the same answer as fresh ones"""
+    backend, counts = _ghz_counts(4096)
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system()
+    cached = mthree.M3Mitigation(backend, solver_cache_size=2**24)
+    cached.single_qubit_cals = mit.single_qubit_cals
+
+    # Same bit-strings, different counts
+    counts2 = {key: val + 7 for key, val in counts.items()}
+    for cnts in [counts, counts2]:
+        expected = mit.apply_correction(
+            cnts, range(5), method=method, tol=1e-6, return_mitigation_overhead=True
+        )
+        quasi = cached.apply_correction(
+            cnts, range(5), method=method, tol=1e-6, return_mitigation_overhead=True
+        )
+        assert quasi.keys() == expected.keys()
+        for key, val in expected.items():
+            assert abs(val - quasi[key]) < 1e-5
+        assert abs(quasi.mitigation_overhead - expected.mitigation_overhead) < 1e-3
+    assert cached.solver_cache.hits == 1
+    assert cached.solver_cache.misses == 1
+    assert len(cached.solver_cache) == 1
+
+
+def test_cache_eviction():
+    """Test the cache stays within its memory bound"""
+    cache = SolverCache(100)
+    cache.put("a", {}, 60)
+    cache.put("b", {}, 30)
+    assert cache.get("a") is not None
+    cache.put("c", {}, 40)
+    # 'b' was least recently used
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.nbytes == 100
+    cache.put("d", {}, 200)
+    assert "d" not in cache
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+    with pytest.raises(M3Error):
+        SolverCache(0)
+
+
+def test_cache_key():
+    """Test cache keys depend on bit-strings and cals version but not counts"""
+    key1 = SolverCache.key("direct", [0, 1], 2, {"00": 1, "11": 5}, 1)
+    key2 = SolverCache.key("direct", (0, 1), 2, {"11": 3, "00": 2}, 1)
+    key3 = SolverCache.key("direct", [0, 1], 2, {"00": 1, "01": 5}, 1)
+    assert key1 == key2
+    assert key1 != key3
+    assert key1 != SolverCache.key("direct", [0, 1], 2, {"00": 1, "11": 5}, 2)
+
+
+def test_form_cals_versioned():
+    """Test formed cals are memoized until the cals change"""
+    mit = mthree.M3Mitigation()
+    mats = [np.array([[0.9, 0.2], [0.1, 0.8]], dtype=np.float32) for _ in range(3)]
+    mit.cals_from_matrices(mats)
+    version = mit.cals_version
+    cals = mit._form_cals([0, 2])
+    assert not cals.flags.writeable
+    assert mit._form_cals((0, 2)) is cals
+    assert np.allclose(cals, np.tile(mats[0].ravel(), 2))
+
+    new_mats = [np.array([[0.95, 0.1], [0.05, 0.9]], dtype=np.float32)] * 3
+    mit.cals_from_matrices(new_mats)
+    assert mit.cals_version > version
+    new_cals = mit._form_cals([0, 2])
+    assert new_cals is not cals
+    assert np.allclose(new_cals, np.tile(new_mats[0].ravel(), 2))
+
+    # In place updates also bump the version
+    version = mit.cals_version
+    mit.single_qubit_cals[2] = mats[2]
+    assert mit.cals_version == version + 1
+    assert np.allclose(mit._form_cals([0, 2])[:4], mats[2].ravel())
+
+
+def test_in_place_cals_update():
+    """Test in place changes to the cals are seen by cached corrections"""
+    counts = {"00": 600, "01": 100, "10": 100, "11": 200}
+    good = np.array([[0.95, 0.1], [0.05, 0.9]], dtype=np.float32)
+    bad = np.array([[0.8, 0.3], [0.2, 0.7]], dtype=np.float32)
+    for as_array in [False, True]:
+        mit = mthree.M3Mitigation(solver_cache_size=2**20)
+        mit.cals_from_matrices([good, good])
+        if as_array:
+            mit.single_qubit_cals = CalibrationArray.from_list([good, good])
+        before = mit.apply_correction(counts, [0, 1], method="direct")
+
+        mit.single_qubit_cals[1] = bad
+        after = mit.apply_correction(counts, [0, 1], method="direct")
+
+        fresh = mthree.M3Mitigation()
+        fresh.cals_from_matrices([good, bad])
+        expected = fresh.apply_correction(counts, [0, 1], method="direct")
+        assert abs(after["11"] - before["11"]) > 1e-3
+        for key, val in expected.items():
+            assert abs(after[key] - val) < 1e-6
+
+    # The tracking list pickles as a plain list
+    mit = mthree.M3Mitigation()
+    mit.cals_from_matrices([good, good])
+    assert type(pickle.loads(pickle.dumps(mit.single_qubit_cals))) is list
@@ -0,0 +1,92 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Test calibration store"""
+
+import datetime
+
+import numpy as np
+import pytest
+import mthree
+from mthree.calstore import CalibrationStore
+from mthree.exceptions import M3Error
+
+
+def _random_cals(num_qubits, rng):
+    cals = []
+    for _ in range(num_qubits):
+        p0, p1 = rng.uniform(0.9, 0.99, 2)
+        cals.append(np.array([[p0, 1 - p1], [1 - p0, p1]], dtype=np.float32))
+    return cals
+
+
+def test_store_snapshots(tmp_path):
+    """Test nearest and range lookups of snapshots"""
+    rng = np.random.default_rng(1234)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    snapshots = [_random_cals(5, rng) for _ in range(4)]
+    snapshots[2][3] = None
+    path = str(tmp_path / "cals.db")
+    with CalibrationStore(path) as store:
+        for idx, cals in enumerate(snapshots):
+            store.add(cals, "fake_a", start + datetime.timedelta(hours=idx), 1000)
+        store.add(_random_cals(3, rng), "fake_b", start)
+        assert len(store) == 5
+        assert store.backends() == ["fake_a", "fake_b"]
+
+    # Reopen from disk
+    store = CalibrationStore(path)
+    assert len(store.timestamps("fake_a")) == 4
+    # Times in other zones are converted to UTC
+    before = datetime.datetime(
+        2024, 1, 1, 3, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=1))
+    )
+    cals, meta = store.nearest("fake_a", before)
+    assert meta["timestamp"] == (start + datetime.timedelta(hours=2)).isoformat()
+    assert meta["shots"] == 1000
+    assert cals[3] is None
+    assert np.array_equal(cals[0], snapshots[2][0])
+    cals, meta = store.nearest("fake_a")
+    assert np.array_equal(cals[0], snapshots[3][0])
+    with pytest.raises(M3Error):
+        store.nearest("fake_a", "2023-12-31T00:00:00")
+    with pytest.raises(M3Error):
+        store.nearest("fake_c")
+
+    times, data, valid = store.load_range(
+        "fake_a", "2024-01-01T01:00:00", "2024-01-01T02:00:00"
+    )
+    assert len(times) == 2
+    assert data.shape == (2, 5, 2, 2)
+    assert np.array_equal(data[0, 1], snapshots[1][1])
+    assert not valid[1, 3] and valid[0].all()
+    store.close()
+
+
+def test_mitigator_store():
+    """Test mitigator reads and writes snapshots"""
+    rng = np.random.default_rng(42)
+    store = CalibrationStore()
+    mit = mthree.M3Mitigation()
+    mit.single_qubit_cals = _random_cals(4, rng)
+    mit.cal_timestamp = "2024-02-01T12:00:00+00:00"
+    with pytest.raises(M3Error):
+        mit.cals_to_store(store)
+    mit.cals_to_store(store, backend="fake_a")
+
+    mit2 = mthree.M3Mitigation()
+    mit2.cals_from_store(store, before="2024-02-02T00:00:00", backend="fake_a")
+    assert mit2.cal_timestamp == mit.cal_timestamp
+    counts = {"0000": 400, "0110": 20, "1111": 500, "1000": 30}
+    quasi = mit.apply_correction(counts, range(4))
+    quasi2 = mit2.apply_correction(counts, range(4))
+    for key, val in quasi.items():
+        assert abs(quasi2[key] - val) < 1e-6
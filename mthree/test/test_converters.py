@@ -12,7 +12,10 @@
 # pylint: disable=no-name-in-module
 
 """Test the converters"""
+
+import numpy as np
 from mthree.matrix import bitstring_int
+from mthree.converters import counts_to_packed_and_probs
 from .converters_testing import _test_counts_roundtrip, _test_counts_to_array
 
 COUNTS = {
@@ -64,3 +67,28 @@ def test_roundtrip_convert():
     out = _test_counts_roundtrip(COUNTS)
     for key, val in COUNTS.items():
         assert abs(val / shots - out[key]) <= 1e-7
+
+
+def test_packed_convert():
+    """Tests counts are packed into 64-bit words properly"""
+    shots = sum(COUNTS.values())
+    sorted_counts = dict(
+        sorted(COUNTS.items(), key=lambda item: bitstring_int(item[0]))
+    )
+    packed, probs = counts_to_packed_and_probs(COUNTS)
+    assert packed.shape == (len(COUNTS), 1)
+    for idx, (key, val) in enumerate(sorted_counts.items()):
+        # Leftmost character of the string is bit zero
+        assert int(packed[idx, 0]) == int(key[::-1], 2)
+        assert abs(val / shots - probs[idx]) <= 1e-7
+
+
+def test_packed_convert_multiword():
+    """Tests bitstrings longer than 64 bits span multiple words"""
+    key = "1" + "0" * 63 + "01" + "0" * 64
+    packed, _ = counts_to_packed_and_probs({key: 1, "0" * 130: 1})
+    assert packed.shape == (2, 3)
+    assert np.array_equal(packed[0], np.zeros(3, dtype=np.uint64))
+    assert packed[1, 0] == 1
+    assert packed[1, 1] == 2
+    assert packed[1, 2] == 0
@@ -12,8 +12,11 @@
 # pylint: disable=no-name-in-module
 
 """Test list inputs"""
+
 import numpy as np
-from mthree.expval import exp_val
+import pytest
+from mthree.expval import exp_val, exp_vals
+from mthree.exceptions import M3Error
 
 
 def test_basic_expvals():
@@ -38,6 +41,24 @@ def test_asym_operators():
     assert np.allclose(exp_val(PROBS, "1011"), 0.0211)
 
 
+def test_batched_expvals():
+    """Test batched exp values match single operator ones"""
+    ops = ["", "ZZZZ", "IZIZ", "0III", "III0", "1011", "Z1I0", "IIII"]
+    out = exp_vals(PROBS, ops)
+    assert np.allclose(out, [exp_val(PROBS, op) for op in ops], atol=1e-6)
+    # More than 64 bits spans several words
+    rng = np.random.default_rng(1234)
+    dist = {"".join(rng.choice(["0", "1"], 100)): rng.normal() for _ in range(200)}
+    ops = ["".join(rng.choice(["Z", "I", "0", "1"], 100)) for _ in range(20)]
+    ops += ["Z" * 100]
+    out = exp_vals(dist, ops)
+    assert np.allclose(out, [exp_val(dist, op) for op in ops], atol=1e-5)
+    with pytest.raises(M3Error):
+        exp_vals(PROBS, ["ZZ"])
+    with pytest.raises(M3Error):
+        exp_vals(PROBS, ["XZZZ"])
+
+
 PROBS = {
     "1000": 0.0022,
     "1001": 0.0045,
@@ -12,11 +12,14 @@
 # pylint: disable=no-name-in-module
 
 """Test cals file IO"""
+
 import os
+import pickle
 import numpy as np
 from qiskit import QuantumCircuit
 from qiskit_ibm_runtime.fake_provider import FakeAthensV2 as FakeAthens
 import mthree
+from mthree.calarray import CalibrationArray
 
 
 def test_load_cals_from_file():
@@ -95,3 +98,57 @@ def test_load_old_cals():
     mit.cals_from_file(_dir + "/data/8Qcal_Hanoi.json")
 
     assert len(mit.single_qubit_cals) == 27
+
+
+def test_binary_cals_file(tmp_path):
+    """Check cals round trip through a memory-mapped binary file"""
+    rng = np.random.default_rng(1234)
+    cals = []
+    for kk in range(20):
+        p0, p1 = rng.uniform(0.9, 0.99, 2)
+        cal = np.array([[p0, 1 - p1], [1 - p0, p1]], dtype=np.float32)
+        cals.append(None if kk in [3, 11] else cal)
+    # A faulty qubit
+    cals[5] = np.array([[0.4, 0.6], [0.6, 0.4]], dtype=np.float32)
+    mit = mthree.M3Mitigation()
+    mit.single_qubit_cals = cals
+    mit.cal_timestamp = "2024-01-01T00:00:00+00:00"
+    mit.cal_shots = 10000
+    mit.cals_to_file(str(tmp_path / "cals.m3"), binary=True)
+
+    mit2 = mthree.M3Mitigation()
+    mit2.cals_from_file(str(tmp_path / "cals.m3"))
+    assert isinstance(mit2.single_qubit_cals, CalibrationArray)
+    assert len(mit2.single_qubit_cals) == 20
+    assert mit2.cal_timestamp == mit.cal_timestamp
+    assert mit2.cal_shots == 10000
+    assert mit2.faulty_qubits == [5]
+    for cal, cal2 in zip(cals, mit2.single_qubit_cals):
+        if cal is None:
+            assert cal2 is None
+        else:
+            assert np.array_equal(cal, cal2)
+
+    counts = {"0000": 400, "0110": 20, "1111": 500, "1000": 30}
+    qubits = [0, 2, 4, 6]
+    quasi = mit.apply_correction(counts, qubits)
+    quasi2 = mit2.apply_correction(counts, qubits)
+    for key, val in quasi.items():
+        assert abs(quasi2[key] - val) < 1e-6
+
+    # Mapped cals are sent to other processes by file name
+    cals2 = pickle.loads(pickle.dumps(mit2.single_qubit_cals))
+    assert cals2.filename == mit2.single_qubit_cals.filename
+    assert np.array_equal(cals2.data, mit2.single_qubit_cals.data)
+
+    # Changes are not written back to the file
+    mit2.single_qubit_cals[3] = cals[0]
+    assert mit2.single_qubit_cals.filename is None
+    mit3 = mthree.M3Mitigation()
+    mit3.cals_from_file(str(tmp_path / "cals.m3"))
+    assert mit3.single_qubit_cals[3] is None
+
+    # JSON files can be written from mapped cals
+    mit2.cals_to_file(str(tmp_path / "cals.json"))
+    mit3.cals_from_file(str(tmp_path / "cals.json"))
+    assert np.array_equal(mit3.single_qubit_cals[3], cals[0])
@@ -0,0 +1,46 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Test that offline mitigation does not import the runtime"""
+
+import subprocess
+import sys
+
+SCRIPT = """
+import os
+import sys
+import tempfile
+import numpy as np
+import mthree
+
+cals = [np.array([[0.95, 0.03], [0.05, 0.97]], dtype=np.float32)] * 10
+mit = mthree.M3Mitigation()
+mit.single_qubit_cals = cals
+with tempfile.TemporaryDirectory() as tmp:
+    cals_file = os.path.join(tmp, "cals.json")
+    mit.cals_to_file(cals_file)
+    mit = mthree.M3Mitigation()
+    mit.cals_from_file(cals_file)
+# More bit-strings than are solved without planning
+counts = {format(kk, "010b"): kk % 7 + 1 for kk in range(0, 900, 3)}
+quasi, details = mit.apply_correction(counts, range(10), details=True)
+assert details["plan"]["estimates"] is not None
+assert abs(sum(quasi.values()) - 1) < 1e-5
+print(",".join(mod for mod in ["qiskit_ibm_runtime", "psutil"] if mod in sys.modules))
+"""
+
+
+def test_offline_imports():
+    """Test offline cals and planned corrections load neither the runtime nor psutil"""
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == ""
@@ -11,12 +11,16 @@
 # that they have been altered from the originals.
 # pylint: disable=no-name-in-module
 """Test matrix elements"""
+
 import numpy as np
 import scipy.sparse.linalg as spla
 from qiskit import QuantumCircuit
 from qiskit_ibm_runtime.fake_provider import FakeAthensV2 as FakeAthens
 import mthree
-from mthree.matvec import M3MatVec
+from mthree.matvec import M3MatVec, neighbor_index, mean_neighbors
+from mthree.converters import counts_to_packed_and_probs
+from mthree.norms import _block_gmres
+from mthree.precond import build_preconditioner
 
 
 def test_matvec():
@@ -61,3 +65,245 @@ def test_matvec():
     v4 = (A.T).dot(vec)
 
     assert np.allclose(v3, v4, atol=1e-6)
+
+
+def test_matvec_neighbor_index():
+    """Check neighbor index and matvec at distances below max"""
+    backend = FakeAthens()
+
+    qc = QuantumCircuit(5)
+    qc.h(range(5))
+    qc.measure_all()
+
+    raw_counts = backend.run(qc, shots=4096).result().get_counts()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(range(5))
+
+    cals = mit._form_cals(range(5))
+    for distance in [0, 1, 2, 3]:
+        M = M3MatVec(dict(raw_counts), cals, distance)
+        A = mit.reduced_cal_matrix(raw_counts, range(5), distance)[0]
+
+        # Index should match the non-zero pattern of A
+        row_ptrs, col_inds = M.get_neighbor_index()
+        assert row_ptrs.shape[0] == M.num_elems + 1
+        for row in range(M.num_elems):
+            cols = col_inds[row_ptrs[row] : row_ptrs[row + 1]]
+            assert set(cols) == set(np.flatnonzero(A[row]))
+
+        vec = (
+            (-1) ** np.arange(M.num_elems, dtype=np.float32)
+            * np.ones(M.num_elems, dtype=np.float32)
+            / M.num_elems
+        )
+        assert np.allclose(M.matvec(vec), A.dot(vec), atol=1e-6)
+        assert np.allclose(M.rmatvec(vec), (A.T).dot(vec), atol=1e-6)
+
+
+def test_neighbor_index_methods():
+    """Check Hamming-ball and all-pairs neighbor indices agree"""
+    rng = np.random.default_rng(1234)
+    for num_bits, distance in [(20, 1), (20, 2), (70, 1), (130, 2)]:
+        # Cluster bit-strings around a few centers so there are neighbors
+        centers = rng.integers(0, 2, size=(4, num_bits))
+        counts = {}
+        for _ in range(400):
+            bits = centers[rng.integers(4)].copy()
+            flips = rng.integers(num_bits, size=rng.integers(4))
+            bits[flips] ^= 1
+            counts["".join(str(b) for b in bits)] = 1
+        packed, _ = counts_to_packed_and_probs(counts)
+        num_elems = packed.shape[0]
+
+        scan = neighbor_index(packed.ravel(), num_bits, num_elems, distance, "scan")
+        ball = neighbor_index(packed.ravel(), num_bits, num_elems, distance, "ball")
+        assert np.array_equal(scan[0], ball[0])
+        keys = list(dict(sorted(counts.items())).keys())
+        for row in range(num_elems):
+            scan_cols = set(scan[1][scan[0][row] : scan[0][row + 1]])
+            ball_cols = set(ball[1][ball[0][row] : ball[0][row + 1]])
+            assert scan_cols == ball_cols
+            for col in scan_cols:
+                dist = sum(a != b for a, b in zip(keys[row], keys[col]))
+                assert dist <= distance
+
+    # Small Hamming balls are found by enumeration
+    _, _, method = neighbor_index(packed.ravel(), 130, num_elems, 0)
+    assert method == "ball"
+
+
+def test_matvec_many_bits():
+    """Check elements stay finite when diagonal products underflow"""
+    num_bits = 400
+    rng = np.random.default_rng(42)
+    base = rng.integers(0, 2, size=num_bits)
+    keys = []
+    for flips in [[], [3], [3, 250], [17]]:
+        bits = base.copy()
+        bits[flips] ^= 1
+        keys.append("".join(str(b) for b in bits))
+    counts = {key: 10 + idx for idx, key in enumerate(keys)}
+    cals = np.tile(np.array([0.8, 0.3, 0.2, 0.7], dtype=np.float32), num_bits)
+
+    M = M3MatVec(counts, cals, 2)
+    sorted_keys = list(M.sorted_counts)
+
+    # Exact normalized matrix computed in log space
+    log_A = np.full((len(keys), len(keys)), -np.inf)
+    for row, rkey in enumerate(sorted_keys):
+        for col, ckey in enumerate(sorted_keys):
+            if sum(a != b for a, b in zip(rkey, ckey)) <= 2:
+                offsets = 4 * np.arange(num_bits)
+                offsets += 2 * np.array([int(b) for b in rkey])
+                offsets += np.array([int(b) for b in ckey])
+                log_A[row, col] = np.sum(np.log(cals[offsets].astype(float)))
+    A = np.exp(log_A - np.log(np.sum(np.exp(log_A - log_A.max(0)), 0)) - log_A.max(0))
+
+    vec = np.arange(1, len(keys) + 1, dtype=np.float32)
+    assert np.allclose(M.matvec(vec), A.dot(vec), rtol=1e-5)
+    assert np.allclose(M.rmatvec(vec), A.T.dot(vec), rtol=1e-5)
+    assert np.allclose(M.get_diagonal(), np.diag(A), rtol=1e-5)
+
+
+def test_matvec_failed_qubits():
+    """Check elements stay finite when flip ratios are huge"""
+    num_bits = 6
+    # Qubits that never read out 0, so flips away from 0 have ratios near 1e12
+    cals = np.tile(np.array([0.0, 0.1, 1.0, 0.9], dtype=np.float32), num_bits)
+    keys = ["000000", "000011", "001111", "111111"]
+    counts = {key: 10 + idx for idx, key in enumerate(keys)}
+    clamped = np.maximum(cals.astype(float), 1e-12)
+
+    vec = np.arange(1, len(keys) + 1, dtype=np.float32)
+    for distance in [4, num_bits]:
+        A = np.zeros((len(keys), len(keys)))
+        for row, rkey in enumerate(keys):
+            for col, ckey in enumerate(keys):
+                if sum(a != b for a, b in zip(rkey, ckey)) <= distance:
+                    offsets = 4 * np.arange(num_bits)
+                    offsets += 2 * np.array([int(b) for b in rkey])
+                    offsets += np.array([int(b) for b in ckey])
+                    A[row, col] = np.prod(clamped[offsets])
+        A /= A.sum(0)
+
+        M = M3MatVec(counts, cals, distance)
+        assert list(M.sorted_counts) == keys
+        assert np.allclose(M.matvec(vec), A.dot(vec), rtol=1e-5)
+        assert np.allclose(M.rmatvec(vec), A.T.dot(vec), rtol=1e-5)
+        assert np.allclose(M.matmat(vec[:, None])[:, 0], A.dot(vec), rtol=1e-5)
+        assert np.allclose(M.rmatmat(vec[:, None])[:, 0], A.T.dot(vec), rtol=1e-5)
+        assert np.all(np.isfinite(M.get_col_norms()))
+        W, col_norms = mthree.matrix._packed_cal_matrix(
+            M.bitstrings, cals, num_bits, distance
+        )
+        assert np.allclose(W, A, atol=1e-6)
+        assert np.all(np.isfinite(col_norms))
+
+
+def test_matmat():
+    """Check block actions agree with single vector actions"""
+    backend = FakeAthens()
+
+    qc = QuantumCircuit(5)
+    qc.h(range(5))
+    qc.measure_all()
+
+    raw_counts = backend.run(qc, shots=4096).result().get_counts()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(range(5))
+    cals = mit._form_cals(range(5))
+
+    rng = np.random.default_rng(7)
+    for distance in [2, 5]:
+        M = M3MatVec(dict(raw_counts), cals, distance)
+        X = rng.standard_normal((M.num_elems, 3)).astype(np.float32)
+
+        out = M.matmat(X)
+        rout = M.rmatmat(X)
+        assert out.shape == (M.num_elems, 3)
+        for kk in range(3):
+            vec = np.ascontiguousarray(X[:, kk])
+            assert np.allclose(out[:, kk], M.matvec(vec), atol=1e-6)
+            assert np.allclose(rout[:, kk], M.rmatvec(vec), atol=1e-6)
+
+        # Non-contiguous and double precision blocks are accepted
+        assert np.allclose(M.matmat(np.asfortranarray(X, dtype=float)), out, atol=1e-6)
+
+        # Single columns go through the vector kernels
+        assert np.allclose(M.matmat(X[:, :1]), out[:, :1], atol=1e-6)
+        assert np.allclose(M.rmatmat(X[:, :1]), rout[:, :1], atol=1e-6)
+
+        # Block GMRES solves every column to tolerance
+        P, _ = build_preconditioner(M)
+        B = np.abs(X)
+        sol = _block_gmres(M.matmat, B, P, 1e-6, 25)
+        assert np.allclose(M.matmat(sol), B, atol=1e-5)
+        sol = _block_gmres(M.rmatmat, B, P.adjoint(), 1e-6, 25)
+        assert np.allclose(M.rmatmat(sol), B, atol=1e-5)
+
+
+def test_get_csr():
+    """Check the sparse reduced A-matrix matches the dense one"""
+    backend = FakeAthens()
+
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(2, 3)
+    qc.cx(1, 0)
+    qc.cx(3, 4)
+    qc.measure_all()
+
+    raw_counts = backend.run(qc).result().get_counts()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(range(5))
+
+    cals = mit._form_cals(range(5))
+    for distance in [1, 2, 3]:
+        M = M3MatVec(dict(raw_counts), cals, distance)
+        values, col_inds, row_ptrs = M.get_csr()
+        A = mit.reduced_cal_matrix(raw_counts, range(5), distance)[0]
+        S = np.zeros_like(A)
+        for row in range(M.num_elems):
+            cols = col_inds[row_ptrs[row] : row_ptrs[row + 1]]
+            S[row, cols] = values[row_ptrs[row] : row_ptrs[row + 1]]
+        assert np.allclose(S, A, atol=1e-6)
+
+        # Sampling every row gives the exact mean
+        packed, _ = counts_to_packed_and_probs(dict(raw_counts))
+        mean = mean_neighbors(packed.ravel(), 5, M.num_elems, distance, M.num_elems)
+        assert mean == row_ptrs[-1] / M.num_elems
+
+
+def test_get_block_diagonal():
+    """Check diagonal blocks match the dense reduced A-matrix"""
+    backend = FakeAthens()
+
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(2, 3)
+    qc.cx(1, 0)
+    qc.cx(3, 4)
+    qc.measure_all()
+
+    raw_counts = backend.run(qc).result().get_counts()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(range(5))
+
+    cals = mit._form_cals(range(5))
+    block_size = 5
+    for distance in [1, 5]:
+        M = M3MatVec(dict(raw_counts), cals, distance)
+        blocks = M.get_block_diagonal(block_size)
+        A = mit.reduced_cal_matrix(raw_counts, range(5), distance)[0]
+        assert blocks.shape[0] == -(-M.num_elems // block_size)
+        for idx, block in enumerate(blocks):
+            start = idx * block_size
+            stop = min(start + block_size, M.num_elems)
+            size = stop - start
+            assert np.allclose(
+                block[:size, :size], A[start:stop, start:stop], atol=1e-6
+            )
+            # Padding past the end of the matrix is the identity
+            assert np.array_equal(block[size:, size:], np.eye(block_size - size))
@@ -14,6 +14,7 @@
 """Test is various methods agree"""
 
 import numpy as np
+import pytest
 from qiskit import QuantumCircuit
 from qiskit_ibm_runtime.fake_provider import FakeAthensV2 as FakeAthens
 import mthree
@@ -66,3 +67,277 @@ def test_set_iterative():
 
     _, details = mit.apply_correction(raw_counts, range(5), details=True)
     assert details["method"] == "direct"
+    assert details["plan"]["method"] == "direct"
+
+
+def test_native_backend():
+    """Make sure native GMRES agrees with the SciPy backend."""
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(1, 0)
+    qc.cx(2, 3)
+    qc.cx(3, 4)
+    qc.measure_all()
+
+    backend = FakeAthens()
+    raw_counts = backend.run(qc, shots=4096).result().get_counts()
+
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system()
+
+    scipy_q = mit.apply_correction(raw_counts, range(5), method="iterative", tol=1e-5)
+    native_q, details = mit.apply_correction(
+        raw_counts,
+        range(5),
+        method="iterative",
+        tol=1e-5,
+        iterative_backend="native",
+        details=True,
+    )
+    assert details["backend"] == "native"
+    assert details["iterations"] > 0
+    for key, val in scipy_q.items():
+        assert key in native_q.keys()
+        assert np.abs(val - native_q[key]) < 1e-4
+
+
+def test_sparse_method():
+    """Make sure the sparse direct solver agrees with the dense one."""
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(1, 0)
+    qc.cx(2, 3)
+    qc.cx(3, 4)
+    qc.measure_all()
+
+    backend = FakeAthens()
+    raw_counts = backend.run(qc, shots=4096).result().get_counts()
+
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system()
+
+    for distance in [1, 3]:
+        direct_q = mit.apply_correction(
+            raw_counts,
+            range(5),
+            distance=distance,
+            method="direct",
+            return_mitigation_overhead=True,
+        )
+        sparse_q, details = mit.apply_correction(
+            raw_counts,
+            range(5),
+            distance=distance,
+            method="sparse",
+            return_mitigation_overhead=True,
+            details=True,
+        )
+        assert details["method"] == "sparse"
+        assert abs(sparse_q.mitigation_overhead - direct_q.mitigation_overhead) < 1e-3
+        for key, val in direct_q.items():
+            assert np.abs(val - sparse_q[key]) < 1e-5
+
+    # The matrix is dense at max distance
+    with pytest.raises(mthree.exceptions.M3Error):
+        mit.apply_correction(raw_counts, range(5), distance=-1, method="sparse")
+
+    # Few neighbors per bit-string above the direct size limit picks the sparse solver
+    mit.iter_threshold = 2
+    counts = {"00000": 100, "00001": 40, "11100": 50, "11110": 25}
+    _, details = mit.apply_correction(counts, range(5), distance=1, details=True)
+    assert details["method"] == "sparse"
+    assert not details["plan"]["estimates"]["direct"]["feasible"]
+
+
+def test_warm_start():
+    """Make sure starting from a previous correction gives the same answer."""
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(1, 0)
+    qc.cx(2, 3)
+    qc.cx(3, 4)
+    qc.measure_all()
+
+    backend = FakeAthens()
+    first_counts = backend.run(qc, shots=4096).result().get_counts()
+    second_counts = backend.run(qc, shots=4096).result().get_counts()
+
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system()
+
+    for array_output in [False, True]:
+        first = mit.apply_correction(
+            first_counts, range(5), method="iterative", array_output=array_output
+        )
+        cold, cold_details = mit.apply_correction(
+            second_counts,
+            range(5),
+            method="iterative",
+            tol=1e-5,
+            details=True,
+            array_output=array_output,
+        )
+        warm, warm_details = mit.apply_correction(
+            second_counts,
+            range(5),
+            method="iterative",
+            tol=1e-5,
+            details=True,
+            array_output=array_output,
+            previous=first,
+        )
+        assert warm_details["iterations"] <= cold_details["iterations"]
+        for key, val in cold.items():
+            assert np.abs(val - warm[key]) < 1e-4
+
+    # One previous correction per counts
+    with pytest.raises(mthree.exceptions.M3Error):
+        mit.apply_correction([first_counts, second_counts], range(5), previous=[first])
+
+
+def test_preconditioners():
+    """Make sure all preconditioners give the same solution."""
+    qc = QuantumCircuit(5)
+    qc.h(2)
+    qc.cx(2, 1)
+    qc.cx(1, 0)
+    qc.cx(2, 3)
+    qc.cx(3, 4)
+    qc.measure_all()
+
+    backend = FakeAthens()
+    # Fixed counts and cals, as the one-norm estimates of the direct and
+    # iterative methods can take different paths for some samples
+    raw_counts = backend.run(qc, shots=4096, seed_simulator=1).result().get_counts()
+
+    mit = mthree.M3Mitigation()
+    mit.cals_from_matrices(
+        [
+            np.array([[1 - p0, p1], [p0, 1 - p1]], dtype=np.float32)
+            for p0, p1 in [
+                (0.01, 0.03),
+                (0.02, 0.05),
+                (0.015, 0.04),
+                (0.03, 0.06),
+                (0.01, 0.02),
+            ]
+        ]
+    )
+
+    direct_q = mit.apply_correction(
+        raw_counts,
+        range(5),
+        distance=2,
+        method="direct",
+        return_mitigation_overhead=True,
+    )
+    for preconditioner in ["jacobi", "block", "ilu"]:
+        quasi, details = mit.apply_correction(
+            raw_counts,
+            range(5),
+            distance=2,
+            method="iterative",
+            tol=1e-5,
+            return_mitigation_overhead=True,
+            details=True,
+            preconditioner=preconditioner,
+        )
+        assert details["preconditioner"] == preconditioner
+        assert abs(quasi.mitigation_overhead - direct_q.mitigation_overhead) < 1e-2
+        for key, val in direct_q.items():
+            assert np.abs(val - quasi[key]) < 1e-4
+
+    # ILU needs a sparse matrix
+    with pytest.raises(mthree.exceptions.M3Error):
+        mit.apply_correction(
+            raw_counts, range(5), distance=-1, method="iterative", preconditioner="ilu"
+        )
+    with pytest.raises(mthree.exceptions.M3Error):
+        mit.apply_correction(raw_counts, range(5), preconditioner="spai")
+    with pytest.raises(mthree.exceptions.M3Error):
+        mit.apply_correction(
+            raw_counts,
+            range(5),
+            method="iterative",
+            iterative_backend="native",
+            preconditioner="block",
+        )
+
+
+def test_components_method():
+    """Make sure solving connected components separately agrees with direct."""
+    backend = FakeAthens()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system()
+
+    counts = {"00000": 400, "00001": 100, "11111": 300, "11110": 150, "01010": 50}
+    direct_q = mit.apply_correction(
+        counts, range(5), distance=1, method="direct", return_mitigation_overhead=True
+    )
+    for array_output in [False, True]:
+        comp_q, details = mit.apply_correction(
+            counts,
+            range(5),
+            distance=1,
+            method="components",
+            return_mitigation_overhead=True,
+            details=True,
+            array_output=array_output,
+            max_workers=2,
+        )
+        assert details["method"] == "components"
+        assert details["components"] == 3
+        assert details["largest_component"] == 2
+        assert comp_q.shots == 1000
+        assert abs(comp_q.mitigation_overhead - direct_q.mitigation_overhead) < 1e-3
+        for key, val in direct_q.items():
+            assert np.abs(val - comp_q[key]) < 1e-6
+
+    # A lone bit-string is left as it is
+    assert np.abs(comp_q["01010"] - 0.05) < 1e-6
+
+    # Blocks above the iter_threshold are solved iteratively
+    mit.iter_threshold = 1
+    comp_q = mit.apply_correction(
+        counts, range(5), distance=1, method="components", tol=1e-6
+    )
+    for key, val in direct_q.items():
+        assert np.abs(val - comp_q[key]) < 1e-5
+
+
+def test_planner(monkeypatch):
+    """Make sure the planner reports the estimates of each method."""
+    backend = FakeAthens()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system()
+
+    # Small inputs go to the direct method without estimates
+    counts = {"00000": 400, "00001": 100, "11111": 300, "11110": 150, "01010": 50}
+    _, details = mit.apply_correction(counts, range(5), distance=1, details=True)
+    assert details["method"] == "direct"
+    assert details["plan"]["estimates"] is None
+
+    monkeypatch.setattr(mthree.planner, "DIRECT_ELEMS", 0)
+    _, details = mit.apply_correction(counts, range(5), distance=1, details=True)
+    plan = details["plan"]
+    assert plan["method"] == details["method"]
+    assert abs(plan["mean_neighbors"] - 1.8) < 1e-6
+    for method in ["direct", "sparse", "iterative", "components"]:
+        est = plan["estimates"][method]
+        assert est["time"] > 0
+        assert est["memory"] > 0
+    # Only the methods that need a truncated distance are ruled out at max distance
+    _, details = mit.apply_correction(counts, range(5), distance=-1, details=True)
+    feasible = {
+        method
+        for method, est in details["plan"]["estimates"].items()
+        if est["feasible"]
+    }
+    assert feasible == {"direct", "iterative"}
+
+    # No plan when the method is given
+    _, details = mit.apply_correction(counts, range(5), method="direct", details=True)
+    assert "plan" not in details
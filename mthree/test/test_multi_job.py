@@ -11,8 +11,44 @@
 # that they have been altered from the originals.
 
 """Test multiple job submission"""
+
+import time
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from qiskit.primitives import BitArray
 from qiskit_ibm_runtime.fake_provider import FakeKolkataV2 as FakeKolkata
 import mthree
+from mthree.circuits import balanced_cal_strings
+from mthree.mitigation import _job_thread
+
+
+class SlowJob:
+    """Job that returns its results after a delay, unless cancelled"""
+
+    def __init__(self, results, delay=0, error=None):
+        self.results = results
+        self.delay = delay
+        self.error = error
+        self.cancelled = threading.Event()
+        self.finished = False
+
+    def result(self):
+        """Results of the job"""
+        try:
+            if self.cancelled.wait(self.delay):
+                raise RuntimeError("job cancelled")
+            if self.error is not None:
+                raise self.error
+            return self.results
+        finally:
+            self.finished = True
+
+    def cancel(self):
+        """Cancel the job"""
+        self.cancelled.set()
 
 
 def test_multiple_job_submission():
@@ -31,3 +67,58 @@ def test_multiple_job_submission_single_circuit():
     mit = mthree.M3Mitigation(backend)
     mit.cals_from_system()
     assert all(cal.trace() > 1.8 for cal in mit.single_qubit_cals)
+
+
+def test_jobs_finishing_out_of_order():
+    """Test that cals do not depend on the order in which jobs finish"""
+    num_qubits = 3
+    cal_strings = balanced_cal_strings(num_qubits)
+    rng = np.random.default_rng(1234)
+    results = []
+    for cal_string in cal_strings:
+        counts = {cal_string: 90}
+        for _ in range(10):
+            key = "".join(rng.choice(["0", "1"], num_qubits))
+            counts[key] = counts.get(key, 0) + 1
+        data = SimpleNamespace(c=BitArray.from_counts(counts, num_bits=num_qubits))
+        results.append(SimpleNamespace(data=data))
+
+    cals = []
+    for delays in [(0, 0), (0.2, 0)]:
+        mit = mthree.M3Mitigation(None)
+        mit.single_qubit_cals = [None] * num_qubits
+        mit.cal_method = "balanced"
+        mit._balanced_shots = 100 * num_qubits
+        jobs = [SlowJob(results[:4], delays[0]), SlowJob(results[4:], delays[1])]
+        _job_thread(jobs, mit, list(range(num_qubits)), num_qubits, cal_strings, [0, 4])
+        assert mit._job_error is None
+        cals.append(mit.single_qubit_cals)
+    for cal0, cal1 in zip(*cals):
+        assert np.allclose(cal0, cal1)
+        assert cal0.trace() > 1.8
+
+    # A failed job cancels the others, and no thread is left waiting on them
+    error = RuntimeError("job failed")
+    jobs = [SlowJob(results[:4], 5), SlowJob(results[4:], error=error)]
+    st = time.perf_counter()
+    _job_thread(jobs, mit, list(range(num_qubits)), num_qubits, cal_strings, [0, 4])
+    assert time.perf_counter() - st < 4
+    assert mit._job_error is error
+    assert jobs[0].cancelled.is_set()
+    assert all(job.finished for job in jobs)
+
+
+def test_failed_job_waits_for_others():
+    """Test jobs that cannot be cancelled are waited on after a failure"""
+    num_qubits = 2
+    cal_strings = balanced_cal_strings(num_qubits)
+    mit = mthree.M3Mitigation(None)
+    mit.single_qubit_cals = [None] * num_qubits
+    error = RuntimeError("job failed")
+    slow = SlowJob([], 0.5)
+    jobs = [SimpleNamespace(result=slow.result), SlowJob([], error=error)]
+    _job_thread(jobs, mit, list(range(num_qubits)), num_qubits, cal_strings, [0, 2])
+    assert mit._job_error is error
+    assert slow.finished
+    with pytest.raises(RuntimeError):
+        mit._thread_check()
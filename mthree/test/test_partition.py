@@ -0,0 +1,112 @@
+# This code is part of Mthree.
+#
+# (C) Copyright IBM 2024.
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+# pylint: disable=no-name-in-module
+
+"""Test qubit-partitioned corrections"""
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit_ibm_runtime.fake_provider import FakeAthensV2 as FakeAthens
+import mthree
+from mthree.classes import PartitionedQuasiDistribution
+from mthree.converters import bitstrings_to_bytes
+
+
+def test_partitioned_correction():
+    """Test group corrections match corrections of the marginals"""
+    qc = QuantumCircuit(4)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.x(2)
+    qc.h(3)
+    qc.measure_all()
+
+    backend = FakeAthens()
+    raw_counts = backend.run(qc, shots=4096).result().get_counts()
+
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(range(4))
+
+    part = mit.apply_correction(
+        raw_counts,
+        range(4),
+        partition=[[0, 1], [2, 3]],
+        return_mitigation_overhead=True,
+    )
+    assert isinstance(part, PartitionedQuasiDistribution)
+    assert len(part) == 2
+    assert part.shots == 4096
+
+    # Each group is the correction of its marginal counts
+    for group, dist in zip(part.groups, part):
+        marg = mthree.utils.marginal_distribution(raw_counts, group)
+        quasi = mit.apply_correction(marg, group)
+        for key, val in quasi.items():
+            assert np.abs(val - dist[key]) < 1e-6
+    assert np.isclose(
+        part.mitigation_overhead,
+        part[0].mitigation_overhead * part[1].mitigation_overhead,
+    )
+
+    # Products of group-local operators
+    vals = part.expval(["IIZZ", "ZZII", "ZZZZ", "IIII", "ZIIZ"])
+    assert np.isclose(vals[0], part[0].expval("ZZ"), atol=1e-6)
+    assert np.isclose(vals[1], part[1].expval("ZZ"), atol=1e-6)
+    assert np.isclose(vals[2], vals[0] * vals[1], atol=1e-6)
+    assert vals[3] == 1
+    assert np.isclose(vals[4], part[0].expval("IZ") * part[1].expval("ZI"), atol=1e-6)
+    assert np.isclose(part.expval(), vals[2], atol=1e-6)
+
+    # Close to the correction of the full distribution
+    full = mit.apply_correction(raw_counts, range(4))
+    assert np.allclose(
+        vals, full.expval(["IIZZ", "ZZII", "ZZZZ", "IIII", "ZIIZ"]), atol=0.05
+    )
+
+    # Array inputs give the same groups
+    arr = (
+        bitstrings_to_bytes(raw_counts, 4),
+        np.fromiter(raw_counts.values(), dtype=float),
+    )
+    part_arr = mit.apply_correction(arr, range(4), partition=[[0, 1], [2, 3]])
+    assert np.allclose(part_arr.expval(["IIZZ", "ZZII"]), vals[:2], atol=1e-6)
+
+
+def test_partition_errors():
+    """Test invalid partitions raise"""
+    backend = FakeAthens()
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(range(4))
+    counts = {"0000": 10, "0101": 20}
+
+    for partition in [[[0, 1], [1, 2]], [[0, 4]], [[]], []]:
+        with pytest.raises(mthree.exceptions.M3Error):
+            mit.apply_correction(counts, range(4), partition=partition)
+    with pytest.raises(mthree.exceptions.M3Error):
+        mit.apply_correction([counts, counts], range(4), partition=[[0, 1]])
+
+    # Operators must be the identity outside of the groups
+    part = mit.apply_correction(counts, range(4), partition=[[0, 1]])
+    assert np.isclose(part.expval("IIZZ"), part[0].expval("ZZ"), atol=1e-6)
+    with pytest.raises(mthree.exceptions.M3Error):
+        part.expval("ZIZZ")
+
+    # A previous solution must be partitioned over the same groups
+    mit.apply_correction(counts, range(4), partition=[[0, 1]], previous=part)
+    full = mit.apply_correction(counts, range(4))
+    other = mit.apply_correction(counts, range(4), partition=[[2, 3]])
+    for previous in [full, [full], part.dists, other]:
+        with pytest.raises(mthree.exceptions.M3Error):
+            mit.apply_correction(
+                counts, range(4), partition=[[0, 1]], previous=previous
+            )
@@ -12,8 +12,10 @@
 # pylint: disable=no-name-in-module
 
 """Test conversion to probability distribution"""
+
 import numpy as np
-from mthree.classes import QuasiDistribution
+from mthree.classes import QuasiDistribution, QuasiCollection
+from mthree.probability import nearest_probs
 
 
 def test_known_conversion():
@@ -28,3 +30,49 @@ def test_known_conversion():
         assert abs(ans[key] - val) < 1e-14
 
     assert abs(dist - np.sqrt(0.38)) < 1e-14
+
+
+def _smolin(vals):
+    """Reference sort-based method from Smolin PRL"""
+    order = np.argsort(vals, kind="stable")
+    num_elems = len(vals)
+    beta = 0
+    out = np.zeros(len(vals))
+    diff = 0
+    for idx in order:
+        if vals[idx] + beta / num_elems < 0:
+            beta += vals[idx]
+            num_elems -= 1
+            diff += vals[idx] ** 2
+        else:
+            diff += (beta / num_elems) ** 2
+            out[idx] = vals[idx] + beta / num_elems
+    return out, np.sqrt(diff)
+
+
+def test_batched_conversion():
+    """Test batched conversion matches sort-based method"""
+    rng = np.random.default_rng(1234)
+    vals = [rng.normal(1, 2, size) for size in [1, 10, 200, 1000]]
+    vals = [val / val.sum() for val in vals]
+    offsets = np.cumsum([0] + [len(val) for val in vals[:-1]])
+    keep, probs, dists = nearest_probs(np.concatenate(vals), offsets)
+    for idx, val in enumerate(vals):
+        ref, ref_dist = _smolin(val)
+        start = offsets[idx]
+        assert np.allclose(probs[start : start + len(val)], ref, atol=1e-12)
+        assert abs(dists[idx] - ref_dist) < 1e-12
+        assert np.array_equal(keep[start : start + len(val)], ref > 0)
+
+    quasis = QuasiCollection(
+        [
+            QuasiDistribution({str(kk): vv for kk, vv in enumerate(val)}, shots=1)
+            for val in vals
+        ]
+    )
+    probs = quasis.nearest_probability_distribution()
+    for idx, quasi in enumerate(quasis):
+        ref = quasi.nearest_probability_distribution()
+        assert probs[idx].keys() == ref.keys()
+        for key, val in ref.items():
+            assert abs(probs[idx][key] - val) < 1e-12
@@ -47,3 +47,63 @@ def test_test_call_cals_twice():
     with pytest.raises(M3Error):
         cal_file = "data_cal.json"
         mit.cals_from_system(maps, cals_file=cal_file, async_cal=True)
+
+
+def test_threaded_correction():
+    """Test correcting a list of counts in a thread pool matches serial"""
+    qc = QuantumCircuit(4)
+    qc.h(0)
+    qc.cx(0, range(1, 4))
+    qc.measure_all()
+
+    backend = FakeCasablanca()
+    circs = transpile([qc] * 6, backend, seed_transpiler=12345)
+    counts = backend.run(circs, shots=2048).result().get_counts()
+    maps = final_measurement_mapping(circs)
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(maps)
+
+    serial = mit.apply_correction(counts, maps, method="iterative")
+    threaded, details = mit.apply_correction(
+        counts, maps, method="iterative", max_workers=3, details=True
+    )
+    assert len(threaded) == len(serial)
+    assert len(details) == len(serial)
+    for ser, thr in zip(serial, threaded):
+        assert ser.keys() == thr.keys()
+        for key, val in ser.items():
+            assert abs(val - thr[key]) < 1e-6
+
+    with pytest.raises(M3Error):
+        mit.apply_correction(counts, maps, max_workers=0)
+
+
+def test_process_correction():
+    """Test correcting a list of counts in a process pool matches serial"""
+    qc = QuantumCircuit(4)
+    qc.h(0)
+    qc.cx(0, range(1, 4))
+    qc.measure_all()
+
+    backend = FakeCasablanca()
+    circs = transpile([qc] * 6, backend, seed_transpiler=12345)
+    counts = backend.run(circs, shots=2048).result().get_counts()
+    maps = final_measurement_mapping(circs)
+    mit = mthree.M3Mitigation(backend)
+    mit.cals_from_system(maps)
+
+    serial, serial_details = mit.apply_correction(counts, maps, details=True)
+    procs, details = mit.apply_correction(
+        counts, maps, max_workers=2, parallel="process", details=True
+    )
+    assert isinstance(procs, mthree.classes.QuasiCollection)
+    assert len(procs) == len(serial)
+    for idx, (ser, prc) in enumerate(zip(serial, procs)):
+        assert prc.shots == ser.shots
+        assert details[idx]["method"] == serial_details[idx]["method"]
+        assert ser.keys() == prc.keys()
+        for key, val in ser.items():
+            assert abs(val - prc[key]) < 1e-6
+
+    with pytest.raises(M3Error):
+        mit.apply_correction(counts, maps, max_workers=2, parallel="fork")
@@ -22,17 +22,23 @@ Utility functions
    stddev
    expval_and_stddev
    marginal_distribution
+   counts_to_arrays
+   bytes_to_bitstrings
 
 """
+
 import numpy as np
 
 from qiskit.result import marginal_distribution as marg_dist
 from mthree.exceptions import M3Error
+from mthree.converters import counts_to_arrays, bytes_to_bitstrings
 from mthree.classes import (
     QuasiDistribution,
     ProbDistribution,
     QuasiCollection,
     ProbCollection,
+    ArrayQuasiDistribution,
+    ArrayProbDistribution,
 )
 
 
@@ -208,7 +214,15 @@ def _expval_std(items, exp_ops="", method=0):
             out = items.stddev()
         else:
             out = items.expval_and_stddev(exp_ops)
-    elif not isinstance(items[0], (ProbDistribution, QuasiDistribution)):
+    elif not isinstance(
+        items[0],
+        (
+            ProbDistribution,
+            QuasiDistribution,
+            ArrayProbDistribution,
+            ArrayQuasiDistribution,
+        ),
+    ):
         out = []
         if method == 0:
             for idx, it in enumerate(items):
@@ -329,16 +343,21 @@ def counts_to_vector(counts):
     return vec
 
 
-def vector_to_quasiprobs(vec, counts):
+def vector_to_quasiprobs(vec, counts, num_bits=None):
     """Return dict of quasi-probabilities.
 
     Parameters:
         vec (ndarray): 1d vector of quasi-probabilites.
-        counts (dict): Dict of counts
+        counts (dict or ndarray): Dict of counts, or 2D uint8 array of
+                                  bit-string bytes in the same order as vec.
+        num_bits (int): Number of bits, needed if counts is an array.
 
     Returns:
-        QuasiDistribution: dict of quasi-probabilities
+        QuasiDistribution or ArrayQuasiDistribution: dict of quasi-probabilities,
+        or array-backed quasi-probabilities if counts is an array.
     """
+    if isinstance(counts, np.ndarray):
+        return ArrayQuasiDistribution(counts, vec, num_bits)
     out_counts = {}
     idx = 0
     for key in counts: